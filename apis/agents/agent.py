@@ -6,19 +6,121 @@ Agent thông minh có khả năng tìm kiếm web và xử lý ngôn ngữ tự
 from openai import OpenAI
 from pydantic import BaseModel
 import os
+import time
+import asyncio
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor, TimeoutError as FutureTimeoutError
 from dotenv import load_dotenv
 from langchain_google_genai import ChatGoogleGenerativeAI
 from .tools.web_search import web_search
 from .tools.product_tool import product_search
+from .tools.product_stats_tool import product_stats
 from .tools.order_tool import order_search
 from .tools.image_tool import generate_image
-from typing import Annotated
+from typing import Annotated, Optional
 from typing_extensions import TypedDict
 from langgraph.graph import StateGraph, START, END
 from langgraph.graph.message import add_messages
 import json
-from langchain_core.messages import ToolMessage, SystemMessage
-from langchain_core.runnables import RunnableConfig
+from langchain_core.messages import ToolMessage, SystemMessage, AIMessageChunk
+from langchain_core.runnables import RunnableConfig, RunnableLambda
+
+
+# Thread pool giới hạn để chạy các tool đồng bộ (web_search, product_search,
+# render ảnh...) ở luồng async, tránh chặn event loop của uvicorn
+TOOL_EXECUTOR = ThreadPoolExecutor(
+    max_workers=int(os.getenv("AGENT_TOOL_WORKERS", "16")),
+    thread_name_prefix="hivespace-tool",
+)
+
+# Thời gian tối đa (giây) agent chờ mỗi lần gọi tool. Hết thời gian chỉ dừng việc chờ: tool đồng bộ
+# không thể bị hủy và vẫn giữ một thread của TOOL_EXECUTOR tới khi tự kết thúc (được log và đếm
+# trong tool_stats()). Các tool có thể bị treo tự giới hạn thời gian của mình ngắn hơn mốc này:
+# web_search theo WEB_SEARCH_TIMEOUT, vẽ hóa đơn theo INVOICE_RENDER_QUEUE_TIMEOUT + INVOICE_RENDER_TIMEOUT
+TOOL_TIMEOUT = float(os.getenv("AGENT_TOOL_TIMEOUT", "30"))
+
+logger = logging.getLogger(__name__)
+
+# Số lần gọi tool đã quá TOOL_TIMEOUT nhưng vẫn đang chạy trong TOOL_EXECUTOR
+_abandoned_lock = threading.Lock()
+_abandoned_running = 0
+_abandoned_total = 0
+
+
+def _abandon(name: str, future):
+    """Ghi nhận tool đồng bộ quá thời gian nhưng chưa dừng, log lại khi nó thực sự kết thúc"""
+    global _abandoned_running, _abandoned_total
+    with _abandoned_lock:
+        _abandoned_running += 1
+        _abandoned_total += 1
+        running = _abandoned_running
+    logger.warning(
+        "tool %s timed out after %gs and is still holding a worker (%d abandoned running)", name, TOOL_TIMEOUT, running
+    )
+    started = time.perf_counter()
+
+    def finished(_):
+        global _abandoned_running
+        with _abandoned_lock:
+            _abandoned_running -= 1
+        logger.warning("abandoned tool %s finished %.0fms after its timeout", name, (time.perf_counter() - started) * 1000)
+
+    future.add_done_callback(finished)
+
+
+def tool_stats() -> dict:
+    """Số liệu thread chạy tool: số tool quá thời gian còn đang chạy và tổng số từ khi khởi động"""
+    with _abandoned_lock:
+        return {
+            "workers": TOOL_EXECUTOR._max_workers,
+            "timeout": TOOL_TIMEOUT,
+            "abandoned_running": _abandoned_running,
+            "abandoned_total": _abandoned_total,
+        }
+
+
+def _timed(func, *args):
+    """Gọi hàm và trả về (kết quả, thời gian chạy tính bằng giây)"""
+    started = time.perf_counter()
+    result = func(*args)
+    return result, time.perf_counter() - started
+
+
+async def _atimed(coro):
+    started = time.perf_counter()
+    result = await coro
+    return result, time.perf_counter() - started
+
+
+def _tool_error_message(name: str, error: BaseException) -> str:
+    """Nội dung ToolMessage khi tool lỗi hoặc quá thời gian, để LLM vẫn trả lời tiếp được"""
+    if isinstance(error, (asyncio.TimeoutError, FutureTimeoutError)):
+        return f"Tool {name} không phản hồi trong {TOOL_TIMEOUT:g} giây."
+    return f"Lỗi khi chạy tool {name}: {str(error)}"
+
+
+def _log_tool_trace(tool_calls: list, durations: list, wall: float):
+    """Ghi trace thời gian chạy tool: wall time so với tổng thời gian từng tool"""
+    detail = ", ".join(
+        f"{call['name']}={duration * 1000:.0f}ms" for call, duration in zip(tool_calls, durations)
+    )
+    logger.info(
+        "tools wall=%.0fms sum=%.0fms [%s]", wall * 1000, sum(durations) * 1000, detail
+    )
+
+
+def message_text(content) -> str:
+    """Lấy phần text từ content của message (str hoặc list các part của Gemini)"""
+    if isinstance(content, str):
+        return content
+    if isinstance(content, list):
+        return "".join(
+            part if isinstance(part, str) else part.get("text", "")
+            for part in content
+            if isinstance(part, (str, dict))
+        )
+    return ""
 
 
 class State(TypedDict):
@@ -64,7 +166,8 @@ class HiveSpaceAgent:
         )
         
         # Bind tools to the model
-        self.react_agent = self.llm.bind_tools([web_search, product_search, order_search, generate_image])
+        self.tools = [web_search, product_search, product_stats, order_search, generate_image]
+        self.react_agent = self.llm.bind_tools(self.tools)
         
         # Khởi tạo workflow graph
         self._setup_workflow()
@@ -75,31 +178,93 @@ class HiveSpaceAgent:
         graph_builder = StateGraph(State)
         
         # Định nghĩa tools
-        tools = [web_search, product_search, order_search, generate_image]
-        tools_by_name = {tool.name: tool for tool in tools}
+        tools_by_name = {tool.name: tool for tool in self.tools}
         
-        # Định nghĩa tool node
-        def call_tool(state: State):
+        def to_tool_messages(tool_calls, results):
+            # Giữ đúng thứ tự tool_calls ban đầu
             outputs = []
-            # Iterate over the tool calls in the last message
-            for tool_call in state["messages"][-1].tool_calls:
-                # Get the tool by name
-                tool_result = tools_by_name[tool_call["name"]].invoke(tool_call["args"])
+            for tool_call, tool_result in zip(tool_calls, results):
+                status = "success"
+                if isinstance(tool_result, BaseException):
+                    tool_result = _tool_error_message(tool_call["name"], tool_result)
+                    status = "error"
                 outputs.append(
                     ToolMessage(
                         content=tool_result,
                         name=tool_call["name"],
+                        status=status,
                         tool_call_id=tool_call["id"],
                     )
                 )
             return {"messages": outputs}
         
+        # Định nghĩa tool node: các tool call độc lập trong cùng một lượt được chạy song song
+        def call_tool(state: State):
+            tool_calls = state["messages"][-1].tool_calls
+            started = time.perf_counter()
+            futures = [
+                TOOL_EXECUTOR.submit(_timed, tools_by_name[tool_call["name"]].invoke, tool_call["args"])
+                for tool_call in tool_calls
+            ]
+            deadline = started + TOOL_TIMEOUT
+            results, durations = [], []
+            for tool_call, future in zip(tool_calls, futures):
+                try:
+                    result, duration = future.result(timeout=max(0, deadline - time.perf_counter()))
+                except FutureTimeoutError as e:
+                    if not future.cancel():
+                        _abandon(tool_call["name"], future)
+                    result, duration = e, time.perf_counter() - started
+                except Exception as e:
+                    result, duration = e, time.perf_counter() - started
+                results.append(result)
+                durations.append(duration)
+            _log_tool_trace(tool_calls, durations, time.perf_counter() - started)
+            return to_tool_messages(tool_calls, results)
+        
+        # Phiên bản async của tool node, dùng khi chạy graph bằng astream/ainvoke
+        async def acall_tool(state: State):
+            tool_calls = state["messages"][-1].tool_calls
+            started = time.perf_counter()
+            
+            async def run(tool_call):
+                tool = tools_by_name[tool_call["name"]]
+                future = None
+                if getattr(tool, "coroutine", None) is not None:
+                    # Tool async bị hủy thật sự khi quá thời gian
+                    pending = tool.ainvoke(tool_call["args"])
+                else:
+                    future = TOOL_EXECUTOR.submit(tool.invoke, tool_call["args"])
+                    pending = asyncio.wrap_future(future)
+                try:
+                    return await asyncio.wait_for(_atimed(pending), timeout=TOOL_TIMEOUT)
+                except asyncio.TimeoutError as e:
+                    # Hủy được nếu tool chưa bắt đầu chạy; đang chạy thì vẫn giữ thread tới khi xong
+                    if future is not None and not future.cancel():
+                        _abandon(tool_call["name"], future)
+                    return e, time.perf_counter() - started
+                except Exception as e:
+                    return e, time.perf_counter() - started
+            
+            timed_results = await asyncio.gather(*(run(tool_call) for tool_call in tool_calls))
+            results = [result for result, _ in timed_results]
+            _log_tool_trace(tool_calls, [duration for _, duration in timed_results], time.perf_counter() - started)
+            return to_tool_messages(tool_calls, results)
+        
         def call_model(state: State, config: RunnableConfig):
             # Invoke the model with the system prompt and the messages
             response = self.react_agent.invoke(state["messages"], config)
             # We return a list, because this will get added to the existing messages state using the add_messages reducer
             return {"messages": [response]}
         
+        async def acall_model(state: State, config: RunnableConfig):
+            # Gọi Gemini bất đồng bộ bằng astream để token được đẩy ra ngay khi sinh
+            # (stream_mode="messages" của graph bắt các chunk này qua callback)
+            response = None
+            async for chunk in self.react_agent.astream(state["messages"], config):
+                response = chunk if response is None else response + chunk
+            return {"messages": [response]}
+        
         # Định nghĩa conditional edge để xác định có tiếp tục hay không
         def should_continue(state: State):
             messages = state["messages"]
@@ -112,9 +277,9 @@ class HiveSpaceAgent:
         # Định nghĩa graph mới với state
         workflow = StateGraph(State)
         
-        # 1. Add our nodes
-        workflow.add_node("llm", call_model)
-        workflow.add_node("tools", call_tool)
+        # 1. Add our nodes (mỗi node có cả bản sync cho stream/invoke và bản async cho astream/ainvoke)
+        workflow.add_node("llm", RunnableLambda(call_model, afunc=acall_model, name="llm"))
+        workflow.add_node("tools", RunnableLambda(call_tool, afunc=acall_tool, name="tools"))
         
         # 2. Set the entrypoint as `agent`, this is the first node called
         workflow.set_entry_point("llm")
@@ -141,7 +306,7 @@ class HiveSpaceAgent:
         # Compile graph
         self.react_agent_graph = workflow.compile()
     
-    def ask_react_agent(self, messages: list):
+    def ask_react_agent(self, messages: list, tool_trace: Optional[list] = None):
         """
         Gọi react agent với danh sách messages
         
@@ -151,6 +316,7 @@ class HiveSpaceAgent:
                     {"role": "system", "content": "system prompt"},
                     {"role": "user", "content": "user message"}
                 ]
+            tool_trace (list, optional): Nếu có, ToolMessage của các tool đã chạy được thêm vào đây
         
         Returns:
             str: Phản hồi từ AI agent
@@ -159,12 +325,79 @@ class HiveSpaceAgent:
         response_content = ""
         for event in self.react_agent_graph.stream({"messages": messages}):
             for key, value in event.items():
+                if key == "tools" and tool_trace is not None:
+                    tool_trace.extend(value["messages"])
                 if key != "llm" or value["messages"][-1].content == "":
                     continue
                 response_content = value["messages"][-1].content
         
         return response_content
     
+    async def aask_react_agent(self, messages: list, tool_trace: Optional[list] = None):
+        """
+        Phiên bản async của ask_react_agent, chạy graph bằng astream để không chặn event loop
+        
+        Args:
+            messages (list): Danh sách messages giống ask_react_agent
+            tool_trace (list, optional): Nếu có, ToolMessage của các tool đã chạy được thêm vào đây
+        
+        Returns:
+            str: Phản hồi từ AI agent
+        """
+        response_content = ""
+        async for event in self.react_agent_graph.astream({"messages": messages}):
+            for key, value in event.items():
+                if key == "tools" and tool_trace is not None:
+                    tool_trace.extend(value["messages"])
+                if key != "llm" or value["messages"][-1].content == "":
+                    continue
+                response_content = value["messages"][-1].content
+        
+        return response_content
+    
+    async def astream_react_agent(self, messages: list, tool_trace: Optional[list] = None):
+        """
+        Stream phản hồi của react agent theo từng token
+        
+        Args:
+            messages (list): Danh sách messages giống ask_react_agent
+            tool_trace (list, optional): Nếu có, ToolMessage của các tool đã chạy được thêm vào đây
+        
+        Yields:
+            dict: {"type": "token", "content": phần text mới} cho mỗi token,
+                  cuối cùng là {"type": "final", "content": phản hồi hoàn chỉnh}
+        """
+        response_content = ""
+        # Text đã stream trong lượt LLM hiện tại
+        streamed = ""
+        async for mode, payload in self.react_agent_graph.astream(
+            {"messages": messages}, stream_mode=["messages", "updates"]
+        ):
+            if mode == "messages":
+                chunk, metadata = payload
+                if metadata.get("langgraph_node") != "llm" or not isinstance(chunk, AIMessageChunk):
+                    continue
+                text = message_text(chunk.content)
+                if text:
+                    streamed += text
+                    yield {"type": "token", "content": text}
+                continue
+            
+            for key, value in payload.items():
+                if key == "tools" and tool_trace is not None:
+                    tool_trace.extend(value["messages"])
+                if key != "llm":
+                    continue
+                content = message_text(value["messages"][-1].content)
+                if content and not streamed:
+                    # Model không hỗ trợ stream: gửi cả lượt một lần
+                    yield {"type": "token", "content": content}
+                if content:
+                    response_content = content
+                streamed = ""
+        
+        yield {"type": "final", "content": response_content}
+    
     def ask_simple_question(self, question: str, system_prompt: str = None):
         """
         Hỏi câu hỏi đơn giản với system prompt mặc định
@@ -185,6 +418,7 @@ Bạn có khả năng:
 3. Tìm kiếm thông tin đơn hàng và trạng thái giao hàng
 
 Khi người dùng hỏi về sản phẩm, hãy sử dụng product_search tool để tìm thông tin chi tiết.
+Khi cần so sánh hoặc thống kê sản phẩm theo danh mục/thương hiệu, hãy sử dụng product_stats tool.
 Khi cần thông tin mới nhất, hãy sử dụng web_search tool để tìm kiếm trên internet.
 Khi người dùng hỏi về đơn hàng, hãy sử dụng order_search tool để tìm thông tin đơn hàng."""
         
@@ -222,12 +456,67 @@ Khi người dùng hỏi về đơn hàng, hãy sử dụng order_search tool đ
             return f"Lỗi khi xử lý câu hỏi: {str(e)}"
 
 
+class AgentRegistry:
+    """Giữ một instance HiveSpaceAgent dùng chung cho toàn bộ process.
+
+    Việc khởi tạo agent (load .env, tạo client Gemini, bind_tools, compile graph)
+    tốn kém nên chỉ làm một lần. Agent sau khi khởi tạo không có trạng thái riêng
+    theo request (graph đã compile chỉ đọc), vì vậy có thể dùng chung giữa các
+    request chạy đồng thời.
+    """
+
+    def __init__(self, factory=None):
+        self._factory = factory or HiveSpaceAgent
+        self._agent = None
+        self._lock = threading.Lock()
+        self._generation = 0
+
+    @property
+    def generation(self) -> int:
+        """Số lần agent đã được (re)load"""
+        return self._generation
+
+    def get(self) -> "HiveSpaceAgent":
+        """Lấy agent dùng chung, khởi tạo lần đầu nếu chưa có"""
+        agent = self._agent
+        if agent is None:
+            with self._lock:
+                if self._agent is None:
+                    self._agent = self._factory()
+                    self._generation += 1
+                agent = self._agent
+        return agent
+
+    def reload(self) -> "HiveSpaceAgent":
+        """Hot-reload agent khi cấu hình thay đổi (.env, model, tools...).
+
+        Agent mới được dựng xong rồi mới hoán đổi, nên các request đang chạy vẫn
+        tiếp tục dùng instance cũ. Nếu dựng agent mới lỗi thì giữ nguyên agent cũ.
+        """
+        with self._lock:
+            # Ghi đè biến môi trường bằng giá trị mới trong .env
+            load_dotenv(override=True)
+            new_agent = self._factory()
+            self._agent = new_agent
+            self._generation += 1
+        return new_agent
+
+
+# Registry dùng chung cho toàn process
+agent_registry = AgentRegistry()
+
+
 # Hàm tiện ích để sử dụng nhanh
 def create_agent():
-    """Tạo instance của HiveSpaceAgent"""
+    """Tạo instance mới của HiveSpaceAgent (không dùng chung)"""
     return HiveSpaceAgent()
 
 
+def get_agent():
+    """Lấy HiveSpaceAgent dùng chung của process"""
+    return agent_registry.get()
+
+
 def ask_question(question: str, use_web_search: bool = True):
     """
     Hỏi câu hỏi với agent
@@ -240,7 +529,7 @@ def ask_question(question: str, use_web_search: bool = True):
         str: Phản hồi từ agent
     """
     try:
-        agent = create_agent()
+        agent = get_agent()
         
         if use_web_search:
             return agent.ask_simple_question(question)
@@ -0,0 +1,240 @@
+"""
+Intent Router - Trả lời trực tiếp các câu tra cứu có cấu trúc, không qua LLM
+- Từ khóa nhận diện yêu cầu tạo ảnh / ảnh hóa đơn, biên dịch một lần khi import thành KEYWORD_MATCHER
+  (keyword_matcher); image_intent() phân loại trong một lần quét, dùng chung với main.py.
+  Câu có ý định tạo ảnh không bao giờ được router trả lời
+- Tra cứu đơn hàng: câu chỉ gồm đúng một mã đơn (ORDER_ID_PATTERN) và các cụm từ hỏi thông thường
+  ("đơn hàng ORD-2024-001 đang ở đâu", "kiểm tra ORD-2024-003") -> tra chỉ mục đơn hàng
+- Tra cứu sản phẩm: câu chỉ gồm đúng tên một sản phẩm và các cụm từ hỏi giá/tình trạng
+  ("giá iPhone 15 Pro", "MacBook Air M2 còn hàng không") -> lấy từ catalog
+  (tên sản phẩm tra theo dãy token qua bảng băm, dựng lại khi catalog đổi phiên bản)
+- Còn lại (thừa bất kỳ từ nào khác, nhiều mã đơn, nhiều sản phẩm...) trả về None để agent xử lý
+Câu trả lời dựng theo mẫu cố định từ dữ liệu của tool. Tắt bằng INTENT_ROUTER=0.
+"""
+
+import os
+import re
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from .keyword_matcher import KeywordMatcher, keyword_pattern, normalize_text
+from .tools.order_repository import ORDER_ID_PATTERN, get_order_source
+from .tools.product_catalog import product_catalog
+
+
+# Từ khóa yêu cầu tạo ảnh tổng quát
+IMAGE_KEYWORDS = [
+    "tạo hình", "tạo ảnh", "vẽ ảnh", "vẽ hình", "generate image", "create an image",
+    "image of", "hình minh họa", "poster", "logo", "bìa", "banner"
+]
+
+# Từ khóa liên quan đến hóa đơn/đơn hàng
+INVOICE_KEYWORDS = [
+    "hóa đơn", "hoá đơn", "bill", "invoice", "receipt", "đơn hàng", "order",
+    "biên lai", "phiếu thu", "chứng từ"
+]
+
+# Từ khóa tạo ảnh (đi kèm từ khóa hóa đơn)
+INVOICE_IMAGE_KEYWORDS = [
+    "tạo hình", "tạo ảnh", "vẽ ảnh", "vẽ hình", "generate image", "create an image",
+    "hình minh họa", "minh họa"
+]
+
+# Các cụm từ hỏi thông thường quanh một mã đơn hàng (có dấu và không dấu)
+ORDER_FILLER = [
+    "đơn hàng", "don hang", "đơn", "don", "mã đơn", "ma don", "mã", "ma", "số", "so",
+    "order", "orders", "kiểm tra", "kiem tra", "tra cứu", "tra cuu", "xem", "cho xem",
+    "trạng thái", "trang thai", "tình trạng", "tinh trang", "thông tin", "thong tin",
+    "chi tiết", "chi tiet", "hiện tại", "hien tai", "đang ở đâu", "dang o dau", "ở đâu", "o dau",
+    "đến đâu", "den dau", "tới đâu", "giao", "đang", "dang", "rồi", "roi", "thế nào", "the nao",
+    "ra sao", "như thế nào", "nhu the nao", "là", "la", "gì", "gi", "của tôi", "của mình",
+    "tôi", "toi", "mình", "minh", "của", "cua", "cho", "giúp", "giup", "với", "voi", "bạn", "ban",
+    "ơi", "oi", "ạ", "nhé", "nhe", "nha", "please", "check", "status", "track", "tracking",
+    "info", "details", "my", "of", "the", "where", "is", "what",
+]
+
+# Các cụm từ hỏi giá/tình trạng quanh một tên sản phẩm (có dấu và không dấu)
+PRODUCT_FILLER = [
+    "giá", "gia", "giá bán", "gia ban", "giá tiền", "gia tien", "bao nhiêu", "bao nhieu",
+    "bao nhiêu tiền", "bao nhieu tien", "là bao nhiêu", "la bao nhieu", "còn hàng", "con hang",
+    "hết hàng", "het hang", "còn không", "con khong", "còn", "con", "không", "khong", "ko",
+    "thông tin", "thong tin", "sản phẩm", "san pham", "chi tiết", "chi tiet", "đánh giá", "danh gia",
+    "cho hỏi", "cho hoi", "cho xem", "xem", "cho", "tôi", "toi", "mình", "minh", "là", "la",
+    "vậy", "vay", "bạn", "ban", "ơi", "oi", "ạ", "nhé", "nhe", "nha",
+    "price", "how much", "is", "the", "of", "in stock", "available", "info", "details", "what",
+]
+
+# Câu dài hơn ngưỡng này không phải câu tra cứu ngắn, để agent xử lý
+MAX_ROUTED_LENGTH = 200
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Các nhóm từ khóa, biên dịch một lần khi import
+KEYWORD_MATCHER = KeywordMatcher({
+    "image": IMAGE_KEYWORDS,
+    "invoice": INVOICE_KEYWORDS,
+    "invoice_image": INVOICE_IMAGE_KEYWORDS,
+})
+
+
+def image_intent(text: str) -> Optional[str]:
+    """Loại yêu cầu tạo ảnh: "invoice_image" (có cả từ khóa hóa đơn và tạo ảnh), "image", hoặc None"""
+    if not text:
+        return None
+    intents = KEYWORD_MATCHER.intents(text)
+    if "invoice" in intents and "invoice_image" in intents:
+        return "invoice_image"
+    if "image" in intents:
+        return "image"
+    return None
+
+
+def _usd(value) -> str:
+    value = float(value or 0)
+    return f"${value:,.0f}" if value.is_integer() else f"${value:,.2f}"
+
+
+def format_order(order: dict) -> str:
+    """Câu trả lời mẫu cho một đơn hàng"""
+    lines = [
+        f"**Đơn hàng {order['order_id']}**",
+        f"- Khách hàng: {order.get('customer_name', '')}",
+        f"- Ngày đặt: {order.get('order_date', '')}",
+        f"- Trạng thái: {order.get('status', '')}",
+    ]
+    if order.get("payment_method"):
+        lines.append(f"- Thanh toán: {order['payment_method']}")
+    if order.get("shipping_address"):
+        lines.append(f"- Địa chỉ giao hàng: {order['shipping_address']}")
+    items = order.get("items") or []
+    if items:
+        lines.append("- Sản phẩm:")
+        lines.extend(f"  - {item['name']} x{item['quantity']} - {item['price']:,} VNĐ" for item in items)
+    lines.append(f"- Tổng tiền: {order.get('total_amount', 0):,} VNĐ")
+    return "\n".join(lines)
+
+
+def format_order_not_found(order_id: str) -> str:
+    return f"Không tìm thấy đơn hàng **{order_id}**. Vui lòng kiểm tra lại mã đơn hàng."
+
+
+def format_product(product: dict) -> str:
+    """Câu trả lời mẫu cho một sản phẩm"""
+    details = ", ".join(str(product[key]) for key in ("brand", "category") if product.get(key))
+    lines = [f"**{product['name']}**" + (f" ({details})" if details else "")]
+    lines.append(f"- Giá: {_usd(product.get('price'))}")
+    lines.append(f"- Tình trạng: {'Còn hàng' if product.get('in_stock') else 'Hết hàng'}")
+    if product.get("rating") is not None:
+        lines.append(f"- Đánh giá: {product['rating']}/5")
+    return "\n".join(lines)
+
+
+class _ProductNames:
+    """Bảng tên sản phẩm theo dãy token của một phiên bản catalog"""
+
+    def __init__(self, products: List[dict], version: int):
+        self.version = version
+        # Dãy token của tên -> sản phẩm (None nếu nhiều sản phẩm trùng tên)
+        self.names: Dict[Tuple[str, ...], Optional[dict]] = {}
+        for product in products:
+            key = tuple(TOKEN_PATTERN.findall(normalize_text(str(product.get("name", "")))))
+            if key:
+                self.names[key] = None if key in self.names else product
+        self.max_tokens = max(map(len, self.names), default=0)
+
+    def find(self, tokens: List[str]) -> List[Tuple[int, int, Optional[dict]]]:
+        """Các tên sản phẩm xuất hiện trong dãy token: (đầu, cuối, sản phẩm), ưu tiên tên dài nhất"""
+        matches, start = [], 0
+        while start < len(tokens):
+            for end in range(min(len(tokens), start + self.max_tokens), start, -1):
+                key = tuple(tokens[start:end])
+                if key in self.names:
+                    matches.append((start, end, self.names[key]))
+                    start = end
+                    break
+            else:
+                start += 1
+        return matches
+
+
+class IntentRouter:
+    """Trả lời câu tra cứu đơn hàng / sản phẩm có độ tin cậy cao mà không gọi agent"""
+
+    def __init__(self, enabled: bool = True, catalog=product_catalog, order_source=get_order_source):
+        self.enabled = enabled
+        self.catalog = catalog
+        # Hàm trả về nguồn đơn hàng hiện tại
+        self.order_source = order_source
+        self.order_filler = keyword_pattern(ORDER_FILLER, whole_words=True)
+        self.product_filler = keyword_pattern(PRODUCT_FILLER, whole_words=True)
+        self._products: Optional[_ProductNames] = None
+        self._lock = threading.Lock()
+        self.routed: Dict[str, int] = {"order_lookup": 0, "product_lookup": 0}
+        self.fallbacks = 0
+
+    def route(self, message: str) -> Optional[dict]:
+        """{"intent", "response"} nếu trả lời được trực tiếp, None nếu cần agent"""
+        result = self._route(message) if self.enabled else None
+        with self._lock:
+            if result is None:
+                self.fallbacks += 1
+            else:
+                self.routed[result["intent"]] += 1
+        return result
+
+    def _route(self, message: str) -> Optional[dict]:
+        text = normalize_text(message).strip()
+        if not text or len(text) > MAX_ROUTED_LENGTH:
+            return None
+        intents = KEYWORD_MATCHER.intents(text)
+        if "image" in intents or "invoice_image" in intents:
+            return None
+
+        order_ids = {order_id.upper() for order_id in ORDER_ID_PATTERN.findall(text)}
+        if order_ids:
+            if len(order_ids) > 1 or not self._only_filler(ORDER_ID_PATTERN.sub(" ", text), self.order_filler):
+                return None
+            order_id = order_ids.pop()
+            order = self.order_source().get(order_id)
+            response = format_order(order) if order is not None else format_order_not_found(order_id)
+            return {"intent": "order_lookup", "response": response}
+
+        tokens = TOKEN_PATTERN.findall(text)
+        matches = self._product_names().find(tokens)
+        if len(matches) != 1 or matches[0][2] is None:
+            return None
+        start, end, product = matches[0]
+        if not self._only_filler(" ".join(tokens[:start] + tokens[end:]), self.product_filler):
+            return None
+        return {"intent": "product_lookup", "response": format_product(product)}
+
+    @staticmethod
+    def _only_filler(text: str, filler: re.Pattern) -> bool:
+        """Phần còn lại của câu chỉ gồm các cụm từ hỏi thông thường"""
+        return TOKEN_PATTERN.search(filler.sub(" ", text)) is None
+
+    def _product_names(self) -> _ProductNames:
+        version = self.catalog.version
+        names = self._products
+        if names is None or names.version != version:
+            with self._lock:
+                if self._products is None or self._products.version != version:
+                    self._products = _ProductNames(self.catalog.products, version)
+                names = self._products
+        return names
+
+    def stats(self) -> dict:
+        with self._lock:
+            routed = sum(self.routed.values())
+            total = routed + self.fallbacks
+            return {
+                "enabled": self.enabled,
+                "routed": dict(self.routed),
+                "fallbacks": self.fallbacks,
+                "routed_rate": routed / total if total else 0.0,
+            }
+
+
+def create_intent_router() -> IntentRouter:
+    """Tạo router theo cấu hình môi trường (mặc định bật)"""
+    return IntentRouter(enabled=os.getenv("INTENT_ROUTER", "1").lower() not in ("0", "false", "no"))
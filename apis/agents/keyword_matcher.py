@@ -0,0 +1,116 @@
+"""
+Keyword Matcher - Nhận diện nhiều nhóm từ khóa (intent) trong một lần quét
+- Mọi cụm từ của mọi intent được biên dịch một lần thành một regex dạng trie (gộp tiền tố chung,
+  ví dụ "tạo hình" / "tạo ảnh" -> "tạo (?:hình|ảnh)"): tại mỗi vị trí regex chỉ đi theo một nhánh,
+  chi phí không tăng tuyến tính theo số cụm từ như vòng any(k in t for k in keywords)
+- Khớp chồng lấn (lookahead) và cụm dài nhất tại mỗi vị trí; cụm ngắn nằm trong cụm dài được tính sẵn
+  khi biên dịch, nên kết quả tương đương kiểm tra từng cụm con chuỗi
+- Trả về mọi intent khớp kèm cụm từ và vị trí (trong text đã chuẩn hóa NFC + casefold)
+"""
+
+import re
+import unicodedata
+from typing import Dict, FrozenSet, Iterable, List, NamedTuple
+
+
+def normalize_text(text: str) -> str:
+    """Dạng chuẩn để so khớp: NFC (gộp dấu tổ hợp) và không phân biệt hoa thường"""
+    return unicodedata.normalize("NFC", text or "").casefold()
+
+
+def _trie_pattern(phrases: Iterable[str]) -> str:
+    """Regex (chưa biên dịch) khớp cụm dài nhất trong các cụm từ, tiền tố chung được gộp"""
+    trie: dict = {}
+    for phrase in phrases:
+        node = trie
+        for ch in phrase:
+            node = node.setdefault(ch, {})
+        node[""] = {}
+
+    def build(node: dict) -> str:
+        branches = [
+            (r"\s+" if ch == " " else re.escape(ch)) + build(child)
+            for ch, child in sorted(node.items())
+            if ch
+        ]
+        if not branches:
+            return ""
+        body = branches[0] if len(branches) == 1 else "(?:" + "|".join(branches) + ")"
+        if "" in node:
+            # Cụm từ có thể kết thúc tại đây: ưu tiên khớp tiếp cụm dài hơn
+            return (body if len(branches) > 1 else "(?:" + body + ")") + "?"
+        return body
+
+    return build(trie)
+
+
+def keyword_pattern(keywords: Iterable[str], whole_words: bool = False) -> "re.Pattern":
+    """Biên dịch danh sách cụm từ thành một regex dạng trie (khoảng trắng khớp một hoặc nhiều ký tự trắng)"""
+    phrases = {" ".join(normalize_text(k).split()) for k in keywords}
+    phrases.discard("")
+    body = _trie_pattern(phrases)
+    if whole_words:
+        return re.compile(rf"(?<!\w)(?:{body})(?!\w)")
+    return re.compile(body)
+
+
+class KeywordMatch(NamedTuple):
+    """Một lần xuất hiện của cụm từ thuộc một intent"""
+    intent: str
+    keyword: str
+    start: int
+    end: int
+
+
+class KeywordMatcher:
+    """Bộ khớp nhiều intent, mỗi intent là một danh sách cụm từ (biên dịch một lần khi tạo)"""
+
+    def __init__(self, intents: Dict[str, List[str]]):
+        # Cụm từ -> các intent chứa nó
+        owners: Dict[str, set] = {}
+        for intent, keywords in intents.items():
+            for keyword in keywords:
+                phrase = " ".join(normalize_text(keyword).split())
+                if phrase:
+                    owners.setdefault(phrase, set()).add(intent)
+        # Khớp cụm dài nhất tại mỗi vị trí: cụm của intent khác nằm trong nó cũng được tính là khớp
+        # (duyệt các chuỗi con của cụm từ: chi phí theo độ dài cụm, không theo số cụm)
+        self.intents_of: Dict[str, FrozenSet[str]] = {
+            phrase: frozenset().union(*(
+                owners[phrase[start:end]]
+                for start in range(len(phrase))
+                for end in range(start + 1, len(phrase) + 1)
+                if phrase[start:end] in owners
+            ))
+            for phrase in owners
+        }
+        self.names = tuple(intents)
+        # Lookahead để tìm cả các lần khớp chồng lấn; nhóm 1 là cụm từ khớp
+        self.pattern = re.compile(f"(?=({_trie_pattern(owners)}))") if owners else None
+
+    def _phrase(self, matched: str) -> str:
+        return " ".join(matched.split())
+
+    def finditer(self, text: str):
+        """Duyệt các lần khớp theo vị trí tăng dần (text đã chuẩn hóa bằng normalize_text)"""
+        if self.pattern is None:
+            return
+        for match in self.pattern.finditer(text):
+            keyword = self._phrase(match.group(1))
+            for intent in sorted(self.intents_of[keyword]):
+                yield KeywordMatch(intent, keyword, match.start(1), match.end(1))
+
+    def find(self, text: str) -> List[KeywordMatch]:
+        """Mọi lần khớp của mọi intent trong text, kèm vị trí"""
+        return list(self.finditer(normalize_text(text)))
+
+    def intents(self, text: str) -> FrozenSet[str]:
+        """Tập intent có ít nhất một cụm từ xuất hiện trong text"""
+        if self.pattern is None:
+            return frozenset()
+        found = set()
+        for match in self.pattern.finditer(normalize_text(text)):
+            found |= self.intents_of[self._phrase(match.group(1))]
+            if len(found) == len(self.names):
+                break
+        return frozenset(found)
@@ -0,0 +1,290 @@
+"""
+Response Cache - Cache câu trả lời của agent cho các câu hỏi lặp lại (bật bằng AGENT_RESPONSE_CACHE=1)
+- Chỉ áp dụng cho câu hỏi độc lập (ngữ cảnh chưa có lượt hội thoại trước, không tính lời chào
+  của phiên mới), vì câu hỏi nối tiếp phụ thuộc lịch sử
+- Tầng khớp chính xác: câu hỏi đã chuẩn hóa (chữ thường, gộp khoảng trắng, bỏ dấu câu ở cuối)
+- Tầng ngữ nghĩa (AGENT_RESPONSE_CACHE_SEMANTIC=1, cần sentence-transformers): câu hỏi gần nghĩa theo
+  cosine embedding, chỉ khi các con số/mã đơn trong hai câu trùng nhau ("ORD-2024-001" khác "ORD-2024-002")
+- Mỗi mục ghi phiên bản dữ liệu mà các tool đã dùng phụ thuộc vào (catalog sản phẩm, đơn hàng) và phiên bản
+  agent; dữ liệu đổi thì mục hết hiệu lực. Câu trả lời có dùng web_search chỉ sống theo TTL của cache tìm kiếm
+- Không cache câu trả lời rỗng hoặc có tool bị lỗi
+- Đếm hit (chính xác / ngữ nghĩa), miss, bỏ qua, mục hết hiệu lực và tỉ lệ hit
+"""
+
+import os
+import re
+import time
+import asyncio
+import threading
+from collections import OrderedDict
+from typing import Callable, Dict, List, Optional
+
+import numpy as np
+
+from .tools.search_cache import normalize_query
+
+
+# Nguồn dữ liệu mà kết quả của mỗi tool phụ thuộc vào
+TOOL_DEPENDENCIES = {
+    "product_search": ("products",),
+    "product_stats": ("products",),
+    "order_search": ("orders",),
+    "generate_image": ("orders",),
+}
+# Tool trả về dữ liệu thay đổi theo thời gian (không có phiên bản): giới hạn thời gian sống của câu trả lời
+VOLATILE_TOOLS = ("web_search",)
+
+
+def _entities(text: str) -> tuple:
+    """Các con số trong câu hỏi (mã đơn, model sản phẩm...), phải trùng khi khớp theo ngữ nghĩa"""
+    return tuple(sorted(set(re.findall(r"\d+", text))))
+
+
+class _Entry:
+    __slots__ = ("response", "deps", "expires_at", "vector", "entities")
+
+    def __init__(self, response: str, deps: Dict[str, int], expires_at: float, vector, entities: tuple):
+        self.response = response
+        self.deps = deps
+        self.expires_at = expires_at
+        self.vector = vector
+        self.entities = entities
+
+
+class ResponseCache:
+    """Cache câu trả lời của agent, khóa theo câu hỏi chuẩn hóa và phiên bản dữ liệu"""
+
+    def __init__(
+        self,
+        versions: Dict[str, Callable[[], int]],
+        enabled: bool = True,
+        ttl: float = 3600.0,
+        volatile_ttl: float = 600.0,
+        max_entries: int = 1024,
+        embed: Optional[Callable[[List[str]], np.ndarray]] = None,
+        similarity: float = 0.95,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        # Tên nguồn dữ liệu -> hàm lấy phiên bản hiện tại ("agent" luôn là phụ thuộc của mọi mục)
+        self.versions = versions
+        self.enabled = enabled
+        self.ttl = ttl
+        self.volatile_ttl = volatile_ttl
+        self.max_entries = max_entries
+        # Hàm embedding (danh sách câu -> ma trận vector đã chuẩn hóa), None là tắt tầng ngữ nghĩa
+        self.embed = embed
+        self.similarity = similarity
+        self._clock = clock
+        self._entries: "OrderedDict[str, _Entry]" = OrderedDict()
+        # Ma trận vector của các mục (dựng lại khi danh sách mục thay đổi)
+        self._matrix = None
+        self._matrix_keys: List[str] = []
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.semantic_hits = 0
+        self.misses = 0
+        self.skipped = 0
+        self.stores = 0
+        self.invalidated = 0
+
+    # ---- Dùng thay cho agent.aask_react_agent / agent.astream_react_agent ----
+
+    async def aask(self, agent, messages: list) -> str:
+        """Trả lời từ cache nếu có, ngược lại gọi agent.aask_react_agent và lưu kết quả"""
+        question = self._cacheable_question(messages)
+        if question is None:
+            return await agent.aask_react_agent(messages)
+        cached = await self._alookup(question)
+        if cached is not None:
+            return cached
+        versions = self.snapshot()
+        tool_trace = []
+        response = await agent.aask_react_agent(messages, tool_trace=tool_trace)
+        await self._astore(question, response, tool_trace, versions)
+        return response
+
+    async def astream(self, agent, messages: list):
+        """Như agent.astream_react_agent; khi trúng cache trả cả câu trả lời trong một token"""
+        question = self._cacheable_question(messages)
+        if question is None:
+            async for event in agent.astream_react_agent(messages):
+                yield event
+            return
+        cached = await self._alookup(question)
+        if cached is not None:
+            yield {"type": "token", "content": cached}
+            yield {"type": "final", "content": cached}
+            return
+        versions = self.snapshot()
+        tool_trace = []
+        async for event in agent.astream_react_agent(messages, tool_trace=tool_trace):
+            if event["type"] == "final":
+                await self._astore(question, event["content"], tool_trace, versions)
+            yield event
+
+    # ---- Tra cứu / lưu ----
+
+    def _cacheable_question(self, messages: list) -> Optional[str]:
+        if not self.enabled:
+            return None
+        turns = [message for message in messages if message.get("role") != "system"]
+        # Bỏ các lượt assistant đứng trước câu hỏi đầu tiên (lời chào cố định của phiên mới)
+        while turns and turns[0].get("role") == "assistant":
+            turns.pop(0)
+        if len(turns) != 1 or turns[0].get("role") != "user":
+            with self._lock:
+                self.skipped += 1
+            return None
+        return turns[0].get("content") or None
+
+    async def _alookup(self, question: str) -> Optional[str]:
+        if self.embed is None:
+            return self.lookup(question)
+        # Tính embedding tốn CPU: chạy ở thread khác
+        return await asyncio.get_running_loop().run_in_executor(None, self.lookup, question)
+
+    async def _astore(self, question: str, response: str, tool_trace: list, versions: Dict[str, int]):
+        if self.embed is None:
+            self.store(question, response, tool_trace, versions)
+        else:
+            await asyncio.get_running_loop().run_in_executor(None, self.store, question, response, tool_trace, versions)
+
+    def snapshot(self) -> Dict[str, int]:
+        """Phiên bản hiện tại của mọi nguồn dữ liệu (lấy trước khi gọi agent)"""
+        return {name: version() for name, version in self.versions.items()}
+
+    def lookup(self, question: str) -> Optional[str]:
+        """Câu trả lời đã cache cho câu hỏi, None nếu không có hoặc đã hết hiệu lực"""
+        key = normalize_query(question)
+        with self._lock:
+            entry = self._valid_entry(key)
+            if entry is not None:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return entry.response
+        if self.embed is not None and self._entries:
+            vector = self.embed([key])[0]
+            with self._lock:
+                match = self._nearest(vector, _entities(key))
+                if match is not None:
+                    self._entries.move_to_end(match)
+                    self.semantic_hits += 1
+                    return self._entries[match].response
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def store(self, question: str, response: str, tool_trace: list, versions: Dict[str, int]):
+        """Lưu câu trả lời cùng phiên bản dữ liệu (versions lấy từ snapshot() trước khi gọi agent)"""
+        if not response or any(getattr(message, "status", "success") == "error" for message in tool_trace):
+            return
+        names = {getattr(message, "name", None) for message in tool_trace}
+        deps = {"agent": versions["agent"]} if "agent" in versions else {}
+        for name in names:
+            for source in TOOL_DEPENDENCIES.get(name, ()):
+                if source in versions:
+                    deps[source] = versions[source]
+        ttl = min(self.ttl, self.volatile_ttl) if names & set(VOLATILE_TOOLS) else self.ttl
+        key = normalize_query(question)
+        vector = self.embed([key])[0] if self.embed is not None else None
+        with self._lock:
+            self._entries[key] = _Entry(response, deps, self._clock() + ttl, vector, _entities(key))
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+            self._matrix = None
+            self.stores += 1
+
+    def _valid_entry(self, key: str) -> Optional[_Entry]:
+        entry = self._entries.get(key)
+        if entry is None:
+            return None
+        if self._clock() >= entry.expires_at or any(
+            self.versions[name]() != version for name, version in entry.deps.items() if name in self.versions
+        ):
+            del self._entries[key]
+            self._matrix = None
+            self.invalidated += 1
+            return None
+        return entry
+
+    def _nearest(self, vector, entities: tuple) -> Optional[str]:
+        if self._matrix is None:
+            self._matrix_keys = [key for key, entry in self._entries.items() if entry.vector is not None]
+            self._matrix = (
+                np.stack([self._entries[key].vector for key in self._matrix_keys]) if self._matrix_keys else None
+            )
+        if self._matrix is None:
+            return None
+        keys, scores = self._matrix_keys, self._matrix @ vector
+        # Xét các ứng viên từ gần nhất, bỏ qua mục lệch con số hoặc đã hết hiệu lực
+        for index in np.argsort(-scores):
+            if scores[index] < self.similarity:
+                break
+            entry = self._entries.get(keys[index])
+            if entry is not None and entry.entities == entities and self._valid_entry(keys[index]) is not None:
+                return keys[index]
+        return None
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.semantic_hits + self.misses
+            return {
+                "enabled": self.enabled,
+                "semantic": self.embed is not None,
+                "entries": len(self._entries),
+                "hits": self.hits,
+                "semantic_hits": self.semantic_hits,
+                "misses": self.misses,
+                "skipped": self.skipped,
+                "stores": self.stores,
+                "invalidated": self.invalidated,
+                "hit_rate": (self.hits + self.semantic_hits) / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+            self._matrix = None
+
+
+def _create_embedder() -> Optional[Callable[[List[str]], np.ndarray]]:
+    from .tools.product_semantic import DEFAULT_MODEL
+
+    try:
+        from sentence_transformers import SentenceTransformer
+
+        model = SentenceTransformer(os.getenv("AGENT_RESPONSE_CACHE_MODEL", DEFAULT_MODEL), device="cpu")
+    except ImportError as e:
+        print(f"Semantic response cache disabled, missing dependency: {str(e)}")
+        return None
+    except Exception as e:
+        print(f"Error initializing semantic response cache: {str(e)}")
+        return None
+    return lambda texts: model.encode(
+        texts, normalize_embeddings=True, convert_to_numpy=True, show_progress_bar=False
+    )
+
+
+def create_response_cache() -> ResponseCache:
+    """Tạo cache câu trả lời theo cấu hình môi trường (mặc định tắt)"""
+    from .agent import agent_registry
+    from .tools.order_repository import get_order_source
+    from .tools.product_catalog import product_catalog
+    from .tools.web_search import search_cache
+
+    enabled = os.getenv("AGENT_RESPONSE_CACHE", "0").lower() in ("1", "true", "yes")
+    semantic = enabled and os.getenv("AGENT_RESPONSE_CACHE_SEMANTIC", "0").lower() in ("1", "true", "yes")
+    return ResponseCache(
+        versions={
+            "agent": lambda: agent_registry.generation,
+            "products": lambda: product_catalog.version,
+            "orders": lambda: get_order_source().version,
+        },
+        enabled=enabled,
+        ttl=float(os.getenv("AGENT_RESPONSE_CACHE_TTL", "3600")),
+        volatile_ttl=search_cache.ttl,
+        max_entries=int(os.getenv("AGENT_RESPONSE_CACHE_SIZE", "1024")),
+        embed=_create_embedder() if semantic else None,
+        similarity=float(os.getenv("AGENT_RESPONSE_CACHE_SIMILARITY", "0.95")),
+    )
@@ -1,19 +1,33 @@
 """
 Image generation tools for HiveSpace Agent.
-- Build invoice HTML from real order data (order_tool)
+- Build invoice HTML from real order data (order_repository)
 - Convert that HTML to an image (PNG) and return markdown
+- Rendering runs in a process pool (invoice_pool); async variants for the event loop
 - Provide general image markdown utility
 """
 
 from typing import Optional
 from pydantic import BaseModel, Field
-from langchain_core.tools import tool
+from langchain_core.tools import StructuredTool
 import urllib.parse
+import asyncio
 import os
 import re
 from datetime import datetime
-from PIL import Image, ImageDraw, ImageFont
-from .order_tool import order_search
+from .order_repository import get_order_source, ORDER_ID_PATTERN
+from .invoice_cache import InvoiceCache
+from .invoice_pool import create_invoice_pool
+from .invoice_renderer import invoice_data
+
+
+# Tăng khi đổi bố cục ảnh hóa đơn để không dùng lại ảnh cũ trong cache
+INVOICE_LAYOUT_VERSION = 2
+
+# Cache ảnh hóa đơn theo nội dung (INVOICE_CACHE_MAX_MB giới hạn các ảnh chưa chèn vào chat)
+invoice_cache = InvoiceCache(max_bytes=int(os.getenv("INVOICE_CACHE_MAX_MB", "200")) * 1024 * 1024)
+
+# Pool process vẽ ảnh hóa đơn (số worker, hàng đợi theo INVOICE_RENDER_*)
+invoice_pool = create_invoice_pool()
 
 
 def build_invoice_image_markdown(prompt: str, width: int = 400, height: int = 600) -> str:
@@ -58,34 +72,18 @@ def _select_order_by_prompt(prompt: str):
     """Chọn đơn hàng phù hợp dựa trên prompt (mã đơn, tên, trạng thái)."""
     p = prompt.lower()
     query = "gần đây"
+    source = get_order_source()
     
-    # Tìm mã đơn dạng ORD-YYYY-NNN - PRIORITY 1
-    match = re.search(r"ORD-\d{4}-\d{3}", prompt)
+    # Tìm mã đơn dạng ORD-YYYY-NNN - PRIORITY 1 (tra cứu trực tiếp qua chỉ mục)
+    match = ORDER_ID_PATTERN.search(prompt)
     if match:
-        query = match.group(0)
-        # Search for exact match first
-        data = order_search(query)
-        
-        # Kiểm tra cấu trúc dữ liệu trả về
-        if isinstance(data, dict):
-            orders = data.get("orders", [])
-            if orders:
-                # Find exact match
-                for order in orders:
-                    if order["order_id"].lower() == query.lower():
-                        return order
-                # If no exact match, return first match
-                return orders[0]
-        elif isinstance(data, list):
-            # Nếu data trả về trực tiếp là list orders
-            orders = data
-            if orders:
-                # Find exact match
-                for order in orders:
-                    if order["order_id"].lower() == query.lower():
-                        return order
-                # If no exact match, return first match
-                return orders[0]
+        order = source.get(match.group(0))
+        if order:
+            return order
+        # Không có mã chính xác: lấy đơn đầu tiên có mã chứa chuỗi này
+        orders = source.search(match.group(0), limit=1).orders
+        if orders:
+            return orders[0]
     
     # Tìm theo họ tên phổ biến - PRIORITY 2
     for name in ["nguyễn", "trần", "lê", "phạm", "hoàng", "vũ", "đặng", "bùi", "ngô", "lý"]:
@@ -99,38 +97,28 @@ def _select_order_by_prompt(prompt: str):
             query = st
             break
 
-    data = order_search(query)
-    
-    # Kiểm tra cấu trúc dữ liệu trả về
-    if isinstance(data, dict):
-        orders = data.get("orders", [])
-        if orders:
-            return orders[0]
-    elif isinstance(data, list):
-        # Nếu data trả về trực tiếp là list orders
-        if data:
-            return data[0]
-    
-    # fallback: lấy tất cả
-    data_all = order_search("")
+    orders = source.search(query, limit=1).orders
+    if orders:
+        return orders[0]
     
-    # Kiểm tra cấu trúc dữ liệu trả về
-    if isinstance(data_all, dict):
-        orders_all = data_all.get("orders", [])
-        return orders_all[0] if orders_all else None
-    elif isinstance(data_all, list):
-        # Nếu data trả về trực tiếp là list orders
-        return data_all[0] if data_all else None
-    
-    return None
+    # fallback: lấy đơn đầu tiên
+    orders_all = source.all(limit=1).orders
+    return orders_all[0] if orders_all else None
+
+
+def resolve_invoice_order(prompt: str) -> Optional[dict]:
+    """Chọn đơn hàng cho yêu cầu hóa đơn (gọi một lần rồi truyền đơn hàng cho các bước sau)."""
+    return _select_order_by_prompt(prompt)
 
 
-def build_invoice_html(prompt: str) -> tuple[str, str]:
-    """Tạo HTML hóa đơn từ dữ liệu thật trong order_tool.
+def build_invoice_html(prompt: str, order: Optional[dict] = None) -> tuple[str, str]:
+    """Tạo HTML hóa đơn từ dữ liệu thật trong order_repository.
 
+    order: đơn hàng đã chọn sẵn (nếu không có thì chọn theo prompt).
     Returns: (order_id, html_str)
     """
-    order = _select_order_by_prompt(prompt)
+    if order is None:
+        order = _select_order_by_prompt(prompt)
     if not order:
         # Trả về HTML tối giản nếu không có dữ liệu
         fallback_id = f"ORD-{datetime.now().strftime('%Y%m%d')}-000"
@@ -142,16 +130,17 @@ def build_invoice_html(prompt: str) -> tuple[str, str]:
 """
         return fallback_id, html
 
-    order_id = order["order_id"]
-    customer_name = order["customer_name"]
-    customer_email = order["customer_email"]
-    customer_phone = order["customer_phone"]
-    customer_address = order["shipping_address"]
-    items = order["items"]
-    subtotal = order["total_amount"]
-    tax = int(subtotal * 0.1)
-    shipping = 50000
-    total = subtotal + tax + shipping
+    data = invoice_data(order)
+    order_id = data["order_id"]
+    customer_name = data["customer_name"]
+    customer_email = data["customer_email"]
+    customer_phone = data["customer_phone"]
+    customer_address = data["customer_address"]
+    items = data["items"]
+    subtotal = data["subtotal"]
+    tax = data["tax"]
+    shipping = data["shipping"]
+    total = data["total"]
 
     # CSS tối giản để chụp ảnh đẹp nền trắng
     html = f"""
@@ -211,115 +200,113 @@ th, td {{ text-align:left; padding:8px; border-bottom:1px solid #ececec; font-si
     return order_id, html
 
 
-def invoice_html_to_image(order_id: str, html: str, width: int = 820, height: int = 1100) -> str:
-    """Convert invoice HTML to PNG using PIL and return markdown string to display it."""
+def _invoice_cache_file(order_id: str, order: Optional[dict], width: int, height: int) -> tuple[str, str]:
+    """Tên file ảnh trong cache và ngày in của hóa đơn"""
+    issued_on = datetime.now().strftime('%d/%m/%Y')
+    key = InvoiceCache.key(order_id, order, width, height, date=issued_on, layout=INVOICE_LAYOUT_VERSION)
+    return InvoiceCache.filename(order_id, key), issued_on
+
+
+def _invoice_markdown(order_id: str, image_filename: str) -> str:
+    # Return markdown with relative path for display
+    relative_path = f"../apis/invoice_images/{image_filename}"
+    return f"![Hóa đơn {order_id}]({relative_path})"
+
+
+def invoice_html_to_image(order_id: str, html: str, width: int = 820, height: int = 1100, order: Optional[dict] = None) -> str:
+    """Convert invoice HTML to PNG using PIL and return markdown string to display it.
+
+    Ảnh được cache theo nội dung (đơn hàng, kích thước, ngày in): trúng cache thì
+    không render lại. order là đơn hàng đã chọn sẵn, nếu không có thì tra theo order_id.
+    Việc vẽ chạy trong invoice_pool; thread hiện tại chờ tới khi vẽ xong.
+    """
     try:
-        # Get the absolute path to the apis directory
-        current_dir = os.path.dirname(os.path.abspath(__file__))  # tools directory
-        apis_dir = os.path.dirname(os.path.dirname(current_dir))  # apis directory
-        output_dir = os.path.join(apis_dir, "invoice_images")
-        
-        if not os.path.exists(output_dir):
-            os.makedirs(output_dir)
-        
-        image_filename = f"invoice_{order_id}.png"
-        image_path = os.path.join(output_dir, image_filename)
-        
-        # Create a simple invoice image using PIL instead of HTML conversion
-        # This is a fallback since html2image requires browser drivers
-        img = Image.new('RGB', (width, height), color='white')
-        draw = ImageDraw.Draw(img)
-        
-        # Try to use a default font, fallback to basic if not available
-        try:
-            # Try to use a larger font for headers
-            font_large = ImageFont.truetype("arial.ttf", 24)
-            font_medium = ImageFont.truetype("arial.ttf", 18)
-            font_small = ImageFont.load_default()
-        except:
-            # Fallback to default font
-            font_large = ImageFont.load_default()
-            font_medium = ImageFont.load_default()
-            font_small = ImageFont.load_default()
-        
-        # Draw invoice content
-        y_position = 50
-        
-        # Header
-        draw.text((50, y_position), f"HÓA ĐƠN - {order_id}", fill='black', font=font_large)
-        y_position += 40
-        
-        # Date
-        draw.text((50, y_position), f"Ngày: {datetime.now().strftime('%d/%m/%Y')}", fill='black', font=font_medium)
-        y_position += 30
-        
-        # Company info
-        draw.text((50, y_position), "HIVESPACE COMPANY", fill='black', font=font_medium)
-        y_position += 25
-        draw.text((50, y_position), "info@hivespace.com", fill='black', font=font_small)
-        y_position += 40
-        
-        # Get order data for the image - FIX: use the exact order_id
-        order = _select_order_by_prompt(order_id)  # Use the full order_id, not just the last part
-        if order:
-            # Customer info
-            draw.text((50, y_position), f"Khách hàng: {order['customer_name']}", fill='black', font=font_medium)
-            y_position += 25
-            draw.text((50, y_position), f"Email: {order['customer_email']}", fill='black', font=font_small)
-            y_position += 25
-            draw.text((50, y_position), f"Điện thoại: {order['customer_phone']}", fill='black', font=font_small)
-            y_position += 40
-            
-            # Products
-            draw.text((50, y_position), "Sản phẩm:", fill='black', font=font_medium)
-            y_position += 25
-            
-            for item in order['items'][:5]:  # Limit to 5 items to fit
-                item_text = f"• {item['name']} x{item['quantity']} - {item['price']:,} VNĐ"
-                draw.text((70, y_position), item_text, fill='black', font=font_small)
-                y_position += 20
-            
-            y_position += 20
-            
-            # Totals
-            subtotal = order['total_amount']
-            tax = int(subtotal * 0.1)
-            shipping = 50000
-            total = subtotal + tax + shipping
-            
-            draw.text((50, y_position), f"Tạm tính: {subtotal:,} VNĐ", fill='black', font=font_medium)
-            y_position += 25
-            draw.text((50, y_position), f"Thuế (10%): {tax:,} VNĐ", fill='black', font=font_medium)
-            y_position += 25
-            draw.text((50, y_position), f"Vận chuyển: {shipping:,} VNĐ", fill='black', font=font_medium)
-            y_position += 25
-            draw.text((50, y_position), f"TỔNG: {total:,} VNĐ", fill='black', font=font_large)
-        
-        # Save the image
-        img.save(image_path, 'PNG')
-        
-        # Return markdown with relative path for display
-        relative_path = f"../apis/invoice_images/{image_filename}"
-        md = f"![Hóa đơn {order_id}]({relative_path})"
-        return md
-        
+        if order is None:
+            order = _select_order_by_prompt(order_id)  # Use the full order_id, not just the last part
+        image_filename, issued_on = _invoice_cache_file(order_id, order, width, height)
+
+        # Ảnh được chèn vào tin nhắn chat: pin để lịch sử chat không trỏ tới file đã bị xóa
+        if not invoice_cache.get(image_filename, pin=True):
+            invoice_cache.put(image_filename, invoice_pool.render(order_id, order, width, height, issued_on), pin=True)
+
+        return _invoice_markdown(order_id, image_filename)
+
+    except Exception as e:
+        return f"Lỗi khi tạo ảnh hóa đơn: {str(e)}"
+
+
+async def arender_invoice_file(
+    order_id: str, order: Optional[dict], width: int = 820, height: int = 1100, pin: bool = False
+) -> tuple[str, Optional[bytes]]:
+    """Vẽ ảnh hóa đơn qua cache và invoice_pool.
+
+    pin=True khi ảnh được chèn vào tin nhắn chat (không bao giờ bị xóa khỏi cache).
+    Returns: (tên file trong invoice_cache, nội dung PNG vừa vẽ hoặc None nếu trúng cache)
+    """
+    image_filename, issued_on = _invoice_cache_file(order_id, order, width, height)
+    if invoice_cache.get(image_filename, pin=pin):
+        return image_filename, None
+    data = await invoice_pool.render_async(order_id, order, width, height, issued_on)
+    await asyncio.get_running_loop().run_in_executor(None, invoice_cache.put, image_filename, data, pin)
+    return image_filename, data
+
+
+async def ainvoice_html_to_image(order_id: str, html: str, width: int = 820, height: int = 1100, order: Optional[dict] = None) -> str:
+    """Bản async của invoice_html_to_image: chờ invoice_pool mà không chặn event loop"""
+    try:
+        loop = asyncio.get_running_loop()
+        if order is None:
+            order = await loop.run_in_executor(None, _select_order_by_prompt, order_id)
+        image_filename, _ = await arender_invoice_file(order_id, order, width, height, pin=True)
+        return _invoice_markdown(order_id, image_filename)
+
     except Exception as e:
         return f"Lỗi khi tạo ảnh hóa đơn: {str(e)}"
 
 
-@tool("generate_image", args_schema=GenerateImageInput, return_direct=True)
-def generate_image(prompt: str, image_type: str, width: Optional[int] = None, height: Optional[int] = None) -> str:
-    """Generate image markdown (invoice via HTML→IMG, or general)."""
+def render_invoice_markdown(prompt: str, width: int = 820, height: int = 1100) -> str:
+    """Chọn đơn hàng một lần, dựng HTML và ảnh hóa đơn (có cache), trả về markdown."""
+    order = resolve_invoice_order(prompt)
+    order_id, html = build_invoice_html(prompt, order)
+    return invoice_html_to_image(order_id, html, width, height, order=order)
+
+
+async def arender_invoice_markdown(prompt: str, width: int = 820, height: int = 1100) -> str:
+    """Bản async của render_invoice_markdown, dùng trong các endpoint async."""
+    loop = asyncio.get_running_loop()
+    order = await loop.run_in_executor(None, resolve_invoice_order, prompt)
+    order_id, html = build_invoice_html(prompt, order)
+    return await ainvoice_html_to_image(order_id, html, width, height, order=order)
+
+
+def _image_size(kind: str, width: Optional[int], height: Optional[int]) -> tuple[int, int]:
+    if kind == "invoice":
+        return width or 820, height or 1100
+    return width or 512, height or 512
+
+
+def _generate_image(prompt: str, image_type: str, width: Optional[int] = None, height: Optional[int] = None) -> str:
     kind = (image_type or "general").lower().strip()
+    w, h = _image_size(kind, width, height)
     if kind == "invoice":
-        order_id, html = build_invoice_html(prompt)
-        w = width if width else 820
-        h = height if height else 1100
-        return invoice_html_to_image(order_id, html, w, h)
-    else:
-        w = width if width else 512
-        h = height if height else 512
-        return build_general_image_markdown(prompt, w, h)
+        return render_invoice_markdown(prompt, w, h)
+    return build_general_image_markdown(prompt, w, h)
+
 
+async def _agenerate_image(prompt: str, image_type: str, width: Optional[int] = None, height: Optional[int] = None) -> str:
+    kind = (image_type or "general").lower().strip()
+    w, h = _image_size(kind, width, height)
+    if kind == "invoice":
+        return await arender_invoice_markdown(prompt, w, h)
+    return build_general_image_markdown(prompt, w, h)
 
 
+# Có cả bản sync và async: agent chạy async sẽ chờ invoice_pool mà không giữ thread của TOOL_EXECUTOR
+generate_image = StructuredTool.from_function(
+    func=_generate_image,
+    coroutine=_agenerate_image,
+    name="generate_image",
+    description="Generate image markdown (invoice via HTML→IMG, or general).",
+    args_schema=GenerateImageInput,
+    return_direct=True,
+)
@@ -0,0 +1,236 @@
+"""
+Invoice Batch - Tạo hóa đơn hàng loạt
+- Chọn đơn hàng theo danh sách mã đơn hoặc theo trạng thái (+ ngày đặt hàng)
+- Vẽ song song qua invoice_pool, dùng chung cache ảnh với hóa đơn đơn lẻ; mọi lô cộng lại chỉ dùng
+  tối đa INVOICE_BATCH_CONCURRENCY slot (mặc định một nửa hàng đợi của pool), phần còn lại dành cho
+  hóa đơn tương tác trong chat
+- Báo tiến độ từng đơn (dùng cho SSE), đóng gói thành ZIP (PNG + bảng kê CSV) hoặc PDF nhiều trang
+- File kết quả nằm ở invoice_batches/ và bị xóa sau INVOICE_BATCH_TTL giây
+"""
+
+import io
+import os
+import re
+import csv
+import time
+import uuid
+import asyncio
+import zipfile
+from typing import AsyncIterator, List, Optional, Tuple
+
+from PIL import Image
+
+from .image_tool import arender_invoice_file, invoice_cache, invoice_pool
+from .invoice_renderer import invoice_data
+from .order_repository import get_order_source
+
+
+BATCH_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "invoice_batches"
+)
+BATCH_FORMATS = ("zip", "pdf")
+# Số đơn tối đa trong một lô
+MAX_BATCH_ORDERS = int(os.getenv("INVOICE_BATCH_MAX_ORDERS", "1000"))
+# Thời gian giữ file kết quả (giây)
+BATCH_TTL = int(os.getenv("INVOICE_BATCH_TTL", "3600"))
+# Số trang PDF được giải mã cùng lúc khi ghi (giới hạn bộ nhớ)
+PDF_CHUNK_PAGES = 32
+# Số hóa đơn của các lô được vẽ cùng lúc, luôn nhỏ hơn hàng đợi của invoice_pool
+BATCH_CONCURRENCY = max(
+    1,
+    min(
+        int(os.getenv("INVOICE_BATCH_CONCURRENCY", "0")) or invoice_pool.max_pending // 2,
+        invoice_pool.max_pending - 1,
+    ),
+)
+
+_BATCH_ID = re.compile(r"[0-9a-f]{32}")
+
+# Cột của bảng kê trong file ZIP
+MANIFEST_FIELDS = (
+    "order_id", "customer_name", "customer_email", "customer_phone", "status", "order_date",
+    "subtotal", "tax", "shipping", "total", "file",
+)
+
+
+def select_batch_orders(
+    order_ids: Optional[List[str]] = None,
+    status: Optional[str] = None,
+    order_date: Optional[str] = None,
+) -> Tuple[List[dict], List[str], int]:
+    """Chọn đơn hàng cho lô hóa đơn.
+
+    Returns: (đơn hàng, mã đơn không tìm thấy, tổng số đơn khớp bộ lọc)
+    """
+    source = get_order_source()
+    if order_ids:
+        orders, missing, seen = [], [], set()
+        for order_id in order_ids:
+            key = order_id.strip().lower()
+            if not key or key in seen:
+                continue
+            seen.add(key)
+            order = source.get(key)
+            if order is None:
+                missing.append(order_id.strip())
+            else:
+                orders.append(order)
+        return orders, missing, len(orders)
+    page = source.find(status=status, order_date=order_date, limit=MAX_BATCH_ORDERS)
+    return page.orders, [], page.total
+
+
+def batch_path(batch_id: str) -> Optional[str]:
+    """Đường dẫn file kết quả của lô, None nếu không có (hoặc mã lô không hợp lệ)"""
+    if not _BATCH_ID.fullmatch(batch_id or ""):
+        return None
+    for fmt in BATCH_FORMATS:
+        path = os.path.join(BATCH_DIR, f"{batch_id}.{fmt}")
+        if os.path.exists(path):
+            return path
+    return None
+
+
+def cleanup_batches(ttl: int = BATCH_TTL):
+    """Xóa file kết quả đã quá hạn"""
+    if not os.path.isdir(BATCH_DIR):
+        return
+    expired_before = time.time() - ttl
+    for name in os.listdir(BATCH_DIR):
+        path = os.path.join(BATCH_DIR, name)
+        try:
+            if os.stat(path).st_mtime < expired_before:
+                os.remove(path)
+        except OSError:
+            pass
+
+
+def _load_cached_png(image_filename: str) -> Optional[bytes]:
+    try:
+        with open(os.path.join(invoice_cache.directory, image_filename), "rb") as f:
+            return f.read()
+    except OSError:
+        return None
+
+
+async def _render_png(order: dict) -> bytes:
+    loop = asyncio.get_running_loop()
+    image_filename, data = await arender_invoice_file(order["order_id"], order)
+    if data is None:
+        data = await loop.run_in_executor(None, _load_cached_png, image_filename)
+    if data is None:
+        # Ảnh bị đẩy khỏi cache giữa lúc kiểm tra và lúc đọc: vẽ lại
+        _, data = await arender_invoice_file(order["order_id"], order)
+    if data is None:
+        raise RuntimeError("không đọc được ảnh hóa đơn")
+    return data
+
+
+def _write_zip(path: str, invoices: List[Tuple[dict, bytes]]):
+    manifest = io.StringIO()
+    writer = csv.DictWriter(manifest, fieldnames=MANIFEST_FIELDS, extrasaction="ignore")
+    writer.writeheader()
+    # PNG đã nén sẵn, lưu nguyên (ZIP_STORED) cho nhanh
+    with zipfile.ZipFile(path, "w", compression=zipfile.ZIP_STORED) as archive:
+        for order, png in invoices:
+            filename = f"{order['order_id']}.png"
+            archive.writestr(filename, png)
+            writer.writerow({
+                **invoice_data(order),
+                "status": order.get("status"),
+                "order_date": order.get("order_date"),
+                "file": filename,
+            })
+        # utf-8-sig để Excel đọc đúng tiếng Việt
+        archive.writestr("manifest.csv", manifest.getvalue().encode("utf-8-sig"), compress_type=zipfile.ZIP_DEFLATED)
+
+
+def _write_pdf(path: str, invoices: List[Tuple[dict, bytes]]):
+    # Ghi từng nhóm trang (append) để không phải giữ mọi ảnh đã giải mã trong bộ nhớ
+    for start in range(0, len(invoices), PDF_CHUNK_PAGES):
+        pages = [Image.open(io.BytesIO(png)) for _, png in invoices[start:start + PDF_CHUNK_PAGES]]
+        pages[0].save(path, "PDF", save_all=True, append_images=pages[1:], append=start > 0, resolution=100)
+
+
+def write_batch_archive(batch_id: str, fmt: str, invoices: List[Tuple[dict, bytes]]) -> str:
+    """Đóng gói các hóa đơn thành file ZIP/PDF trong BATCH_DIR, trả về đường dẫn file"""
+    os.makedirs(BATCH_DIR, exist_ok=True)
+    path = os.path.join(BATCH_DIR, f"{batch_id}.{fmt}")
+    tmp_path = f"{path}.tmp"
+    try:
+        if fmt == "pdf":
+            _write_pdf(tmp_path, invoices)
+        else:
+            _write_zip(tmp_path, invoices)
+        os.replace(tmp_path, path)
+    finally:
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return path
+
+
+_slots_by_loop = {}
+
+
+def _batch_slots() -> asyncio.Semaphore:
+    """Semaphore dùng chung cho mọi lô chạy trên event loop hiện tại"""
+    loop = asyncio.get_running_loop()
+    slots = _slots_by_loop.get(loop)
+    if slots is None:
+        # Bỏ semaphore của các event loop đã đóng
+        for closed in [other for other in _slots_by_loop if other.is_closed()]:
+            del _slots_by_loop[closed]
+        slots = _slots_by_loop[loop] = asyncio.Semaphore(BATCH_CONCURRENCY)
+    return slots
+
+
+async def run_invoice_batch(orders: List[dict], fmt: str = "zip") -> AsyncIterator[dict]:
+    """Vẽ hóa đơn cho các đơn hàng song song rồi đóng gói.
+
+    Sinh các sự kiện tiến độ:
+    - {"type": "start", "batch_id", "total"}
+    - {"type": "progress", "done", "total", "order_id", "ok"} sau mỗi đơn
+    - {"type": "complete", "batch_id", "format", "count", "failed"}, hoặc {"type": "error", "message"}
+    """
+    batch_id = uuid.uuid4().hex
+    loop = asyncio.get_running_loop()
+    await loop.run_in_executor(None, cleanup_batches)
+    yield {"type": "start", "batch_id": batch_id, "total": len(orders)}
+
+    # Các đơn vượt quá BATCH_CONCURRENCY chờ ở đây, không chiếm slot của hóa đơn tương tác
+    slots = _batch_slots()
+
+    async def render(index: int, order: dict):
+        async with slots:
+            try:
+                return index, await _render_png(order), None
+            except Exception as e:
+                return index, None, str(e)
+
+    tasks = [asyncio.ensure_future(render(index, order)) for index, order in enumerate(orders)]
+    pngs: List[Optional[bytes]] = [None] * len(orders)
+    failed = []
+    try:
+        for done, next_result in enumerate(asyncio.as_completed(tasks), start=1):
+            index, png, error = await next_result
+            order_id = orders[index]["order_id"]
+            pngs[index] = png
+            if error is not None:
+                failed.append({"order_id": order_id, "error": error})
+            yield {"type": "progress", "done": done, "total": len(orders), "order_id": order_id, "ok": error is None}
+    finally:
+        # Client ngắt kết nối giữa chừng: hủy các đơn chưa vẽ
+        for task in tasks:
+            task.cancel()
+
+    invoices = [(order, png) for order, png in zip(orders, pngs) if png is not None]
+    if not invoices:
+        yield {"type": "error", "message": "Không tạo được hóa đơn nào", "failed": failed}
+        return
+    try:
+        await loop.run_in_executor(None, write_batch_archive, batch_id, fmt, invoices)
+    except Exception as e:
+        print(f"Error writing invoice batch {batch_id}: {str(e)}")
+        yield {"type": "error", "message": f"Không thể đóng gói hóa đơn: {str(e)}", "failed": failed}
+        return
+    yield {"type": "complete", "batch_id": batch_id, "format": fmt, "count": len(invoices), "failed": failed}
@@ -0,0 +1,154 @@
+"""
+Invoice Cache - Cache ảnh hóa đơn PNG theo nội dung
+- Khóa là hash của dữ liệu đơn hàng + kích thước ảnh + ngày in + phiên bản bố cục
+- Trúng cache thì không render lại và không ghi đĩa
+- Giới hạn dung lượng trên đĩa, xóa ảnh ít dùng nhất trước (LRU)
+- Ảnh đã được chèn vào tin nhắn chat (pin) không bao giờ bị xóa, vì lịch sử chat và câu trả lời
+  đã cache trỏ thẳng tới file; danh sách ảnh pin được ghi vào PINNED_FILE để còn nguyên sau khi restart.
+  Giới hạn dung lượng chỉ áp dụng cho ảnh chưa pin (ví dụ ảnh vẽ cho lô hóa đơn)
+"""
+
+import os
+import json
+import hashlib
+import threading
+from collections import OrderedDict
+from typing import Optional
+
+
+DEFAULT_CACHE_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "invoice_images"
+)
+
+# Chỉ các file có tiền tố này thuộc cache (ảnh cũ invoice_{order_id}.png không bị đụng tới)
+FILE_PREFIX = "invoice_"
+# Độ dài phần hash trong tên file
+KEY_LENGTH = 16
+# File (trong thư mục cache) liệt kê các ảnh đã pin, mỗi dòng một tên file
+PINNED_FILE = ".pinned"
+
+
+class InvoiceCache:
+    """Cache ảnh hóa đơn trên đĩa, đánh địa chỉ theo nội dung, LRU theo dung lượng"""
+
+    def __init__(self, directory: str = DEFAULT_CACHE_DIR, max_bytes: int = 200 * 1024 * 1024):
+        self.directory = directory
+        self.max_bytes = max_bytes
+        # tên file -> kích thước, theo thứ tự dùng gần nhất ở cuối (chỉ ảnh chưa pin)
+        self._entries: "OrderedDict[str, int]" = OrderedDict()
+        self._size = 0
+        # Ảnh đã pin: không tính vào dung lượng, không bị xóa
+        self._pinned = set()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+        self._scan()
+
+    @staticmethod
+    def key(order_id: str, order: Optional[dict], width: int, height: int, **render_inputs) -> str:
+        """Hash của mọi dữ liệu ảnh hưởng tới ảnh hóa đơn"""
+        payload = json.dumps(
+            {"order_id": order_id, "order": order, "size": [width, height], **render_inputs},
+            ensure_ascii=False,
+            sort_keys=True,
+            default=str,
+        )
+        return hashlib.sha256(payload.encode("utf-8")).hexdigest()[:KEY_LENGTH]
+
+    @staticmethod
+    def filename(order_id: str, key: str) -> str:
+        safe_id = "".join(ch if ch.isalnum() or ch in "-_" else "_" for ch in order_id)
+        return f"{FILE_PREFIX}{safe_id}_{key}.png"
+
+    def get(self, filename: str, pin: bool = False) -> bool:
+        """Kiểm tra ảnh đã có trong cache (và đánh dấu vừa được dùng); pin=True để giữ ảnh vĩnh viễn"""
+        with self._lock:
+            if filename in self._pinned and os.path.exists(os.path.join(self.directory, filename)):
+                self.hits += 1
+                return True
+            if filename in self._entries and os.path.exists(os.path.join(self.directory, filename)):
+                self._entries.move_to_end(filename)
+                self.hits += 1
+                if pin:
+                    self._pin(filename)
+                return True
+            if filename in self._entries:
+                # File đã bị xóa từ bên ngoài
+                self._size -= self._entries.pop(filename)
+            self.misses += 1
+            return False
+
+    def put(self, filename: str, data: bytes, pin: bool = False):
+        """Ghi ảnh vào cache (ghi file tạm rồi đổi tên), xóa bớt ảnh cũ nếu vượt dung lượng.
+
+        pin=True: ảnh sẽ được chèn vào tin nhắn chat, giữ vĩnh viễn và không tính vào dung lượng.
+        """
+        path = os.path.join(self.directory, filename)
+        tmp_path = f"{path}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+        with self._lock:
+            self._size -= self._entries.pop(filename, 0)
+            if pin or filename in self._pinned:
+                self._pin(filename)
+                return
+            self._entries[filename] = len(data)
+            self._size += len(data)
+            self._evict()
+
+    def _pin(self, filename: str):
+        # Gọi khi đang giữ self._lock
+        if filename in self._pinned:
+            return
+        self._size -= self._entries.pop(filename, 0)
+        self._pinned.add(filename)
+        with open(os.path.join(self.directory, PINNED_FILE), "a", encoding="utf-8") as f:
+            f.write(filename + "\n")
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "entries": len(self._entries),
+                "bytes": self._size,
+                "pinned": len(self._pinned),
+                "hits": self.hits,
+                "misses": self.misses,
+            }
+
+    def _evict(self):
+        while self._size > self.max_bytes and len(self._entries) > 1:
+            filename, size = self._entries.popitem(last=False)
+            self._size -= size
+            try:
+                os.remove(os.path.join(self.directory, filename))
+            except OSError:
+                pass
+
+    def _scan(self):
+        # Nạp lại chỉ mục từ các file đã có, file cũ nhất (mtime) được coi là ít dùng nhất
+        try:
+            with open(os.path.join(self.directory, PINNED_FILE), encoding="utf-8") as f:
+                pinned = {line.strip() for line in f if line.strip()}
+        except FileNotFoundError:
+            pinned = set()
+        files = []
+        for name in os.listdir(self.directory):
+            stem = name[len(FILE_PREFIX):-len(".png")] if name.startswith(FILE_PREFIX) and name.endswith(".png") else ""
+            key = stem.rpartition("_")[2]
+            if len(key) != KEY_LENGTH or any(ch not in "0123456789abcdef" for ch in key):
+                continue
+            try:
+                stat = os.stat(os.path.join(self.directory, name))
+            except OSError:
+                continue
+            if name in pinned:
+                continue
+            files.append((stat.st_mtime, name, stat.st_size))
+        with self._lock:
+            self._pinned = pinned
+            for _, name, size in sorted(files):
+                self._entries[name] = size
+                self._size += size
+            self._evict()
@@ -0,0 +1,245 @@
+"""
+Invoice Render Pool - Vẽ ảnh hóa đơn ở các process riêng
+- Vẽ bằng PIL và mã hóa PNG tốn CPU và giữ GIL, nên chạy trong ProcessPoolExecutor để tải được chia ra nhiều lõi
+- Mỗi worker nạp font và ảnh mẫu một lần khi khởi động (initializer)
+- Hàng đợi có giới hạn (INVOICE_RENDER_QUEUE): khi đầy, request chờ tối đa
+  INVOICE_RENDER_QUEUE_TIMEOUT giây; hết thời gian thì báo hệ thống đang bận (backpressure)
+- render() dùng cho tool và thread, render_async() dùng cho event loop: khi hàng đợi đầy,
+  coroutine chờ slot ngay trên event loop (không giữ thread nào); bị hủy trong lúc chờ thì slot
+  không bị mất
+- Mỗi lần vẽ chờ tối đa INVOICE_RENDER_TIMEOUT giây (nhỏ hơn AGENT_TOOL_TIMEOUT), để tool vẽ hóa đơn
+  không giữ mãi thread của agent khi một worker bị treo
+- Process con được tạo bằng "spawn" (đổi bằng INVOICE_RENDER_START_METHOD): pool được tạo muộn trong
+  process đã có nhiều thread (writer phiên chat, tìm kiếm, tool, uvicorn), fork lúc đó có thể làm
+  process con kẹt ở một khóa đang bị thread khác giữ
+- INVOICE_RENDER_WORKERS=0: vẽ bằng một thread trong process hiện tại, không tạo process con
+"""
+
+import os
+import asyncio
+import threading
+import multiprocessing
+from collections import deque
+from concurrent.futures import Future, ProcessPoolExecutor, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from typing import Optional
+
+from .invoice_renderer import get_invoice_renderer
+
+
+# Kích thước ảnh hóa đơn mặc định, được vẽ sẵn ảnh mẫu khi worker khởi động
+DEFAULT_SIZE = (820, 1100)
+
+# Cách tạo process worker mặc định (không dùng fork trong process nhiều thread)
+DEFAULT_START_METHOD = "spawn"
+
+
+class InvoiceQueueFull(RuntimeError):
+    """Hàng đợi vẽ hóa đơn đã đầy quá thời gian chờ"""
+
+
+class InvoiceRenderTimeout(RuntimeError):
+    """Vẽ hóa đơn không xong trong render_timeout giây"""
+
+
+def _init_worker():
+    get_invoice_renderer().template(*DEFAULT_SIZE)
+
+
+def _render(order_id: str, order: Optional[dict], width: int, height: int, issued_on: str) -> bytes:
+    return get_invoice_renderer().render(order_id, order, width, height, issued_on)
+
+
+def _warm() -> int:
+    return os.getpid()
+
+
+class InvoiceRenderPool:
+    """Pool vẽ ảnh hóa đơn với hàng đợi có giới hạn"""
+
+    def __init__(
+        self,
+        max_workers: int = os.cpu_count() or 1,
+        max_pending: Optional[int] = None,
+        queue_timeout: float = 10.0,
+        start_method: Optional[str] = DEFAULT_START_METHOD,
+        render_timeout: Optional[float] = 15.0,
+    ):
+        self.max_workers = max_workers
+        self.max_pending = max_pending or max(max_workers, 1) * 4
+        self.queue_timeout = queue_timeout
+        self.start_method = start_method
+        # Thời gian chờ tối đa cho một lần vẽ (sau khi có slot), None là chờ tới khi xong.
+        # Hết thời gian chỉ dừng việc chờ: việc vẽ vẫn giữ slot tới khi worker trả kết quả
+        self.render_timeout = render_timeout
+        self._executor = None
+        self._lock = threading.Lock()
+        # Mỗi hóa đơn đang vẽ hoặc đang chờ giữ một slot; thread chờ slot qua _slot_freed,
+        # coroutine chờ qua một asyncio future trong _async_waiters (slot được trao thẳng khi trả)
+        self._free_slots = self.max_pending
+        self._slot_freed = threading.Condition(self._lock)
+        self._async_waiters = deque()
+        self._pending = 0
+        self.completed = 0
+        self.rejected = 0
+        self.timeouts = 0
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                if self.max_workers <= 0:
+                    self._executor = ThreadPoolExecutor(
+                        max_workers=1, thread_name_prefix="invoice-render", initializer=_init_worker
+                    )
+                else:
+                    self._executor = ProcessPoolExecutor(
+                        max_workers=self.max_workers,
+                        mp_context=multiprocessing.get_context(self.start_method or DEFAULT_START_METHOD),
+                        initializer=_init_worker,
+                    )
+            return self._executor
+
+    def _reset_executor(self, broken):
+        # Worker bị chết (ví dụ hết bộ nhớ) làm hỏng cả ProcessPoolExecutor: tạo pool mới
+        with self._lock:
+            if self._executor is broken:
+                self._executor = None
+        broken.shutdown(wait=False)
+
+    def _submit(self, *args) -> Future:
+        """Gửi việc vẽ khi đã giữ slot; slot được trả lại khi việc kết thúc"""
+        with self._lock:
+            self._pending += 1
+        try:
+            executor = self._get_executor()
+            try:
+                future = executor.submit(_render, *args)
+            except BrokenProcessPool:
+                self._reset_executor(executor)
+                future = self._get_executor().submit(_render, *args)
+        except BaseException:
+            self._release()
+            raise
+        future.add_done_callback(lambda _: self._release(completed=True))
+        return future
+
+    def _release(self, completed: bool = False):
+        with self._lock:
+            self._pending -= 1
+            if completed:
+                self.completed += 1
+        self._release_slot()
+
+    def _take_slot(self) -> bool:
+        # Gọi khi đang giữ self._lock
+        if self._free_slots > 0:
+            self._free_slots -= 1
+            return True
+        return False
+
+    def _release_slot(self):
+        """Trả một slot: trao cho coroutine chờ lâu nhất, nếu không có thì đánh thức thread đang chờ"""
+        with self._lock:
+            while self._async_waiters:
+                loop, waiter = self._async_waiters.popleft()
+                if waiter.done():
+                    # Coroutine đã bị hủy hoặc hết thời gian chờ
+                    continue
+                try:
+                    loop.call_soon_threadsafe(self._grant_slot, waiter)
+                    return
+                except RuntimeError:
+                    # Event loop của coroutine đã đóng
+                    continue
+            self._free_slots += 1
+            self._slot_freed.notify()
+
+    def _grant_slot(self, waiter: asyncio.Future):
+        # Chạy trên event loop của coroutine đang chờ
+        if waiter.done():
+            # Bị hủy sau khi slot đã được trao: chuyển slot cho người chờ tiếp theo
+            self._release_slot()
+        else:
+            waiter.set_result(True)
+
+    def _rejected(self):
+        with self._lock:
+            self.rejected += 1
+        return InvoiceQueueFull("Hệ thống đang bận tạo hóa đơn, vui lòng thử lại sau.")
+
+    def _timed_out(self):
+        with self._lock:
+            self.timeouts += 1
+        return InvoiceRenderTimeout(f"Vẽ hóa đơn không xong trong {self.render_timeout:g} giây.")
+
+    def render(self, order_id: str, order: Optional[dict], width: int, height: int, issued_on: str) -> bytes:
+        """Vẽ hóa đơn (chặn thread hiện tại tới khi xong), trả về nội dung PNG"""
+        with self._slot_freed:
+            acquired = self._slot_freed.wait_for(self._take_slot, timeout=self.queue_timeout)
+        if not acquired:
+            raise self._rejected()
+        try:
+            return self._submit(order_id, order, width, height, issued_on).result(timeout=self.render_timeout)
+        except FutureTimeoutError:
+            raise self._timed_out() from None
+
+    async def render_async(self, order_id: str, order: Optional[dict], width: int, height: int, issued_on: str) -> bytes:
+        """Vẽ hóa đơn mà không chặn event loop, trả về nội dung PNG"""
+        waiter = None
+        with self._lock:
+            if not self._take_slot():
+                # Hàng đợi đầy: chờ tới khi một slot được trao cho coroutine này
+                loop = asyncio.get_running_loop()
+                waiter = loop.create_future()
+                self._async_waiters.append((loop, waiter))
+        if waiter is not None:
+            try:
+                await asyncio.wait_for(waiter, self.queue_timeout)
+            except asyncio.TimeoutError:
+                raise self._rejected() from None
+            except asyncio.CancelledError:
+                if waiter.done() and not waiter.cancelled():
+                    # Slot đã được trao đúng lúc bị hủy: trả lại
+                    self._release_slot()
+                raise
+        future = asyncio.wrap_future(self._submit(order_id, order, width, height, issued_on))
+        try:
+            return await asyncio.wait_for(future, self.render_timeout)
+        except asyncio.TimeoutError:
+            raise self._timed_out() from None
+
+    def warm(self):
+        """Khởi động sẵn các worker (nạp font, vẽ ảnh mẫu) trước request đầu tiên"""
+        executor = self._get_executor()
+        for future in [executor.submit(_warm) for _ in range(max(self.max_workers, 1))]:
+            future.result()
+
+    def stats(self) -> dict:
+        with self._lock:
+            return {
+                "workers": self.max_workers,
+                "pending": self._pending,
+                "max_pending": self.max_pending,
+                "free_slots": self._free_slots,
+                "waiting": sum(1 for _, waiter in self._async_waiters if not waiter.done()),
+                "completed": self.completed,
+                "rejected": self.rejected,
+                "timeouts": self.timeouts,
+            }
+
+    def shutdown(self):
+        with self._lock:
+            executor, self._executor = self._executor, None
+        if executor is not None:
+            executor.shutdown(wait=True, cancel_futures=True)
+
+
+def create_invoice_pool() -> InvoiceRenderPool:
+    """Tạo pool vẽ hóa đơn theo cấu hình môi trường"""
+    return InvoiceRenderPool(
+        max_workers=int(os.getenv("INVOICE_RENDER_WORKERS", str(os.cpu_count() or 1))),
+        max_pending=int(os.getenv("INVOICE_RENDER_QUEUE", "0")) or None,
+        queue_timeout=float(os.getenv("INVOICE_RENDER_QUEUE_TIMEOUT", "10")),
+        start_method=os.getenv("INVOICE_RENDER_START_METHOD") or DEFAULT_START_METHOD,
+        render_timeout=float(os.getenv("INVOICE_RENDER_TIMEOUT", "15")) or None,
+    )
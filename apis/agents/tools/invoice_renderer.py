@@ -0,0 +1,172 @@
+"""
+Invoice Renderer - Vẽ ảnh hóa đơn PNG bằng PIL
+- Font được tìm và nạp một lần khi khởi tạo (không thử truetype ở mỗi request)
+- Phần tĩnh (thông tin công ty, các nhãn, phí vận chuyển) được vẽ sẵn thành ảnh mẫu
+  theo kích thước và số sản phẩm; mỗi hóa đơn chỉ copy ảnh mẫu rồi vẽ các trường động
+- Ảnh đen trắng nên dùng ảnh xám (mode "L"): ít dữ liệu hơn, mã hóa PNG nhanh hơn
+- Mức nén PNG theo INVOICE_PNG_COMPRESS_LEVEL (mặc định 3: nhanh hơn mức 6 của PIL, file lớn hơn ~50%)
+"""
+
+import io
+import os
+import threading
+from typing import Dict, List, Optional, Tuple
+
+from PIL import Image, ImageDraw, ImageFont
+
+
+# Font thử lần lượt (INVOICE_FONT_PATH nếu có, sau đó arial.ttf), không có thì dùng font mặc định của PIL
+FONT_CANDIDATES = [path for path in (os.getenv("INVOICE_FONT_PATH"), "arial.ttf") if path]
+
+# Vị trí các phần của hóa đơn
+MARGIN_X = 50
+ITEM_X = 70
+BODY_Y = 185
+# Số sản phẩm tối đa vẽ trên ảnh
+MAX_ITEMS = 5
+SHIPPING_FEE = 50000
+TAX_RATE = 0.1
+
+
+def _layout(item_count: Optional[int]) -> List[Tuple[str, int, int, str, str]]:
+    """Các dòng của hóa đơn: (tên trường, x, y, font, nhãn tĩnh).
+
+    Vị trí phần tổng tiền phụ thuộc số sản phẩm; item_count=None là hóa đơn không có đơn hàng.
+    Dòng có tên trường rỗng là dòng tĩnh hoàn toàn.
+    """
+    rows = [
+        ("order_id", MARGIN_X, 50, "large", "HÓA ĐƠN - "),
+        ("issued_on", MARGIN_X, 90, "medium", "Ngày: "),
+        ("", MARGIN_X, 120, "medium", "HIVESPACE COMPANY"),
+        ("", MARGIN_X, 145, "small", "info@hivespace.com"),
+    ]
+    if item_count is None:
+        return rows
+    rows += [
+        ("customer_name", MARGIN_X, BODY_Y, "medium", "Khách hàng: "),
+        ("customer_email", MARGIN_X, BODY_Y + 25, "small", "Email: "),
+        ("customer_phone", MARGIN_X, BODY_Y + 50, "small", "Điện thoại: "),
+        ("", MARGIN_X, BODY_Y + 90, "medium", "Sản phẩm:"),
+    ]
+    rows += [(f"item_{i}", ITEM_X, BODY_Y + 115 + 20 * i, "small", "") for i in range(item_count)]
+    totals_y = BODY_Y + 115 + 20 * item_count + 20
+    rows += [
+        ("subtotal", MARGIN_X, totals_y, "medium", "Tạm tính: "),
+        ("tax", MARGIN_X, totals_y + 25, "medium", "Thuế (10%): "),
+        ("", MARGIN_X, totals_y + 50, "medium", f"Vận chuyển: {SHIPPING_FEE:,} VNĐ"),
+        ("total", MARGIN_X, totals_y + 75, "large", "TỔNG: "),
+    ]
+    return rows
+
+
+def invoice_data(order: dict) -> dict:
+    """Dữ liệu hiển thị trên hóa đơn (khách hàng, sản phẩm, thuế, phí vận chuyển, tổng tiền).
+
+    Dùng chung cho HTML hóa đơn, ảnh hóa đơn và bảng kê của hóa đơn hàng loạt.
+    """
+    subtotal = order["total_amount"]
+    tax = int(subtotal * TAX_RATE)
+    return {
+        "order_id": order["order_id"],
+        "customer_name": order["customer_name"],
+        "customer_email": order["customer_email"],
+        "customer_phone": order["customer_phone"],
+        "customer_address": order.get("shipping_address"),
+        "items": order["items"],
+        "subtotal": subtotal,
+        "tax": tax,
+        "shipping": SHIPPING_FEE,
+        "total": subtotal + tax + SHIPPING_FEE,
+    }
+
+
+def _field_values(order_id: str, order: Optional[dict], issued_on: str) -> Dict[str, str]:
+    """Giá trị các trường động của hóa đơn"""
+    values = {"order_id": order_id, "issued_on": issued_on}
+    if order:
+        data = invoice_data(order)
+        values.update(
+            customer_name=data["customer_name"],
+            customer_email=data["customer_email"],
+            customer_phone=data["customer_phone"],
+            subtotal=f"{data['subtotal']:,} VNĐ",
+            tax=f"{data['tax']:,} VNĐ",
+            total=f"{data['total']:,} VNĐ",
+        )
+        for i, item in enumerate(data["items"][:MAX_ITEMS]):
+            values[f"item_{i}"] = f"• {item['name']} x{item['quantity']} - {item['price']:,} VNĐ"
+    return values
+
+
+class InvoiceRenderer:
+    """Vẽ ảnh hóa đơn từ dữ liệu đơn hàng, dùng lại font và ảnh mẫu giữa các lần vẽ"""
+
+    def __init__(self, compress_level: int = int(os.getenv("INVOICE_PNG_COMPRESS_LEVEL", "3"))):
+        self.compress_level = compress_level
+        self.fonts = self._load_fonts()
+        # (width, height, số sản phẩm) -> ảnh mẫu đã vẽ phần tĩnh
+        self._templates: Dict[Tuple[int, int, Optional[int]], Image.Image] = {}
+        # (font, nhãn) -> độ rộng nhãn, giá trị động được vẽ ngay sau nhãn
+        self._label_widths: Dict[Tuple[str, str], float] = {}
+        self._lock = threading.Lock()
+
+    @staticmethod
+    def _load_fonts() -> Dict[str, ImageFont.ImageFont]:
+        for path in FONT_CANDIDATES:
+            try:
+                return {
+                    "large": ImageFont.truetype(path, 24),
+                    "medium": ImageFont.truetype(path, 18),
+                    "small": ImageFont.load_default(),
+                }
+            except Exception:
+                continue
+        default = ImageFont.load_default()
+        return {"large": default, "medium": default, "small": default}
+
+    def template(self, width: int, height: int, item_count: Optional[int] = None) -> Image.Image:
+        """Ảnh mẫu (nền trắng + thông tin công ty + các nhãn) cho một kích thước và số sản phẩm"""
+        key = (width, height, item_count)
+        template = self._templates.get(key)
+        if template is None:
+            with self._lock:
+                template = self._templates.get(key)
+                if template is None:
+                    template = Image.new("L", (width, height), color=255)
+                    draw = ImageDraw.Draw(template)
+                    for field, x, y, font, label in _layout(item_count):
+                        if label:
+                            draw.text((x, y), label, fill=0, font=self.fonts[font])
+                        if field:
+                            self._label_widths[(font, label)] = self.fonts[font].getlength(label) if label else 0
+                    self._templates[key] = template
+        return template
+
+    def render(self, order_id: str, order: Optional[dict], width: int, height: int, issued_on: str) -> bytes:
+        """Vẽ hóa đơn và trả về nội dung file PNG"""
+        item_count = min(len(order['items']), MAX_ITEMS) if order else None
+        img = self.template(width, height, item_count).copy()
+        draw = ImageDraw.Draw(img)
+        values = _field_values(order_id, order, issued_on)
+        for field, x, y, font, label in _layout(item_count):
+            if field:
+                offset = self._label_widths[(font, label)]
+                draw.text((x + offset, y), str(values[field]), fill=0, font=self.fonts[font])
+
+        buffer = io.BytesIO()
+        img.save(buffer, "PNG", compress_level=self.compress_level)
+        return buffer.getvalue()
+
+
+_renderer: Optional[InvoiceRenderer] = None
+_renderer_lock = threading.Lock()
+
+
+def get_invoice_renderer() -> InvoiceRenderer:
+    """Renderer dùng chung cho process hiện tại (tạo khi dùng lần đầu)"""
+    global _renderer
+    if _renderer is None:
+        with _renderer_lock:
+            if _renderer is None:
+                _renderer = InvoiceRenderer()
+    return _renderer
@@ -0,0 +1,438 @@
+"""
+Order Repository - Nguồn dữ liệu đơn hàng
+- OrderSource: interface nguồn đơn hàng (tra cứu, tìm kiếm có phân trang, thống kê trạng thái)
+- OrderRepository: nguồn trong bộ nhớ, tra cứu O(1) theo mã đơn hàng, email, số điện thoại
+  (chỉ mục băm), chỉ mục phụ theo trạng thái, số đơn theo trạng thái cập nhật tăng dần
+- SQLiteOrderSource (order_sqlite): nguồn SQLite, seed từ dữ liệu mẫu SAMPLE_ORDERS
+Chọn nguồn bằng biến môi trường ORDER_BACKEND (memory | sqlite) và ORDER_DB_PATH.
+"""
+
+import os
+import re
+import threading
+from abc import ABC, abstractmethod
+from typing import Dict, List, NamedTuple, Optional
+
+
+# Các trạng thái đơn hàng (theo thứ tự hiển thị)
+ORDER_STATUSES = ["Đã giao hàng", "Đang xử lý", "Đang giao hàng", "Chờ xác nhận", "Đã hủy"]
+
+ORDER_ID_PATTERN = re.compile(r"ORD-\d{4}-\d{3}", re.IGNORECASE)
+
+
+# Dữ liệu đơn hàng mẫu
+SAMPLE_ORDERS = [
+    {
+        "order_id": "ORD-2024-001",
+        "customer_name": "Nguyễn Văn An",
+        "customer_email": "nguyenvanan@email.com",
+        "customer_phone": "0901234567",
+        "order_date": "2024-01-15",
+        "status": "Đã giao hàng",
+        "total_amount": 2500000,
+        "payment_method": "Chuyển khoản",
+        "shipping_address": "123 Đường ABC, Quận 1, TP.HCM",
+        "items": [
+            {"product_id": 1, "name": "Laptop Dell XPS 13", "quantity": 1, "price": 1500000},
+            {"product_id": 31, "name": "AirPods Pro 2", "quantity": 1, "price": 1000000}
+        ]
+    },
+    {
+        "order_id": "ORD-2024-002",
+        "customer_name": "Trần Thị Bình",
+        "customer_email": "tranthibinh@email.com",
+        "customer_phone": "0912345678",
+        "order_date": "2024-01-16",
+        "status": "Đang xử lý",
+        "total_amount": 1800000,
+        "payment_method": "Tiền mặt",
+        "shipping_address": "456 Đường XYZ, Quận 3, TP.HCM",
+        "items": [
+            {"product_id": 2, "name": "iPhone 15 Pro", "quantity": 1, "price": 1200000},
+            {"product_id": 71, "name": "KitchenAid Stand Mixer", "quantity": 1, "price": 600000}
+        ]
+    },
+    {
+        "order_id": "ORD-2024-003",
+        "customer_name": "Lê Văn Cường",
+        "customer_email": "levancuong@email.com",
+        "customer_phone": "0923456789",
+        "order_date": "2024-01-17",
+        "status": "Đang giao hàng",
+        "total_amount": 3200000,
+        "payment_method": "Thẻ tín dụng",
+        "shipping_address": "789 Đường DEF, Quận 5, TP.HCM",
+        "items": [
+            {"product_id": 11, "name": "Gaming PC RTX 4080", "quantity": 1, "price": 2500000},
+            {"product_id": 44, "name": "Logitech G Pro X", "quantity": 1, "price": 130000},
+            {"product_id": 45, "name": "Razer DeathAdder V3", "quantity": 1, "price": 70000}
+        ]
+    },
+    {
+        "order_id": "ORD-2024-004",
+        "customer_name": "Phạm Thị Dung",
+        "customer_email": "phamthidung@email.com",
+        "customer_phone": "0934567890",
+        "order_date": "2024-01-18",
+        "status": "Chờ xác nhận",
+        "total_amount": 950000,
+        "payment_method": "Chuyển khoản",
+        "shipping_address": "321 Đường GHI, Quận 7, TP.HCM",
+        "items": [
+            {"product_id": 81, "name": "Herman Miller Aeron", "quantity": 1, "price": 1500000}
+        ]
+    },
+    {
+        "order_id": "ORD-2024-005",
+        "customer_name": "Hoàng Văn Em",
+        "customer_email": "hoangvanem@email.com",
+        "customer_phone": "0945678901",
+        "order_date": "2024-01-19",
+        "status": "Đã hủy",
+        "total_amount": 800000,
+        "payment_method": "Chuyển khoản",
+        "shipping_address": "654 Đường JKL, Quận 9, TP.HCM",
+        "items": [
+            {"product_id": 51, "name": "Canon EOS R5", "quantity": 1, "price": 3900000}
+        ]
+    },
+    {
+        "order_id": "ORD-2024-006",
+        "customer_name": "Vũ Thị Phương",
+        "customer_email": "vuthiphuong@email.com",
+        "customer_phone": "0956789012",
+        "order_date": "2024-01-20",
+        "status": "Đã giao hàng",
+        "total_amount": 450000,
+        "payment_method": "Tiền mặt",
+        "shipping_address": "987 Đường MNO, Quận 2, TP.HCM",
+        "items": [
+            {"product_id": 91, "name": "Nike Air Max 270", "quantity": 1, "price": 150000},
+            {"product_id": 92, "name": "Adidas Ultraboost 22", "quantity": 1, "price": 180000},
+            {"product_id": 99, "name": "Casio G-Shock", "quantity": 1, "price": 100000}
+        ]
+    },
+    {
+        "order_id": "ORD-2024-007",
+        "customer_name": "Đặng Văn Giang",
+        "customer_email": "dangvangiang@email.com",
+        "customer_phone": "0967890123",
+        "order_date": "2024-01-21",
+        "status": "Đang xử lý",
+        "total_amount": 1200000,
+        "payment_method": "Thẻ tín dụng",
+        "shipping_address": "147 Đường PQR, Quận 4, TP.HCM",
+        "items": [
+            {"product_id": 21, "name": "Google Pixel 8", "quantity": 1, "price": 700000},
+            {"product_id": 31, "name": "AirPods Pro 2", "quantity": 1, "price": 1000000}
+        ]
+    },
+    {
+        "order_id": "ORD-2024-008",
+        "customer_name": "Bùi Thị Hoa",
+        "customer_email": "buithihoa@email.com",
+        "customer_phone": "0978901234",
+        "order_date": "2024-01-22",
+        "status": "Đã giao hàng",
+        "total_amount": 2800000,
+        "payment_method": "Chuyển khoản",
+        "shipping_address": "258 Đường STU, Quận 6, TP.HCM",
+        "items": [
+            {"product_id": 13, "name": "Lenovo ThinkPad X1", "quantity": 1, "price": 1600000},
+            {"product_id": 81, "name": "Herman Miller Aeron", "quantity": 1, "price": 1500000}
+        ]
+    },
+    {
+        "order_id": "ORD-2024-009",
+        "customer_name": "Ngô Văn Inh",
+        "customer_email": "ngovaninh@email.com",
+        "customer_phone": "0989012345",
+        "order_date": "2024-01-23",
+        "status": "Đang giao hàng",
+        "total_amount": 600000,
+        "payment_method": "Tiền mặt",
+        "shipping_address": "369 Đường VWX, Quận 8, TP.HCM",
+        "items": [
+            {"product_id": 71, "name": "KitchenAid Stand Mixer", "quantity": 1, "price": 400000},
+            {"product_id": 75, "name": "Ninja Foodi 9-in-1", "quantity": 1, "price": 200000}
+        ]
+    },
+    {
+        "order_id": "ORD-2024-010",
+        "customer_name": "Lý Thị Kim",
+        "customer_email": "lythikim@email.com",
+        "customer_phone": "0990123456",
+        "order_date": "2024-01-24",
+        "status": "Chờ xác nhận",
+        "total_amount": 1500000,
+        "payment_method": "Chuyển khoản",
+        "shipping_address": "741 Đường YZA, Quận 10, TP.HCM",
+        "items": [
+            {"product_id": 41, "name": "Xbox Series X", "quantity": 1, "price": 500000},
+            {"product_id": 44, "name": "Logitech G Pro X", "quantity": 1, "price": 130000},
+            {"product_id": 45, "name": "Razer DeathAdder V3", "quantity": 1, "price": 70000}
+        ]
+    }
+]
+
+
+def normalize_phone(phone: str) -> str:
+    """Chỉ giữ chữ số, đổi tiền tố +84/84 thành 0 ("+84 901 234 567" -> "0901234567")"""
+    digits = re.sub(r"\D", "", phone or "")
+    if digits.startswith("84") and len(digits) >= 11:
+        digits = "0" + digits[2:]
+    return digits
+
+
+def looks_like_phone(query: str) -> bool:
+    return re.fullmatch(r"[\d\s.+-]{8,}", query) is not None
+
+
+class OrderPage(NamedTuple):
+    """Một trang kết quả đơn hàng"""
+    orders: List[dict]
+    # Tổng số đơn khớp (mọi trang)
+    total: int
+
+
+class OrderSource(ABC):
+    """Interface nguồn dữ liệu đơn hàng.
+
+    Thứ tự tìm kiếm: mã đơn chính xác, email, số điện thoại; còn lại là hợp của các đơn có
+    trạng thái chứa câu truy vấn và các đơn khớp chuỗi con trên mã đơn, tên khách hàng, email
+    (theo thứ tự thêm vào).
+    """
+
+    @property
+    def version(self) -> int:
+        """Tăng mỗi khi dữ liệu đơn hàng thay đổi"""
+        return 0
+
+    @abstractmethod
+    def get(self, order_id: str) -> Optional[dict]:
+        """Lấy đơn hàng theo mã, None nếu không có"""
+
+    @abstractmethod
+    def search(self, query: str, limit: Optional[int] = None, offset: int = 0) -> OrderPage:
+        """Tìm đơn hàng, trả về trang [offset, offset + limit) theo thứ tự thêm vào"""
+
+    def all(self, limit: Optional[int] = None, offset: int = 0) -> OrderPage:
+        """Tất cả đơn hàng (có phân trang) theo thứ tự thêm vào"""
+        return self.search("", limit, offset)
+
+    @abstractmethod
+    def find(
+        self,
+        status: Optional[str] = None,
+        order_date: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> OrderPage:
+        """Lọc đơn hàng theo đúng trạng thái và/hoặc ngày đặt hàng (tiền tố: "2024-01-15", "2024-01")"""
+
+    @abstractmethod
+    def status_counts(self) -> Dict[str, int]:
+        """Số đơn hàng theo từng trạng thái"""
+
+    @abstractmethod
+    def add(self, order: dict):
+        """Thêm hoặc thay thế một đơn hàng"""
+
+    @abstractmethod
+    def update_status(self, order_id: str, status: str) -> bool:
+        """Đổi trạng thái đơn hàng, False nếu không tồn tại"""
+
+    def close(self):
+        """Giải phóng tài nguyên"""
+
+
+class OrderRepository(OrderSource):
+    """Kho đơn hàng trong bộ nhớ với chỉ mục theo mã đơn, email, số điện thoại và trạng thái"""
+
+    def __init__(self, orders: Optional[List[dict]] = None):
+        # mã đơn (lowercase) -> đơn hàng, giữ thứ tự thêm vào
+        self._orders: Dict[str, dict] = {}
+        # email (lowercase) / số điện thoại (chỉ chữ số) -> các mã đơn
+        self._by_email: Dict[str, Dict[str, None]] = {}
+        self._by_phone: Dict[str, Dict[str, None]] = {}
+        # trạng thái -> các mã đơn (dict dùng như tập có thứ tự)
+        self._by_status: Dict[str, Dict[str, None]] = {}
+        # Thứ tự thêm vào của từng đơn, để kết quả gộp từ nhiều chỉ mục giữ đúng thứ tự
+        self._positions: Dict[str, int] = {}
+        self._sequence = 0
+        self._status_counts: Dict[str, int] = {status: 0 for status in ORDER_STATUSES}
+        self._lock = threading.RLock()
+        # Tăng mỗi khi dữ liệu thay đổi
+        self._version = 0
+        for order in orders or []:
+            self.add(order)
+
+    @property
+    def version(self) -> int:
+        """Phiên bản dữ liệu hiện tại của kho"""
+        return self._version
+
+    def __len__(self) -> int:
+        return len(self._orders)
+
+    def add(self, order: dict):
+        """Thêm hoặc thay thế một đơn hàng, cập nhật mọi chỉ mục"""
+        key = order["order_id"].lower()
+        with self._lock:
+            if key in self._orders:
+                self._unindex(key)
+            else:
+                self._positions[key] = self._sequence
+                self._sequence += 1
+            self._orders[key] = order
+            self._by_email.setdefault(order.get("customer_email", "").lower(), {})[key] = None
+            self._by_phone.setdefault(normalize_phone(order.get("customer_phone", "")), {})[key] = None
+            self._by_status.setdefault(order.get("status", ""), {})[key] = None
+            self._status_counts[order.get("status", "")] = self._status_counts.get(order.get("status", ""), 0) + 1
+            self._version += 1
+
+    def remove(self, order_id: str) -> bool:
+        """Xóa đơn hàng, trả về False nếu không tồn tại"""
+        key = order_id.lower()
+        with self._lock:
+            if key not in self._orders:
+                return False
+            self._unindex(key)
+            del self._orders[key]
+            del self._positions[key]
+            self._version += 1
+        return True
+
+    def update_status(self, order_id: str, status: str) -> bool:
+        """Đổi trạng thái đơn hàng (chỉ mục trạng thái và số đếm được cập nhật tăng dần)"""
+        with self._lock:
+            order = self.get(order_id)
+            if order is None:
+                return False
+            self.add(dict(order, status=status))
+        return True
+
+    def get(self, order_id: str) -> Optional[dict]:
+        """Lấy đơn hàng theo mã, None nếu không có"""
+        return self._orders.get(order_id.strip().lower())
+
+    def find_by_email(self, email: str) -> List[dict]:
+        return self._collect(self._by_email.get(email.strip().lower(), {}))
+
+    def find_by_phone(self, phone: str) -> List[dict]:
+        digits = normalize_phone(phone)
+        return self._collect(self._by_phone.get(digits, {})) if digits else []
+
+    def find_by_status(self, status: str) -> List[dict]:
+        return self._collect(self._by_status.get(status, {}))
+
+    def status_counts(self) -> Dict[str, int]:
+        """Số đơn hàng theo từng trạng thái"""
+        with self._lock:
+            return dict(self._status_counts)
+
+    def find(
+        self,
+        status: Optional[str] = None,
+        order_date: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> OrderPage:
+        if status:
+            orders = self.find_by_status(status)
+        else:
+            with self._lock:
+                orders = list(self._orders.values())
+        if order_date:
+            orders = [order for order in orders if (order.get("order_date") or "").startswith(order_date)]
+        end = None if limit is None else offset + limit
+        return OrderPage(orders=orders[offset:end], total=len(orders))
+
+    def search(self, query: str, limit: Optional[int] = None, offset: int = 0) -> OrderPage:
+        """Tìm đơn hàng theo mã đơn, email, số điện thoại, trạng thái hoặc tên khách hàng.
+
+        Mã đơn, email và số điện thoại được tra qua chỉ mục; nếu không khớp, kết quả là hợp của
+        các đơn có trạng thái chứa câu truy vấn và các đơn khớp chuỗi con trên mã đơn, tên, email.
+        """
+        orders = self._match(query.strip().lower())
+        end = None if limit is None else offset + limit
+        return OrderPage(orders=orders[offset:end], total=len(orders))
+
+    def _match(self, query_lower: str) -> List[dict]:
+        if not query_lower:
+            with self._lock:
+                return list(self._orders.values())
+
+        order = self._orders.get(query_lower)
+        if order is not None:
+            return [order]
+        if "@" in query_lower:
+            orders = self.find_by_email(query_lower)
+            if orders:
+                return orders
+        if looks_like_phone(query_lower):
+            orders = self.find_by_phone(query_lower)
+            if orders:
+                return orders
+
+        # Trạng thái: chỉ có vài giá trị nên so chuỗi con trên danh sách trạng thái, rồi gộp với các đơn
+        # khớp chuỗi con trên mã đơn, tên, email ("an" khớp cả "Đang ..." lẫn "Nguyễn Văn An")
+        keys = {}
+        with self._lock:
+            for status, bucket in self._by_status.items():
+                if query_lower in status.lower():
+                    keys.update(bucket)
+            for key, order in self._orders.items():
+                if (
+                    query_lower in key
+                    or query_lower in order.get("customer_name", "").lower()
+                    or query_lower in order.get("customer_email", "").lower()
+                ):
+                    keys[key] = None
+        return self._collect(keys)
+
+    def _collect(self, keys) -> List[dict]:
+        with self._lock:
+            ordered = sorted((k for k in keys if k in self._orders), key=self._positions.__getitem__)
+            return [self._orders[k] for k in ordered]
+
+    def _unindex(self, key: str):
+        order = self._orders[key]
+        for index, value in (
+            (self._by_email, order.get("customer_email", "").lower()),
+            (self._by_phone, normalize_phone(order.get("customer_phone", ""))),
+            (self._by_status, order.get("status", "")),
+        ):
+            bucket = index.get(value)
+            if bucket is not None:
+                bucket.pop(key, None)
+                if not bucket:
+                    del index[value]
+        self._status_counts[order.get("status", "")] -= 1
+
+
+def create_order_source() -> OrderSource:
+    """Tạo nguồn đơn hàng theo cấu hình môi trường"""
+    kind = os.getenv("ORDER_BACKEND", "memory").lower()
+    if kind == "sqlite":
+        from .order_sqlite import SQLiteOrderSource, DEFAULT_DB_PATH
+        source = SQLiteOrderSource(os.getenv("ORDER_DB_PATH", DEFAULT_DB_PATH))
+        if os.getenv("ORDER_DB_SEED", "1").lower() in ("1", "true", "yes"):
+            # Chỉ seed khi CSDL còn trống
+            source.seed(SAMPLE_ORDERS)
+        return source
+    return OrderRepository(SAMPLE_ORDERS)
+
+
+_order_source: Optional[OrderSource] = None
+_order_source_lock = threading.Lock()
+
+
+def get_order_source() -> OrderSource:
+    """Nguồn đơn hàng dùng chung cho toàn process (tạo khi dùng lần đầu)"""
+    global _order_source
+    if _order_source is None:
+        with _order_source_lock:
+            if _order_source is None:
+                _order_source = create_order_source()
+    return _order_source
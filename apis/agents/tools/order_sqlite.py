@@ -0,0 +1,316 @@
+"""
+SQLite Order Source - Nguồn đơn hàng trên SQLite
+- Pool kết nối dùng lại giữa các request (WAL, nhiều reader đồng thời)
+- Câu lệnh cố định có tham số, được SQLite cache dạng prepared statement trên từng kết nối
+- Chỉ mục trên các cột tìm kiếm: email, số điện thoại, trạng thái
+- Kết quả phân trang bằng LIMIT/OFFSET
+
+Seed dữ liệu giả lập để thử tải: python -m agents.tools.order_sqlite --orders 100000
+"""
+
+import os
+import json
+import queue
+import random
+import sqlite3
+import threading
+from contextlib import contextmanager
+from typing import Dict, List, Optional
+
+from .order_repository import OrderSource, OrderPage, ORDER_STATUSES, normalize_phone, looks_like_phone
+
+
+DEFAULT_DB_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "database", "orders.db"
+)
+
+# Các cột trả về cho mỗi đơn hàng (theo đúng cấu trúc dict của dữ liệu mẫu)
+ORDER_FIELDS = (
+    "order_id", "customer_name", "customer_email", "customer_phone", "order_date",
+    "status", "total_amount", "payment_method", "shipping_address", "items",
+)
+
+
+class SQLiteOrderSource(OrderSource):
+    """Nguồn đơn hàng SQLite với pool kết nối"""
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS orders (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        order_id TEXT NOT NULL,
+        order_key TEXT NOT NULL UNIQUE,
+        customer_name TEXT NOT NULL,
+        customer_email TEXT NOT NULL,
+        customer_phone TEXT NOT NULL,
+        order_date TEXT,
+        status TEXT NOT NULL,
+        total_amount INTEGER NOT NULL DEFAULT 0,
+        payment_method TEXT,
+        shipping_address TEXT,
+        items TEXT NOT NULL DEFAULT '[]',
+        email_key TEXT NOT NULL,
+        phone_key TEXT NOT NULL,
+        search_text TEXT NOT NULL
+    );
+    CREATE INDEX IF NOT EXISTS idx_orders_email ON orders(email_key);
+    CREATE INDEX IF NOT EXISTS idx_orders_phone ON orders(phone_key);
+    CREATE INDEX IF NOT EXISTS idx_orders_status ON orders(status, seq);
+    CREATE INDEX IF NOT EXISTS idx_orders_date ON orders(order_date);
+    """
+
+    _COLUMNS = ", ".join(ORDER_FIELDS)
+
+    _UPSERT = f"""
+    INSERT INTO orders ({_COLUMNS}, order_key, email_key, phone_key, search_text)
+    VALUES (:order_id, :customer_name, :customer_email, :customer_phone, :order_date,
+            :status, :total_amount, :payment_method, :shipping_address, :items,
+            :order_key, :email_key, :phone_key, :search_text)
+    ON CONFLICT(order_key) DO UPDATE SET
+        customer_name = excluded.customer_name,
+        customer_email = excluded.customer_email,
+        customer_phone = excluded.customer_phone,
+        order_date = excluded.order_date,
+        status = excluded.status,
+        total_amount = excluded.total_amount,
+        payment_method = excluded.payment_method,
+        shipping_address = excluded.shipping_address,
+        items = excluded.items,
+        email_key = excluded.email_key,
+        phone_key = excluded.phone_key,
+        search_text = excluded.search_text
+    """
+
+    _SELECT_BY_KEY = f"SELECT {_COLUMNS} FROM orders WHERE order_key = ?"
+
+    # Điều kiện tìm kiếm theo từng loại truy vấn (tham số đặt tên, không nối chuỗi giá trị)
+    _WHERE = {
+        "all": "1 = 1",
+        "email": "email_key = :value",
+        "phone": "phone_key = :value",
+        "text": "instr(search_text, :value) > 0",
+    }
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, pool_size: int = 4):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self._pool: "queue.Queue[sqlite3.Connection]" = queue.Queue()
+        self._connections: List[sqlite3.Connection] = []
+        for _ in range(pool_size):
+            conn = self._connect()
+            self._connections.append(conn)
+            self._pool.put(conn)
+        with self._connection() as conn:
+            conn.executescript(self._SCHEMA)
+        # SQLite chỉ có một writer tại một thời điểm
+        self._write_lock = threading.Lock()
+        self._version = 0
+        # (phiên bản, các trạng thái đang có) cho tìm kiếm theo chuỗi con trạng thái
+        self._status_cache = (-1, [])
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False, cached_statements=128)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    @contextmanager
+    def _connection(self):
+        """Mượn một kết nối từ pool"""
+        conn = self._pool.get()
+        try:
+            yield conn
+        finally:
+            self._pool.put(conn)
+
+    @property
+    def version(self) -> int:
+        return self._version
+
+    # ---- Đọc ----
+
+    def get(self, order_id: str) -> Optional[dict]:
+        with self._connection() as conn:
+            row = conn.execute(self._SELECT_BY_KEY, (order_id.strip().lower(),)).fetchone()
+        return self._order(row) if row else None
+
+    def search(self, query: str, limit: Optional[int] = None, offset: int = 0) -> OrderPage:
+        query_lower = query.strip().lower()
+        if not query_lower:
+            return self._page("all", None, limit, offset)
+
+        order = self.get(query_lower)
+        if order is not None:
+            return OrderPage(orders=[order], total=1)
+        if "@" in query_lower:
+            page = self._page("email", query_lower, limit, offset)
+            if page.total:
+                return page
+        if looks_like_phone(query_lower):
+            page = self._page("phone", normalize_phone(query_lower), limit, offset)
+            if page.total:
+                return page
+
+        # Hợp của các đơn có trạng thái chứa câu truy vấn (so chuỗi con trên vài giá trị trạng thái)
+        # và các đơn khớp chuỗi con trên mã đơn, tên, email
+        statuses = [status for status in self._statuses() if query_lower in status.lower()]
+        if statuses:
+            return self._status_or_text_page(statuses, query_lower, limit, offset)
+
+        return self._page("text", query_lower, limit, offset)
+
+    def _statuses(self) -> List[str]:
+        """Các giá trị trạng thái đang có, đọc lại khi dữ liệu đổi phiên bản"""
+        version, statuses = self._status_cache
+        if version != self._version:
+            with self._connection() as conn:
+                statuses = [row["status"] for row in conn.execute("SELECT DISTINCT status FROM orders")]
+            self._status_cache = (self._version, statuses)
+        return statuses
+
+    def status_counts(self) -> Dict[str, int]:
+        counts = {status: 0 for status in ORDER_STATUSES}
+        with self._connection() as conn:
+            for row in conn.execute("SELECT status, COUNT(*) AS n FROM orders GROUP BY status"):
+                counts[row["status"]] = row["n"]
+        return counts
+
+    def find(
+        self,
+        status: Optional[str] = None,
+        order_date: Optional[str] = None,
+        limit: Optional[int] = None,
+        offset: int = 0,
+    ) -> OrderPage:
+        conditions, params = [], {"limit": -1 if limit is None else limit, "offset": offset}
+        if status:
+            conditions.append("status = :status")
+            params["status"] = status
+        if order_date:
+            # Lọc tiền tố bằng khoảng giá trị để dùng được chỉ mục idx_orders_date
+            conditions.append("order_date >= :date_from AND order_date < :date_to")
+            params["date_from"], params["date_to"] = order_date, order_date + "\uffff"
+        where = " AND ".join(conditions) or "1 = 1"
+        with self._connection() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM orders WHERE {where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT {self._COLUMNS} FROM orders WHERE {where} ORDER BY seq LIMIT :limit OFFSET :offset",
+                params,
+            ).fetchall() if total else []
+        return OrderPage(orders=[self._order(row) for row in rows], total=total)
+
+    def _page(self, kind: str, value, limit: Optional[int], offset: int) -> OrderPage:
+        where = self._WHERE[kind]
+        params = {"value": value, "limit": -1 if limit is None else limit, "offset": offset}
+        with self._connection() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM orders WHERE {where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT {self._COLUMNS} FROM orders WHERE {where} ORDER BY seq LIMIT :limit OFFSET :offset",
+                params,
+            ).fetchall() if total else []
+        return OrderPage(orders=[self._order(row) for row in rows], total=total)
+
+    def _status_or_text_page(self, statuses: List[str], text: str, limit: Optional[int], offset: int) -> OrderPage:
+        placeholders = ", ".join("?" for _ in statuses)
+        where = f"status IN ({placeholders}) OR instr(search_text, ?) > 0"
+        params = [*statuses, text]
+        with self._connection() as conn:
+            total = conn.execute(f"SELECT COUNT(*) FROM orders WHERE {where}", params).fetchone()[0]
+            rows = conn.execute(
+                f"SELECT {self._COLUMNS} FROM orders WHERE {where} ORDER BY seq LIMIT ? OFFSET ?",
+                [*params, -1 if limit is None else limit, offset],
+            ).fetchall() if total else []
+        return OrderPage(orders=[self._order(row) for row in rows], total=total)
+
+    # ---- Ghi ----
+
+    def add(self, order: dict):
+        self.add_many([order])
+
+    def add_many(self, orders: List[dict]):
+        """Thêm hoặc cập nhật nhiều đơn hàng trong một transaction"""
+        rows = [self._row(order) for order in orders]
+        with self._write_lock, self._connection() as conn:
+            with conn:
+                conn.executemany(self._UPSERT, rows)
+            self._version += 1
+
+    def update_status(self, order_id: str, status: str) -> bool:
+        with self._write_lock, self._connection() as conn:
+            with conn:
+                cursor = conn.execute(
+                    "UPDATE orders SET status = ? WHERE order_key = ?", (status, order_id.strip().lower())
+                )
+            if cursor.rowcount:
+                self._version += 1
+        return cursor.rowcount > 0
+
+    def seed(self, orders: List[dict]) -> int:
+        """Nạp dữ liệu ban đầu nếu bảng còn trống, trả về số đơn đã thêm"""
+        with self._connection() as conn:
+            if conn.execute("SELECT 1 FROM orders LIMIT 1").fetchone():
+                return 0
+        self.add_many(orders)
+        return len(orders)
+
+    def close(self):
+        for conn in self._connections:
+            conn.close()
+
+    @staticmethod
+    def _row(order: dict) -> dict:
+        row = {field: order.get(field) for field in ORDER_FIELDS}
+        row["items"] = json.dumps(order.get("items", []), ensure_ascii=False)
+        row["total_amount"] = row["total_amount"] or 0
+        row["order_key"] = order["order_id"].lower()
+        row["email_key"] = (order.get("customer_email") or "").lower()
+        row["phone_key"] = normalize_phone(order.get("customer_phone", ""))
+        # Văn bản tìm kiếm chuỗi con (lowercase bằng Python để đúng cả chữ có dấu)
+        row["search_text"] = "\n".join(
+            (order.get(field) or "").lower() for field in ("order_id", "customer_name", "customer_email")
+        )
+        return row
+
+    @staticmethod
+    def _order(row) -> dict:
+        order = {field: row[field] for field in ORDER_FIELDS}
+        order["items"] = json.loads(order["items"] or "[]")
+        return order
+
+
+def generate_orders(count: int, start: int = 1, seed: int = 42) -> List[dict]:
+    """Sinh đơn hàng giả lập dựa trên dữ liệu mẫu (dùng để thử tải)"""
+    from .order_repository import SAMPLE_ORDERS
+
+    rng = random.Random(seed)
+    orders = []
+    for n in range(start, start + count):
+        template = rng.choice(SAMPLE_ORDERS)
+        orders.append(dict(
+            template,
+            order_id=f"ORD-{2025 + n // 1000}-{n % 1000:03d}",
+            customer_email=f"customer{n}@email.com",
+            customer_phone=f"09{n:08d}",
+            status=rng.choice(ORDER_STATUSES),
+        ))
+    return orders
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Seed CSDL đơn hàng SQLite")
+    parser.add_argument("--db", default=DEFAULT_DB_PATH, help="Đường dẫn file SQLite")
+    parser.add_argument("--orders", type=int, default=0, help="Số đơn hàng giả lập cần thêm")
+    args = parser.parse_args()
+
+    from .order_repository import SAMPLE_ORDERS
+
+    source = SQLiteOrderSource(args.db)
+    print(f"Seeded {source.seed(SAMPLE_ORDERS)} sample orders")
+    if args.orders:
+        batch = 10_000
+        for start in range(1, args.orders + 1, batch):
+            source.add_many(generate_orders(min(batch, args.orders - start + 1), start=start))
+        print(f"Added {args.orders} generated orders")
+    source.close()
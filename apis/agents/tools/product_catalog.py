@@ -0,0 +1,508 @@
+"""
+Product Catalog - Danh mục sản phẩm nạp sẵn và đánh chỉ mục cho product_search
+- Nạp một lần: sản phẩm mẫu + sản phẩm import từ apis/database/products.json
+- Chỉ mục đảo (inverted index) theo token của tên, danh mục, thương hiệu
+- Xếp hạng BM25, bỏ dấu tiếng Việt, khớp gần đúng theo trigram khi gõ sai
+- Lọc theo giá, tình trạng còn hàng, thương hiệu, đánh giá tối thiểu; giới hạn top_k
+- Tùy chọn trộn thêm điểm tìm kiếm ngữ nghĩa (xem product_semantic)
+- Tự nạp lại khi products.json thay đổi (mtime/kích thước)
+"""
+
+import difflib
+import heapq
+import json
+import math
+import os
+import re
+import threading
+import unicodedata
+from typing import Dict, List, NamedTuple, Optional, Tuple
+
+
+# Danh mục sản phẩm
+CATEGORIES = [
+    "Electronics", "Computers", "Mobile", "Audio", "Gaming", "Photography", 
+    "Home & Garden", "Kitchen", "Furniture", "Fashion", "Sports", "Books", 
+    "Automotive", "Health", "Beauty", "Toys", "Office", "Outdoor", "Art", "Food"
+]
+
+# Dữ liệu sản phẩm mẫu
+BUILTIN_PRODUCTS = [
+    # Electronics (1-10)
+    {"id": 1, "name": "Laptop Dell XPS 13", "price": 1500, "category": "Electronics", "in_stock": True, "brand": "Dell", "rating": 4.8},
+    {"id": 2, "name": "iPhone 15 Pro", "price": 1200, "category": "Electronics", "in_stock": False, "brand": "Apple", "rating": 4.9},
+    {"id": 3, "name": "Samsung Galaxy S24", "price": 1100, "category": "Electronics", "in_stock": True, "brand": "Samsung", "rating": 4.7},
+    {"id": 4, "name": "MacBook Air M2", "price": 1300, "category": "Electronics", "in_stock": True, "brand": "Apple", "rating": 4.9},
+    {"id": 5, "name": "iPad Pro 12.9", "price": 900, "category": "Electronics", "in_stock": True, "brand": "Apple", "rating": 4.8},
+    {"id": 6, "name": "Sony WH-1000XM5", "price": 400, "category": "Electronics", "in_stock": False, "brand": "Sony", "rating": 4.9},
+    {"id": 7, "name": "DJI Mini 3 Pro", "price": 800, "category": "Electronics", "in_stock": True, "brand": "DJI", "rating": 4.8},
+    {"id": 8, "name": "GoPro Hero 11", "price": 500, "category": "Electronics", "in_stock": True, "brand": "GoPro", "rating": 4.7},
+    {"id": 9, "name": "Nintendo Switch OLED", "price": 350, "category": "Electronics", "in_stock": True, "brand": "Nintendo", "rating": 4.8},
+    {"id": 10, "name": "PlayStation 5", "price": 500, "category": "Electronics", "in_stock": False, "brand": "Sony", "rating": 4.9},
+
+    # Computers (11-20)
+    {"id": 11, "name": "Gaming PC RTX 4080", "price": 2500, "category": "Computers", "in_stock": True, "brand": "Custom", "rating": 4.9},
+    {"id": 12, "name": "iMac 27-inch", "price": 1800, "category": "Computers", "in_stock": True, "brand": "Apple", "rating": 4.8},
+    {"id": 13, "name": "Lenovo ThinkPad X1", "price": 1600, "category": "Computers", "in_stock": True, "brand": "Lenovo", "rating": 4.7},
+    {"id": 14, "name": "HP Spectre x360", "price": 1400, "category": "Computers", "in_stock": True, "brand": "HP", "rating": 4.6},
+    {"id": 15, "name": "ASUS ROG Strix", "price": 2200, "category": "Computers", "in_stock": True, "brand": "ASUS", "rating": 4.8},
+    {"id": 16, "name": "Mac Mini M2", "price": 700, "category": "Computers", "in_stock": True, "brand": "Apple", "rating": 4.7},
+    {"id": 17, "name": "Dell Precision 5570", "price": 2800, "category": "Computers", "in_stock": True, "brand": "Dell", "rating": 4.8},
+    {"id": 18, "name": "MSI Creator Z16", "price": 1900, "category": "Computers", "in_stock": True, "brand": "MSI", "rating": 4.7},
+    {"id": 19, "name": "Razer Blade 15", "price": 2400, "category": "Computers", "in_stock": False, "brand": "Razer", "rating": 4.8},
+    {"id": 20, "name": "Alienware x17", "price": 3000, "category": "Computers", "in_stock": True, "brand": "Alienware", "rating": 4.9},
+
+    # Mobile (21-30)
+    {"id": 21, "name": "Google Pixel 8", "price": 700, "category": "Mobile", "in_stock": True, "brand": "Google", "rating": 4.7},
+    {"id": 22, "name": "OnePlus 12", "price": 800, "category": "Mobile", "in_stock": True, "brand": "OnePlus", "rating": 4.6},
+    {"id": 23, "name": "Xiaomi 14 Ultra", "price": 900, "category": "Mobile", "in_stock": True, "brand": "Xiaomi", "rating": 4.5},
+    {"id": 24, "name": "Nothing Phone 2", "price": 600, "category": "Mobile", "in_stock": True, "brand": "Nothing", "rating": 4.4},
+    {"id": 25, "name": "ASUS ROG Phone 8", "price": 1000, "category": "Mobile", "in_stock": True, "brand": "ASUS", "rating": 4.7},
+    {"id": 26, "name": "Samsung Galaxy Z Fold 5", "price": 1800, "category": "Mobile", "in_stock": True, "brand": "Samsung", "rating": 4.8},
+    {"id": 27, "name": "iPhone 15 Plus", "price": 900, "category": "Mobile", "in_stock": True, "brand": "Apple", "rating": 4.8},
+    {"id": 28, "name": "Motorola Edge 40", "price": 500, "category": "Mobile", "in_stock": True, "brand": "Motorola", "rating": 4.3},
+    {"id": 29, "name": "Realme GT Neo 5", "price": 400, "category": "Mobile", "in_stock": True, "brand": "Realme", "rating": 4.4},
+    {"id": 30, "name": "Vivo X100 Pro", "price": 850, "category": "Mobile", "in_stock": True, "brand": "Vivo", "rating": 4.6},
+
+    # Audio (31-40)
+    {"id": 31, "name": "AirPods Pro 2", "price": 250, "category": "Audio", "in_stock": True, "brand": "Apple", "rating": 4.8},
+    {"id": 32, "name": "Bose QuietComfort 45", "price": 350, "category": "Audio", "in_stock": True, "brand": "Bose", "rating": 4.7},
+    {"id": 33, "name": "Sennheiser HD 660S", "price": 500, "category": "Audio", "in_stock": True, "brand": "Sennheiser", "rating": 4.8},
+    {"id": 34, "name": "Audio-Technica ATH-M50x", "price": 150, "category": "Audio", "in_stock": True, "brand": "Audio-Technica", "rating": 4.6},
+    {"id": 35, "name": "JBL Charge 5", "price": 180, "category": "Audio", "in_stock": True, "brand": "JBL", "rating": 4.5},
+    {"id": 36, "name": "Ultimate Ears Boom 3", "price": 130, "category": "Audio", "in_stock": True, "brand": "Ultimate Ears", "rating": 4.4},
+    {"id": 37, "name": "Shure SM7B", "price": 400, "category": "Audio", "in_stock": True, "brand": "Shure", "rating": 4.9},
+    {"id": 38, "name": "Focal Utopia", "price": 4000, "category": "Audio", "in_stock": False, "brand": "Focal", "rating": 4.9},
+    {"id": 39, "name": "Audeze LCD-4", "price": 4000, "category": "Audio", "in_stock": True, "brand": "Audeze", "rating": 4.8},
+    {"id": 40, "name": "Campfire Audio Andromeda", "price": 1100, "category": "Audio", "in_stock": True, "brand": "Campfire Audio", "rating": 4.7},
+
+    # Gaming (41-50)
+    {"id": 41, "name": "Xbox Series X", "price": 500, "category": "Gaming", "in_stock": True, "brand": "Microsoft", "rating": 4.8},
+    {"id": 42, "name": "Nintendo Switch Lite", "price": 200, "category": "Gaming", "in_stock": True, "brand": "Nintendo", "rating": 4.6},
+    {"id": 43, "name": "Steam Deck OLED", "price": 550, "category": "Gaming", "in_stock": True, "brand": "Valve", "rating": 4.7},
+    {"id": 44, "name": "Logitech G Pro X", "price": 130, "category": "Gaming", "in_stock": True, "brand": "Logitech", "rating": 4.5},
+    {"id": 45, "name": "Razer DeathAdder V3", "price": 70, "category": "Gaming", "in_stock": True, "brand": "Razer", "rating": 4.6},
+    {"id": 46, "name": "Corsair K100 RGB", "price": 230, "category": "Gaming", "in_stock": True, "brand": "Corsair", "rating": 4.7},
+    {"id": 47, "name": "HyperX Cloud Alpha", "price": 100, "category": "Gaming", "in_stock": True, "brand": "HyperX", "rating": 4.5},
+    {"id": 48, "name": "BenQ ZOWIE XL2546K", "price": 400, "category": "Gaming", "in_stock": True, "brand": "BenQ", "rating": 4.6},
+    {"id": 49, "name": "Elgato Stream Deck", "price": 150, "category": "Gaming", "in_stock": True, "brand": "Elgato", "rating": 4.7},
+    {"id": 50, "name": "Astro A50", "price": 300, "category": "Gaming", "in_stock": True, "brand": "Astro", "rating": 4.6},
+
+    # Photography (51-60)
+    {"id": 51, "name": "Canon EOS R5", "price": 3900, "category": "Photography", "in_stock": True, "brand": "Canon", "rating": 4.9},
+    {"id": 52, "name": "Sony A7 IV", "price": 2500, "category": "Photography", "in_stock": True, "brand": "Sony", "rating": 4.8},
+    {"id": 53, "name": "Nikon Z6 II", "price": 2000, "category": "Photography", "in_stock": True, "brand": "Nikon", "rating": 4.7},
+    {"id": 54, "name": "Fujifilm X-T5", "price": 1700, "category": "Photography", "in_stock": True, "brand": "Fujifilm", "rating": 4.8},
+    {"id": 55, "name": "Leica M11", "price": 9000, "category": "Photography", "in_stock": False, "brand": "Leica", "rating": 4.9},
+    {"id": 56, "name": "Sigma fp L", "price": 2500, "category": "Photography", "in_stock": True, "brand": "Sigma", "rating": 4.6},
+    {"id": 57, "name": "Panasonic Lumix S5", "price": 2000, "category": "Photography", "in_stock": True, "brand": "Panasonic", "rating": 4.7},
+    {"id": 58, "name": "Olympus OM-1", "price": 2200, "category": "Photography", "in_stock": True, "brand": "Olympus", "rating": 4.7},
+    {"id": 59, "name": "Hasselblad X2D", "price": 8200, "category": "Photography", "in_stock": True, "brand": "Hasselblad", "rating": 4.9},
+    {"id": 60, "name": "Pentax K-3 III", "price": 1900, "category": "Photography", "in_stock": True, "brand": "Pentax", "rating": 4.6},
+
+    # Home & Garden (61-70)
+    {"id": 61, "name": "Philips Hue Starter Kit", "price": 200, "category": "Home & Garden", "in_stock": True, "brand": "Philips", "rating": 4.6},
+    {"id": 62, "name": "Ring Video Doorbell", "price": 100, "category": "Home & Garden", "in_stock": True, "brand": "Ring", "rating": 4.5},
+    {"id": 63, "name": "Nest Learning Thermostat", "price": 250, "category": "Home & Garden", "in_stock": True, "brand": "Nest", "rating": 4.7},
+    {"id": 64, "name": "Roomba i7+", "price": 800, "category": "Home & Garden", "in_stock": True, "brand": "iRobot", "rating": 4.6},
+    {"id": 65, "name": "Dyson V15 Detect", "price": 700, "category": "Home & Garden", "in_stock": True, "brand": "Dyson", "rating": 4.8},
+    {"id": 66, "name": "Weber Genesis II", "price": 800, "category": "Home & Garden", "in_stock": True, "brand": "Weber", "rating": 4.7},
+    {"id": 67, "name": "DeWalt 20V Max", "price": 300, "category": "Home & Garden", "in_stock": True, "brand": "DeWalt", "rating": 4.6},
+    {"id": 68, "name": "Black & Decker 20V", "price": 150, "category": "Home & Garden", "in_stock": True, "brand": "Black & Decker", "rating": 4.4},
+    {"id": 69, "name": "Milwaukee M18", "price": 400, "category": "Home & Garden", "in_stock": True, "brand": "Milwaukee", "rating": 4.7},
+    {"id": 70, "name": "Ryobi 18V One+", "price": 200, "category": "Home & Garden", "in_stock": True, "brand": "Ryobi", "rating": 4.5},
+
+    # Kitchen (71-80)
+    {"id": 71, "name": "KitchenAid Stand Mixer", "price": 400, "category": "Kitchen", "in_stock": True, "brand": "KitchenAid", "rating": 4.8},
+    {"id": 72, "name": "Vitamix 5200", "price": 450, "category": "Kitchen", "in_stock": True, "brand": "Vitamix", "rating": 4.9},
+    {"id": 73, "name": "Breville BES870XL", "price": 700, "category": "Kitchen", "in_stock": True, "brand": "Breville", "rating": 4.7},
+    {"id": 74, "name": "Cuisinart Food Processor", "price": 200, "category": "Kitchen", "in_stock": True, "brand": "Cuisinart", "rating": 4.6},
+    {"id": 75, "name": "Ninja Foodi 9-in-1", "price": 200, "category": "Kitchen", "in_stock": True, "brand": "Ninja", "rating": 4.5},
+    {"id": 76, "name": "Instant Pot Duo", "price": 100, "category": "Kitchen", "in_stock": True, "brand": "Instant Pot", "rating": 4.7},
+    {"id": 77, "name": "Le Creuset Dutch Oven", "price": 350, "category": "Kitchen", "in_stock": True, "brand": "Le Creuset", "rating": 4.8},
+    {"id": 78, "name": "All-Clad D3 Pan Set", "price": 500, "category": "Kitchen", "in_stock": True, "brand": "All-Clad", "rating": 4.7},
+    {"id": 79, "name": "Wusthof Classic Knife", "price": 150, "category": "Kitchen", "in_stock": True, "brand": "Wusthof", "rating": 4.8},
+    {"id": 80, "name": "Microplane Grater", "price": 15, "category": "Kitchen", "in_stock": True, "brand": "Microplane", "rating": 4.6},
+
+    # Furniture (81-90)
+    {"id": 81, "name": "Herman Miller Aeron", "price": 1500, "category": "Furniture", "in_stock": True, "brand": "Herman Miller", "rating": 4.9},
+    {"id": 82, "name": "Steelcase Leap V2", "price": 1200, "category": "Furniture", "in_stock": True, "brand": "Steelcase", "rating": 4.8},
+    {"id": 83, "name": "IKEA Markus", "price": 200, "category": "Furniture", "in_stock": True, "brand": "IKEA", "rating": 4.4},
+    {"id": 84, "name": "West Elm Sofa", "price": 1200, "category": "Furniture", "in_stock": True, "brand": "West Elm", "rating": 4.6},
+    {"id": 85, "name": "Crate & Barrel Table", "price": 800, "category": "Furniture", "in_stock": True, "brand": "Crate & Barrel", "rating": 4.5},
+    {"id": 86, "name": "Pottery Barn Bed", "price": 1500, "category": "Furniture", "in_stock": True, "brand": "Pottery Barn", "rating": 4.6},
+    {"id": 87, "name": "Restoration Hardware", "price": 3000, "category": "Furniture", "in_stock": True, "brand": "Restoration Hardware", "rating": 4.7},
+    {"id": 88, "name": "Wayfair Desk", "price": 300, "category": "Furniture", "in_stock": True, "brand": "Wayfair", "rating": 4.3},
+    {"id": 89, "name": "Ashley Furniture", "price": 600, "category": "Furniture", "in_stock": True, "brand": "Ashley", "rating": 4.4},
+    {"id": 90, "name": "La-Z-Boy Recliner", "price": 800, "category": "Furniture", "in_stock": True, "brand": "La-Z-Boy", "rating": 4.5},
+
+    # Fashion (91-100)
+    {"id": 91, "name": "Nike Air Max 270", "price": 150, "category": "Fashion", "in_stock": True, "brand": "Nike", "rating": 4.6},
+    {"id": 92, "name": "Adidas Ultraboost 22", "price": 180, "category": "Fashion", "in_stock": True, "brand": "Adidas", "rating": 4.7},
+    {"id": 93, "name": "Apple Watch Series 9", "price": 400, "category": "Fashion", "in_stock": True, "brand": "Apple", "rating": 4.8},
+    {"id": 94, "name": "Fossil Gen 6", "price": 300, "category": "Fashion", "in_stock": True, "brand": "Fossil", "rating": 4.5},
+    {"id": 95, "name": "Ray-Ban Aviator", "price": 200, "category": "Fashion", "in_stock": True, "brand": "Ray-Ban", "rating": 4.7},
+    {"id": 96, "name": "Oakley Holbrook", "price": 150, "category": "Fashion", "in_stock": True, "brand": "Oakley", "rating": 4.6},
+    {"id": 97, "name": "Tissot T-Touch", "price": 1200, "category": "Fashion", "in_stock": True, "brand": "Tissot", "rating": 4.7},
+    {"id": 98, "name": "Seiko Prospex", "price": 400, "category": "Fashion", "in_stock": True, "brand": "Seiko", "rating": 4.6},
+    {"id": 99, "name": "Casio G-Shock", "price": 100, "category": "Fashion", "in_stock": True, "brand": "Casio", "rating": 4.5},
+    {"id": 100, "name": "Swatch Originals", "price": 80, "category": "Fashion", "in_stock": True, "brand": "Swatch", "rating": 4.4}
+]
+
+
+PRODUCTS_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "database", "products.json"
+)
+
+# Các trường được đánh chỉ mục
+SEARCH_FIELDS = ("name", "category", "brand")
+
+TOKEN_PATTERN = re.compile(r"\w+")
+
+# Tham số BM25
+BM25_K1 = 1.2
+BM25_B = 0.75
+
+# Trọng số khi token của query chỉ là một phần của token sản phẩm ("phone" trong "iphone")
+PARTIAL_MATCH_WEIGHT = 0.6
+# Độ tương đồng tối thiểu để coi là gõ sai chính tả ("iphnoe" -> "iphone")
+FUZZY_MIN_SIMILARITY = 0.75
+FUZZY_MATCH_WEIGHT = 0.5
+# Số token ứng viên (nhiều trigram chung nhất) được so độ tương đồng khi khớp gần đúng
+FUZZY_CANDIDATES = 64
+# Điểm cộng khi toàn bộ query xuất hiện nguyên văn trong tên sản phẩm
+PHRASE_BONUS = 2.0
+
+# Tỷ trọng điểm ngữ nghĩa khi trộn với điểm BM25 (đã chuẩn hóa về 0-1)
+SEMANTIC_WEIGHT = 0.5
+# Sản phẩm chỉ khớp theo ngữ nghĩa phải có độ tương đồng cosine tối thiểu này
+SEMANTIC_MIN_SIMILARITY = 0.45
+
+DEFAULT_TOP_K = 10
+MAX_TOP_K = 50
+
+
+def fold(text: str) -> str:
+    """Lowercase và bỏ dấu tiếng Việt ("Điện thoại" -> "dien thoai")"""
+    text = unicodedata.normalize("NFD", text.lower())
+    text = "".join(ch for ch in text if unicodedata.category(ch) != "Mn")
+    return text.replace("đ", "d")
+
+
+def tokenize(text: str) -> List[str]:
+    """Tách text (đã fold) thành các token chữ/số"""
+    return TOKEN_PATTERN.findall(text)
+
+
+def _trigrams(term: str) -> set:
+    padded = f" {term} "
+    return {padded[i:i + 3] for i in range(len(padded) - 2)}
+
+
+class SearchResult(NamedTuple):
+    """Kết quả tìm kiếm sản phẩm"""
+    # Các sản phẩm tốt nhất (tối đa top_k), điểm cao nhất trước
+    products: List[dict]
+    # Tổng số sản phẩm khớp (trước khi cắt top_k)
+    total: int
+
+
+class _Snapshot:
+    """Dữ liệu đã đánh chỉ mục của một lần nạp catalog (chỉ đọc sau khi tạo)"""
+
+    def __init__(self, products: List[dict]):
+        self.products = products
+        # id sản phẩm -> vị trí, dùng để ghép kết quả tìm kiếm ngữ nghĩa
+        self.positions = {product.get("id"): index for index, product in enumerate(products)}
+        # Tên sản phẩm đã fold, dùng cho điểm cộng khớp nguyên cụm
+        self.names = [fold(str(product.get("name", ""))) for product in products]
+        documents = [
+            tokenize(fold(" ".join(str(product.get(field, "")) for field in SEARCH_FIELDS)))
+            for product in products
+        ]
+        average_length = (sum(map(len, documents)) / len(documents)) if documents else 1.0
+        # token -> {vị trí sản phẩm: số lần xuất hiện}
+        frequencies: Dict[str, Dict[int, int]] = {}
+        for index, tokens in enumerate(documents):
+            for token in tokens:
+                postings = frequencies.setdefault(token, {})
+                postings[index] = postings.get(index, 0) + 1
+        # token -> {vị trí sản phẩm: điểm BM25}, tính sẵn để truy vấn chỉ còn cộng điểm
+        count = len(products)
+        self.postings: Dict[str, Dict[int, float]] = {}
+        for term, postings in frequencies.items():
+            idf = math.log(1 + (count - len(postings) + 0.5) / (len(postings) + 0.5))
+            self.postings[term] = {
+                index: idf * tf * (BM25_K1 + 1)
+                / (tf + BM25_K1 * (1 - BM25_B + BM25_B * len(documents[index]) / average_length))
+                for index, tf in postings.items()
+            }
+        # Từ vựng và chỉ mục trigram trên từ vựng, để tìm token chứa chuỗi con hoặc gần giống
+        self.vocabulary = sorted(self.postings)
+        self.trigrams: Dict[str, List[int]] = {}
+        for term_id, term in enumerate(self.vocabulary):
+            for gram in _trigrams(term):
+                self.trigrams.setdefault(gram, []).append(term_id)
+        self._expansions: Dict[str, List[Tuple[str, float]]] = {}
+        self._columns = None
+
+    @property
+    def columns(self):
+        """Biểu diễn dạng cột (NumPy) của snapshot, tạo khi cần lần đầu"""
+        if self._columns is None:
+            # Import muộn: chỉ truy vấn thống kê mới cần NumPy
+            from .product_columns import ProductColumns
+            self._columns = ProductColumns(self.products)
+        return self._columns
+
+    def expand(self, token: str) -> List[Tuple[str, float]]:
+        """Các token trong từ vựng khớp với `token` của query, kèm trọng số.
+
+        Khớp chính xác có trọng số 1; token chứa `token` (từ 3 ký tự) có trọng số
+        PARTIAL_MATCH_WEIGHT; nếu không có hai loại trên thì lấy các token gần giống
+        theo trigram (gõ sai chính tả).
+        """
+        cached = self._expansions.get(token)
+        if cached is not None:
+            return cached
+
+        matches: Dict[str, float] = {}
+        if token in self.postings:
+            matches[token] = 1.0
+
+        # Đếm số trigram chung với từng token của từ vựng
+        grams = _trigrams(token)
+        shared: Dict[int, int] = {}
+        for gram in grams:
+            for term_id in self.trigrams.get(gram, ()):
+                shared[term_id] = shared.get(term_id, 0) + 1
+
+        # Token 1-2 ký tự (rất nhiều âm tiết tiếng Việt) chỉ khớp chính xác, tránh nhiễu ("on" trong "canon")
+        if len(token) >= 3:
+            # Token chứa `token` phải có đủ các trigram bên trong của nó
+            inner = len(_trigrams(token) - {f" {token[:2]}", f"{token[-2:]} "})
+            for term_id, common in shared.items():
+                term = self.vocabulary[term_id]
+                if common >= inner and term != token and token in term:
+                    matches[term] = PARTIAL_MATCH_WEIGHT
+
+        if not matches and len(token) >= 4:
+            nearby = [
+                (common, self.vocabulary[term_id])
+                for term_id, common in shared.items()
+                if abs(len(self.vocabulary[term_id]) - len(token)) <= 2
+            ]
+            for _, term in heapq.nlargest(FUZZY_CANDIDATES, nearby):
+                similarity = difflib.SequenceMatcher(None, token, term).ratio()
+                if similarity >= FUZZY_MIN_SIMILARITY:
+                    matches[term] = FUZZY_MATCH_WEIGHT * similarity
+
+        result = list(matches.items())
+        if len(self._expansions) < 4096:
+            self._expansions[token] = result
+        return result
+
+    def score(self, query: str) -> Dict[int, float]:
+        """Điểm BM25 của các sản phẩm khớp ít nhất một token của query"""
+        scores: Dict[int, float] = {}
+        for token in dict.fromkeys(tokenize(query)):
+            # Mỗi token của query chỉ tính điểm của token sản phẩm khớp tốt nhất
+            best: Dict[int, float] = {}
+            for term, weight in self.expand(token):
+                postings = self.postings[term]
+                if weight == 1.0 and not best:
+                    best = dict(postings)
+                    continue
+                for index, value in postings.items():
+                    value *= weight
+                    if value > best.get(index, 0.0):
+                        best[index] = value
+            if not scores:
+                scores = best
+                continue
+            for index, value in best.items():
+                scores[index] = scores.get(index, 0.0) + value
+        if query:
+            for index in scores:
+                if query in self.names[index]:
+                    scores[index] += PHRASE_BONUS
+        return scores
+
+
+class ProductCatalog:
+    """Danh mục sản phẩm nạp sẵn, tự làm mới khi products.json thay đổi"""
+
+    def __init__(self, products_path: str = PRODUCTS_PATH, builtin_products: Optional[List[dict]] = None):
+        self.products_path = products_path
+        self.builtin_products = BUILTIN_PRODUCTS if builtin_products is None else builtin_products
+        self._snapshot: Optional[_Snapshot] = None
+        self._file_state = None
+        self._version = 0
+        self._lock = threading.Lock()
+        # Chỉ mục ngữ nghĩa (tùy chọn) và thread đang đồng bộ embedding
+        self._semantic = None
+        self._semantic_thread: Optional[threading.Thread] = None
+
+    @property
+    def version(self) -> int:
+        """Tăng mỗi lần catalog được nạp lại"""
+        self._ensure_fresh()
+        return self._version
+
+    @property
+    def products(self) -> List[dict]:
+        """Toàn bộ sản phẩm hiện có"""
+        return self._ensure_fresh().products
+
+    @property
+    def columns(self):
+        """Danh mục dạng cột cho truy vấn lọc/tổng hợp vectorized (xem product_columns)"""
+        return self._ensure_fresh().columns
+
+    def refresh(self):
+        """Buộc nạp lại ở lần truy cập tiếp theo (gọi sau khi ghi products.json)"""
+        with self._lock:
+            self._file_state = None
+
+    def enable_semantic(self, index):
+        """Bật trộn điểm tìm kiếm ngữ nghĩa với một SemanticProductIndex"""
+        self._semantic = index
+        self.schedule_semantic_sync()
+
+    def sync_semantic(self) -> int:
+        """Tính embedding cho các sản phẩm chưa có trong chỉ mục ngữ nghĩa (chạy đồng bộ)"""
+        if self._semantic is None:
+            return 0
+        snapshot = self._ensure_fresh()
+        return self._semantic.sync(snapshot.products, version=self._version)
+
+    def schedule_semantic_sync(self):
+        """Đồng bộ chỉ mục ngữ nghĩa ở thread nền (bỏ qua nếu đang có lượt đồng bộ chạy)"""
+        if self._semantic is None:
+            return
+        with self._lock:
+            if self._semantic_thread is not None and self._semantic_thread.is_alive():
+                return
+            self._semantic_thread = threading.Thread(target=self._run_semantic_sync, name="product-embeddings", daemon=True)
+            self._semantic_thread.start()
+
+    def _run_semantic_sync(self):
+        try:
+            # Lặp lại nếu catalog đổi trong lúc đang tính embedding
+            while self._semantic.synced_version != self.version:
+                self.sync_semantic()
+        except Exception as e:
+            print(f"Error syncing product embeddings: {str(e)}")
+
+    def search(
+        self,
+        query: str,
+        top_k: int = DEFAULT_TOP_K,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        in_stock: Optional[bool] = None,
+        brand: Optional[str] = None,
+        min_rating: Optional[float] = None,
+    ) -> SearchResult:
+        """Tìm và xếp hạng sản phẩm theo tên, danh mục, thương hiệu (BM25, không phân biệt dấu).
+
+        Query rỗng trả về các sản phẩm thỏa bộ lọc, đánh giá cao nhất trước.
+        Không có sản phẩm nào khớp thì trả về danh sách rỗng. Khi bật tìm kiếm ngữ nghĩa,
+        điểm BM25 được chuẩn hóa và trộn với độ tương đồng vector.
+        """
+        snapshot = self._ensure_fresh()
+        top_k = max(1, min(top_k, MAX_TOP_K))
+        brand_key = fold(brand).strip() if brand else None
+
+        def accept(product: dict) -> bool:
+            price = product.get("price") or 0
+            if min_price is not None and price < min_price:
+                return False
+            if max_price is not None and price > max_price:
+                return False
+            if in_stock is not None and bool(product.get("in_stock")) != in_stock:
+                return False
+            if brand_key and fold(str(product.get("brand", ""))) != brand_key:
+                return False
+            if min_rating is not None and (product.get("rating") or 0) < min_rating:
+                return False
+            return True
+
+        products = snapshot.products
+        has_filters = any(v is not None for v in (min_price, max_price, in_stock, min_rating)) or bool(brand_key)
+        query_key = " ".join(tokenize(fold(query)))
+        if query_key:
+            scores = snapshot.score(query_key)
+            if self._semantic is not None:
+                scores = self._merge_semantic(snapshot, query, scores, top_k)
+            if has_filters:
+                scores = {index: score for index, score in scores.items() if accept(products[index])}
+        else:
+            # Không có từ khóa: xếp theo đánh giá
+            scores = {
+                index: 0.0
+                for index, product in enumerate(products)
+                if not has_filters or accept(product)
+            }
+        # Chỉ cần top_k phần tử tốt nhất, không sắp xếp toàn bộ kết quả
+        best = heapq.nsmallest(
+            top_k,
+            scores,
+            key=lambda index: (-scores[index], -(products[index].get("rating") or 0), index),
+        )
+        return SearchResult(products=[products[index] for index in best], total=len(scores))
+
+    def _merge_semantic(self, snapshot: _Snapshot, query: str, scores: Dict[int, float], top_k: int) -> Dict[int, float]:
+        if self._semantic.synced_version != self._version:
+            # Sản phẩm mới chưa có embedding: đồng bộ ở nền, lượt này dùng chỉ mục hiện có
+            self.schedule_semantic_sync()
+        try:
+            hits = self._semantic.search(query, k=max(top_k * 4, 20))
+        except Exception as e:
+            print(f"Error in semantic product search: {str(e)}")
+            return scores
+
+        top = max(scores.values(), default=0.0) or 1.0
+        merged = {index: (1 - SEMANTIC_WEIGHT) * score / top for index, score in scores.items()}
+        for product_id, similarity in hits:
+            index = snapshot.positions.get(product_id)
+            if index is None:
+                continue
+            if index in merged:
+                merged[index] += SEMANTIC_WEIGHT * similarity
+            elif similarity >= SEMANTIC_MIN_SIMILARITY:
+                merged[index] = SEMANTIC_WEIGHT * similarity
+        return merged
+
+    def _ensure_fresh(self) -> _Snapshot:
+        file_state = self._stat()
+        snapshot = self._snapshot
+        if snapshot is not None and file_state == self._file_state:
+            return snapshot
+        with self._lock:
+            if self._snapshot is None or file_state != self._file_state:
+                self._snapshot = _Snapshot(self.builtin_products + self._load_imported())
+                self._file_state = file_state
+                self._version += 1
+            return self._snapshot
+
+    def _stat(self):
+        try:
+            stat = os.stat(self.products_path)
+            return (stat.st_mtime_ns, stat.st_size)
+        except OSError:
+            return None
+
+    def _load_imported(self) -> List[dict]:
+        # Nạp thêm sản phẩm đã được import qua file .txt (nếu có)
+        try:
+            with open(self.products_path, "r", encoding="utf-8") as f:
+                imported = json.load(f)
+            return imported if isinstance(imported, list) else []
+        except Exception:
+            # Im lặng nếu không thể nạp, catalog vẫn hoạt động với dữ liệu mẫu
+            return []
+
+
+# Catalog dùng chung cho toàn process
+product_catalog = ProductCatalog()
@@ -0,0 +1,143 @@
+"""
+Product Columns - Biểu diễn danh mục sản phẩm theo cột cho truy vấn lọc/tổng hợp
+- Trường số (price, rating, in_stock) là mảng NumPy
+- Trường phân loại (category, brand) được mã hóa từ điển: mảng mã int32 + danh sách nhãn
+- Lọc và tổng hợp (rẻ nhất theo nhóm, trung bình theo nhóm...) đều vectorized, không lặp Python theo từng sản phẩm
+"""
+
+from typing import Dict, List, Optional
+
+import numpy as np
+
+from .product_catalog import fold
+
+
+# Các trường phân loại được mã hóa từ điển
+CATEGORICAL_FIELDS = ("category", "brand")
+# Các trường số có thể tổng hợp
+NUMERIC_FIELDS = ("price", "rating")
+
+
+def _label_key(label: str) -> str:
+    return fold(label).strip()
+
+
+class _Categorical:
+    """Một cột phân loại đã mã hóa từ điển"""
+
+    def __init__(self, values: List[str]):
+        codes: Dict[str, int] = {}
+        self.labels: List[str] = []
+        encoded = np.empty(len(values), dtype=np.int32)
+        for i, value in enumerate(values):
+            code = codes.get(value)
+            if code is None:
+                code = codes[value] = len(self.labels)
+                self.labels.append(value)
+            encoded[i] = code
+        self.codes = encoded
+        # Nhãn đã bỏ dấu/lowercase -> các mã tương ứng, để lọc không phân biệt hoa thường
+        self._lookup: Dict[str, List[int]] = {}
+        for code, label in enumerate(self.labels):
+            self._lookup.setdefault(_label_key(label), []).append(code)
+
+    def match(self, label: str) -> np.ndarray:
+        """Mask các dòng có nhãn bằng `label` (không phân biệt hoa thường, dấu)"""
+        codes = self._lookup.get(_label_key(label), [])
+        if len(codes) == 1:
+            return self.codes == codes[0]
+        return np.isin(self.codes, codes)
+
+
+class ProductColumns:
+    """Danh mục sản phẩm dạng cột (chỉ đọc)"""
+
+    def __init__(self, products: List[dict]):
+        self.products = products
+        count = len(products)
+        self.ids = np.fromiter((p.get("id") or 0 for p in products), dtype=np.int64, count=count)
+        self.price = np.fromiter((p.get("price") or 0 for p in products), dtype=np.float64, count=count)
+        self.rating = np.fromiter((p.get("rating") or 0 for p in products), dtype=np.float64, count=count)
+        self.in_stock = np.fromiter((bool(p.get("in_stock")) for p in products), dtype=bool, count=count)
+        self.categorical = {
+            field: _Categorical([str(p.get(field) or "") for p in products])
+            for field in CATEGORICAL_FIELDS
+        }
+
+    def __len__(self) -> int:
+        return len(self.products)
+
+    def mask(
+        self,
+        category: Optional[str] = None,
+        brand: Optional[str] = None,
+        in_stock: Optional[bool] = None,
+        min_price: Optional[float] = None,
+        max_price: Optional[float] = None,
+        min_rating: Optional[float] = None,
+    ) -> np.ndarray:
+        """Mask boolean các dòng thỏa mọi điều kiện lọc"""
+        mask = np.ones(len(self), dtype=bool)
+        if category:
+            mask &= self.categorical["category"].match(category)
+        if brand:
+            mask &= self.categorical["brand"].match(brand)
+        if in_stock is not None:
+            mask &= self.in_stock if in_stock else ~self.in_stock
+        if min_price is not None:
+            mask &= self.price >= min_price
+        if max_price is not None:
+            mask &= self.price <= max_price
+        if min_rating is not None:
+            mask &= self.rating >= min_rating
+        return mask
+
+    def rows(self, mask: np.ndarray) -> List[dict]:
+        """Các sản phẩm (dict gốc) thỏa mask"""
+        return [self.products[i] for i in np.flatnonzero(mask)]
+
+    def cheapest_by(self, group_by: str, mask: Optional[np.ndarray] = None) -> List[dict]:
+        """Sản phẩm rẻ nhất của mỗi nhóm (category hoặc brand), nhóm rẻ nhất trước"""
+        column = self.categorical[group_by]
+        if mask is None:
+            mask = np.ones(len(self), dtype=bool)
+        if not mask.any():
+            return []
+        # Giá thấp nhất của mỗi nhóm, rồi lấy dòng đầu tiên đạt giá đó trong nhóm
+        minimums = np.full(len(column.labels), np.inf)
+        np.minimum.at(minimums, column.codes[mask], self.price[mask])
+        candidates = np.flatnonzero(mask & (self.price == minimums[column.codes]))
+        _, first = np.unique(column.codes[candidates], return_index=True)
+        winners = candidates[first]
+        winners = winners[np.argsort(self.price[winners], kind="stable")]
+        return [
+            {group_by: column.labels[column.codes[i]], "product": self.products[i]}
+            for i in winners
+        ]
+
+    def group_stats(self, group_by: str, field: str, mask: Optional[np.ndarray] = None) -> List[dict]:
+        """Thống kê count/avg/min/max của `field` (price hoặc rating) theo nhóm"""
+        column = self.categorical[group_by]
+        values = getattr(self, field)
+        codes = column.codes if mask is None else column.codes[mask]
+        values = values if mask is None else values[mask]
+        if not len(codes):
+            return []
+        size = len(column.labels)
+        counts = np.bincount(codes, minlength=size)
+        sums = np.bincount(codes, weights=values, minlength=size)
+        minimums = np.full(size, np.inf)
+        maximums = np.full(size, -np.inf)
+        np.minimum.at(minimums, codes, values)
+        np.maximum.at(maximums, codes, values)
+        present = np.flatnonzero(counts)
+        return [
+            {
+                group_by: column.labels[code],
+                "count": int(counts[code]),
+                "avg": round(float(sums[code] / counts[code]), 2),
+                "min": float(minimums[code]),
+                "max": float(maximums[code]),
+            }
+            for code in present
+        ]
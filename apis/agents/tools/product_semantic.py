@@ -0,0 +1,203 @@
+"""
+Product Semantic Index - Tìm kiếm sản phẩm theo ngữ nghĩa (tùy chọn)
+- Embedding bằng mô hình chạy cục bộ trên CPU (sentence-transformers, đa ngôn ngữ)
+- Chỉ mục ANN HNSW (hnswlib) lưu trên đĩa ở apis/database/product_index/
+- Chỉ tính embedding cho sản phẩm mới hoặc đã đổi nội dung (theo id + hash văn bản)
+- Bật bằng PRODUCT_SEMANTIC_SEARCH=1; thiếu thư viện thì product_search vẫn chạy bằng BM25
+
+Ngân sách độ trễ mỗi truy vấn (CPU, mặc định PRODUCT_SEMANTIC_BUDGET_MS=50):
+- Embedding câu truy vấn (MiniLM-L12, ~10 token): ~5-20ms, câu truy vấn lặp lại lấy từ cache
+- Truy vấn HNSW (M=16, ef=64): < 1ms tới ~1 triệu vector
+- Trộn điểm với BM25: < 1ms
+Truy vấn vượt ngân sách được ghi log cảnh báo.
+"""
+
+import os
+import json
+import time
+import zlib
+import logging
+import threading
+from collections import OrderedDict
+from typing import Dict, List, Optional, Tuple
+
+
+DEFAULT_INDEX_DIR = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.dirname(os.path.abspath(__file__)))), "database", "product_index"
+)
+
+# Mô hình đa ngôn ngữ nhỏ (~120MB), hiểu tiếng Việt, chạy tốt trên CPU
+DEFAULT_MODEL = "sentence-transformers/paraphrase-multilingual-MiniLM-L12-v2"
+
+logger = logging.getLogger(__name__)
+
+
+def product_text(product: dict) -> str:
+    """Văn bản đại diện cho sản phẩm khi tính embedding"""
+    return f"{product.get('name', '')} - {product.get('category', '')} - {product.get('brand', '')}"
+
+
+class SemanticProductIndex:
+    """Chỉ mục vector HNSW trên đĩa cho sản phẩm, cập nhật tăng dần"""
+
+    def __init__(
+        self,
+        index_dir: str = DEFAULT_INDEX_DIR,
+        model_name: str = DEFAULT_MODEL,
+        ef_search: int = 64,
+        batch_size: int = 256,
+        budget_ms: float = 50.0,
+        query_cache_size: int = 1024,
+    ):
+        # Import ở đây để các thư viện nặng chỉ cần khi bật tìm kiếm ngữ nghĩa
+        import hnswlib
+        from sentence_transformers import SentenceTransformer
+
+        self.index_dir = index_dir
+        self.model_name = model_name
+        self.batch_size = batch_size
+        self.budget_ms = budget_ms
+        self.query_cache_size = query_cache_size
+        self._hnswlib = hnswlib
+        self._model = SentenceTransformer(model_name, device="cpu")
+        self.dim = self._model.get_sentence_embedding_dimension()
+        self._ef_search = ef_search
+        # Câu truy vấn -> embedding (LRU)
+        self._query_cache: "OrderedDict[str, object]" = OrderedDict()
+        # id sản phẩm -> hash văn bản đã được embedding
+        self._hashes: Dict[int, int] = {}
+        self._lock = threading.RLock()
+        # Phiên bản catalog đã đồng bộ gần nhất
+        self.synced_version = None
+        self._index = self._open_index()
+
+    @property
+    def _index_path(self) -> str:
+        return os.path.join(self.index_dir, "products.hnsw")
+
+    @property
+    def _meta_path(self) -> str:
+        return os.path.join(self.index_dir, "meta.json")
+
+    def __len__(self) -> int:
+        return len(self._hashes)
+
+    def _open_index(self):
+        index = self._hnswlib.Index(space="cosine", dim=self.dim)
+        try:
+            with open(self._meta_path, "r", encoding="utf-8") as f:
+                meta = json.load(f)
+            # Chỉ dùng lại index được tạo bởi cùng mô hình
+            if meta.get("model") == self.model_name and meta.get("dim") == self.dim and os.path.exists(self._index_path):
+                hashes = {int(k): v for k, v in meta.get("hashes", {}).items()}
+                index.load_index(self._index_path, max_elements=max(len(hashes), 1024))
+                index.set_ef(self._ef_search)
+                self._hashes = hashes
+                return index
+        except Exception as e:
+            print(f"Error loading product vector index: {str(e)}")
+        index.init_index(max_elements=1024, ef_construction=200, M=16)
+        index.set_ef(self._ef_search)
+        self._hashes = {}
+        return index
+
+    def sync(self, products: List[dict], version=None) -> int:
+        """Tính embedding cho sản phẩm mới hoặc đã đổi nội dung và lưu index xuống đĩa.
+
+        Trả về số sản phẩm đã được embedding.
+        """
+        pending: List[Tuple[int, int, str]] = []
+        for product in products:
+            product_id = product.get("id")
+            if not isinstance(product_id, int):
+                continue
+            text = product_text(product)
+            text_hash = zlib.crc32(text.encode("utf-8"))
+            if self._hashes.get(product_id) != text_hash:
+                pending.append((product_id, text_hash, text))
+
+        for start in range(0, len(pending), self.batch_size):
+            batch = pending[start:start + self.batch_size]
+            vectors = self._embed([text for _, _, text in batch])
+            with self._lock:
+                needed = len(self._hashes) + len(batch)
+                if needed > self._index.get_max_elements():
+                    self._index.resize_index(max(needed, self._index.get_max_elements() * 2))
+                # Thêm id đã có sẽ ghi đè vector cũ
+                self._index.add_items(vectors, [product_id for product_id, _, _ in batch])
+                for product_id, text_hash, _ in batch:
+                    self._hashes[product_id] = text_hash
+
+        if pending:
+            self.save()
+        self.synced_version = version
+        return len(pending)
+
+    def search(self, query: str, k: int) -> List[Tuple[int, float]]:
+        """Các sản phẩm gần nghĩa nhất: danh sách (id sản phẩm, độ tương đồng cosine)"""
+        if not self._hashes or not query.strip():
+            return []
+        started = time.perf_counter()
+        vector = self._query_vector(query)
+        with self._lock:
+            k = min(k, len(self._hashes))
+            labels, distances = self._index.knn_query(vector, k=k)
+        elapsed_ms = (time.perf_counter() - started) * 1000
+        if elapsed_ms > self.budget_ms:
+            logger.warning("semantic product search took %.1fms (budget %.0fms)", elapsed_ms, self.budget_ms)
+        return [(int(label), 1.0 - float(distance)) for label, distance in zip(labels[0], distances[0])]
+
+    def save(self):
+        """Ghi index và metadata xuống đĩa"""
+        os.makedirs(self.index_dir, exist_ok=True)
+        with self._lock:
+            self._index.save_index(self._index_path)
+            meta = {
+                "model": self.model_name,
+                "dim": self.dim,
+                "hashes": {str(k): v for k, v in self._hashes.items()},
+            }
+        tmp_path = self._meta_path + ".tmp"
+        with open(tmp_path, "w", encoding="utf-8") as f:
+            json.dump(meta, f)
+        os.replace(tmp_path, self._meta_path)
+
+    def _query_vector(self, query: str):
+        key = query.strip().lower()
+        with self._lock:
+            vector = self._query_cache.get(key)
+            if vector is not None:
+                self._query_cache.move_to_end(key)
+                return vector
+        vector = self._embed([key])
+        with self._lock:
+            self._query_cache[key] = vector
+            while len(self._query_cache) > self.query_cache_size:
+                self._query_cache.popitem(last=False)
+        return vector
+
+    def _embed(self, texts: List[str]):
+        return self._model.encode(
+            texts,
+            batch_size=self.batch_size,
+            normalize_embeddings=True,
+            convert_to_numpy=True,
+            show_progress_bar=False,
+        )
+
+
+def create_semantic_index() -> Optional[SemanticProductIndex]:
+    """Tạo chỉ mục ngữ nghĩa theo cấu hình môi trường, None nếu không bật hoặc thiếu thư viện"""
+    if os.getenv("PRODUCT_SEMANTIC_SEARCH", "0").lower() not in ("1", "true", "yes"):
+        return None
+    try:
+        return SemanticProductIndex(
+            index_dir=os.getenv("PRODUCT_INDEX_DIR", DEFAULT_INDEX_DIR),
+            model_name=os.getenv("PRODUCT_EMBEDDING_MODEL", DEFAULT_MODEL),
+            budget_ms=float(os.getenv("PRODUCT_SEMANTIC_BUDGET_MS", "50")),
+        )
+    except ImportError as e:
+        print(f"Semantic product search disabled, missing dependency: {str(e)}")
+    except Exception as e:
+        print(f"Error initializing semantic product search: {str(e)}")
+    return None
@@ -0,0 +1,80 @@
+"""
+Tool thống kê sản phẩm: lọc và tổng hợp theo danh mục/thương hiệu trên catalog dạng cột
+"""
+
+from typing import Literal, Optional
+from langchain_core.tools import tool
+from pydantic import BaseModel, Field
+from .product_catalog import product_catalog
+
+
+# Số nhóm tối đa trả về cho LLM
+MAX_GROUPS = 50
+
+
+class ProductStatsInput(BaseModel):
+    metric: Literal["cheapest", "count", "avg_price", "avg_rating", "min_price", "max_price", "max_rating"] = Field(
+        default="cheapest",
+        description=(
+            "Chỉ số cần tính theo từng nhóm: cheapest (sản phẩm rẻ nhất), count (số sản phẩm), "
+            "avg_price, avg_rating, min_price, max_price, max_rating."
+        ),
+    )
+    group_by: Literal["category", "brand"] = Field(default="category", description="Nhóm theo danh mục hoặc thương hiệu.")
+    category: Optional[str] = Field(default=None, description="Chỉ xét một danh mục, ví dụ: Electronics.")
+    brand: Optional[str] = Field(default=None, description="Chỉ xét một thương hiệu, ví dụ: Apple.")
+    in_stock: Optional[bool] = Field(default=None, description="Chỉ xét sản phẩm còn hàng (true) hoặc hết hàng (false).")
+    min_price: Optional[float] = Field(default=None, description="Giá thấp nhất (USD).")
+    max_price: Optional[float] = Field(default=None, description="Giá cao nhất (USD).")
+    min_rating: Optional[float] = Field(default=None, description="Đánh giá tối thiểu (0-5).")
+
+
+@tool("product_stats", args_schema=ProductStatsInput, return_direct=True)
+def product_stats(
+    metric: str = "cheapest",
+    group_by: str = "category",
+    category: Optional[str] = None,
+    brand: Optional[str] = None,
+    in_stock: Optional[bool] = None,
+    min_price: Optional[float] = None,
+    max_price: Optional[float] = None,
+    min_rating: Optional[float] = None,
+):
+    """
+    Thống kê sản phẩm theo danh mục hoặc thương hiệu, ví dụ: sản phẩm còn hàng rẻ nhất mỗi danh mục,
+    đánh giá trung bình theo thương hiệu, số sản phẩm mỗi danh mục trong một khoảng giá.
+    """
+    columns = product_catalog.columns
+    mask = columns.mask(
+        category=category,
+        brand=brand,
+        in_stock=in_stock,
+        min_price=min_price,
+        max_price=max_price,
+        min_rating=min_rating,
+    )
+    matched = int(mask.sum())
+    if not matched:
+        return {
+            "message": "Không có sản phẩm nào thỏa điều kiện lọc.",
+            "groups": [],
+            "total": 0,
+        }
+
+    if metric == "cheapest":
+        groups = columns.cheapest_by(group_by, mask)
+    else:
+        # "avg_rating" -> thống kê "avg" của cột rating; count dùng cột bất kỳ
+        key, field = metric.split("_", 1) if metric != "count" else ("count", "price")
+        stats = columns.group_stats(group_by, field, mask)
+        # Nhóm có giá trị lớn nhất trước (riêng min_price: rẻ nhất trước)
+        stats.sort(key=lambda g: g[key], reverse=metric != "min_price")
+        groups = [{group_by: g[group_by], metric: g[key], "count": g["count"]} for g in stats]
+
+    return {
+        "message": f"Thống kê {metric} theo {group_by} trên {matched} sản phẩm:",
+        "metric": metric,
+        "group_by": group_by,
+        "groups": groups[:MAX_GROUPS],
+        "total": matched,
+    }
@@ -0,0 +1,160 @@
+"""
+Search Cache - Cache kết quả tìm kiếm web
+- Khóa là câu truy vấn đã chuẩn hóa (NFC, chữ thường, gộp khoảng trắng, bỏ dấu câu ở cuối) + số kết quả
+- Giới hạn theo thời gian sống (TTL) và số mục (LRU)
+- Single-flight: các truy vấn giống nhau đang chạy cùng lúc chỉ gọi provider một lần
+- Timeout cứng cho mỗi lần tìm kiếm (kết quả về muộn vẫn được lưu vào cache)
+- Stale-while-revalidate: mục vừa hết hạn vẫn được trả về ngay, đồng thời làm mới ở nền
+- Đếm hit/miss/stale/coalesced/timeout/error
+
+Provider là hàm (query, max_results) -> danh sách kết quả; truyền provider giả để chạy offline.
+"""
+
+import os
+import re
+import time
+import threading
+import unicodedata
+from collections import OrderedDict
+from concurrent.futures import Future, ThreadPoolExecutor, TimeoutError as FutureTimeoutError
+from functools import partial
+from typing import Callable, Dict, List, Tuple
+
+
+SearchProvider = Callable[[str, int], List[dict]]
+
+
+class SearchTimeout(RuntimeError):
+    """Provider không trả kết quả trong thời gian cho phép"""
+
+
+def normalize_query(query: str) -> str:
+    """Dạng chuẩn của câu truy vấn để các cách gõ khác nhau dùng chung một mục cache"""
+    text = unicodedata.normalize("NFC", query or "").casefold()
+    return re.sub(r"\s+", " ", text).strip(" ?!.,;:")
+
+
+class _Entry:
+    __slots__ = ("results", "stored_at")
+
+    def __init__(self, results: List[dict], stored_at: float):
+        self.results = results
+        self.stored_at = stored_at
+
+
+class SearchCache:
+    """Cache TTL + LRU trước một search provider, gộp các truy vấn trùng đang chạy"""
+
+    def __init__(
+        self,
+        provider: SearchProvider,
+        ttl: float = 600.0,
+        stale_ttl: float = 3600.0,
+        max_entries: int = 1024,
+        timeout: float = 8.0,
+        max_workers: int = 8,
+        clock: Callable[[], float] = time.monotonic,
+    ):
+        self.provider = provider
+        self.ttl = ttl
+        # Thời gian (sau TTL) mục cũ còn được trả về trong lúc làm mới, 0 để tắt
+        self.stale_ttl = stale_ttl
+        self.max_entries = max_entries
+        self.timeout = timeout
+        self._clock = clock
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="web-search")
+        self._entries: "OrderedDict[Tuple[str, int], _Entry]" = OrderedDict()
+        # Khóa -> lần gọi provider đang chạy
+        self._inflight: Dict[Tuple[str, int], Future] = {}
+        # RLock: callback hoàn tất có thể chạy ngay trong lúc đang giữ khóa
+        self._lock = threading.RLock()
+        self.hits = 0
+        self.stale_hits = 0
+        self.misses = 0
+        self.coalesced = 0
+        self.timeouts = 0
+        self.errors = 0
+
+    def search(self, query: str, max_results: int = 5) -> List[dict]:
+        """Kết quả tìm kiếm, từ cache nếu còn hạn; chờ provider tối đa timeout giây"""
+        key = (normalize_query(query), max_results)
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                age = self._clock() - entry.stored_at
+                if age <= self.ttl:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return list(entry.results)
+                if age <= self.ttl + self.stale_ttl:
+                    # Trả kết quả cũ ngay, làm mới ở nền (chỉ một lần làm mới cho mỗi khóa)
+                    self._entries.move_to_end(key)
+                    self.stale_hits += 1
+                    self._fetch(key, query, max_results)
+                    return list(entry.results)
+                del self._entries[key]
+            self.misses += 1
+            future, started = self._fetch(key, query, max_results)
+            if not started:
+                self.coalesced += 1
+
+        try:
+            return list(future.result(timeout=self.timeout))
+        except FutureTimeoutError:
+            with self._lock:
+                self.timeouts += 1
+            raise SearchTimeout(f"Tìm kiếm web không phản hồi trong {self.timeout:g} giây") from None
+
+    def _fetch(self, key: Tuple[str, int], query: str, max_results: int) -> Tuple[Future, bool]:
+        """Lần gọi provider cho khóa: dùng lại lần đang chạy, hoặc bắt đầu lần mới (gọi khi giữ khóa)"""
+        future = self._inflight.get(key)
+        if future is not None:
+            return future, False
+        future = self._executor.submit(self.provider, query.strip(), max_results)
+        self._inflight[key] = future
+        future.add_done_callback(partial(self._complete, key))
+        return future, True
+
+    def _complete(self, key: Tuple[str, int], future: Future):
+        with self._lock:
+            self._inflight.pop(key, None)
+            error = future.exception()
+            if error is not None:
+                # Lỗi không được cache, mục cũ (nếu có) được giữ nguyên
+                self.errors += 1
+                print(f"Error searching web: {str(error)}")
+                return
+            self._entries[key] = _Entry(list(future.result() or []), self._clock())
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+
+    def stats(self) -> dict:
+        with self._lock:
+            lookups = self.hits + self.stale_hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "inflight": len(self._inflight),
+                "hits": self.hits,
+                "stale_hits": self.stale_hits,
+                "misses": self.misses,
+                "coalesced": self.coalesced,
+                "timeouts": self.timeouts,
+                "errors": self.errors,
+                "hit_rate": (self.hits + self.stale_hits) / lookups if lookups else 0.0,
+            }
+
+    def clear(self):
+        with self._lock:
+            self._entries.clear()
+
+
+def create_search_cache(provider: SearchProvider) -> SearchCache:
+    """Tạo cache tìm kiếm theo cấu hình môi trường"""
+    return SearchCache(
+        provider,
+        ttl=float(os.getenv("WEB_SEARCH_CACHE_TTL", "600")),
+        stale_ttl=float(os.getenv("WEB_SEARCH_STALE_TTL", "3600")),
+        max_entries=int(os.getenv("WEB_SEARCH_CACHE_SIZE", "1024")),
+        timeout=float(os.getenv("WEB_SEARCH_TIMEOUT", "8")),
+    )
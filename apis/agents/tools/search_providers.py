@@ -0,0 +1,174 @@
+"""
+Search Providers - Nguồn tìm kiếm web cho tool web_search
+- SearchProvider: interface, trả về kết quả thô {"title", "href", "body"}
+- DuckDuckGoProvider: giữ client DDGS (primp, pool kết nối keep-alive) cho mỗi thread tìm kiếm,
+  không tạo client và kết nối mới mỗi lần gọi (chỉ với phiên bản duckduckgo_search đã kiểm tra,
+  DDGS_TESTED_VERSION; phiên bản khác tạo client mới mỗi lần như trước)
+- StubSearchProvider: kết quả giả lập cục bộ, độ trễ cấu hình được, dùng cho thử tải và chạy offline
+- compact_results: bỏ trùng tên miền, gom khoảng trắng, cắt snippet theo ngân sách token,
+  trả về bản ghi gọn {"title", "url", "snippet"} để đưa vào ngữ cảnh LLM
+Chọn nguồn bằng WEB_SEARCH_PROVIDER (duckduckgo | stub).
+"""
+
+import os
+import re
+import time
+import zlib
+import threading
+from abc import ABC, abstractmethod
+from typing import List
+from urllib.parse import urlparse
+
+
+DEFAULT_REGION = "vn-vi"
+# Tổng số token (ước lượng) cho toàn bộ kết quả của một lần tìm kiếm
+DEFAULT_TOKEN_BUDGET = 500
+# Số token tối thiểu cho snippet của mỗi kết quả
+MIN_SNIPPET_TOKENS = 20
+ELLIPSIS = "…"
+# Phiên bản duckduckgo_search có thuộc tính nội bộ DDGS.sleep_timestamp mà DuckDuckGoProvider dùng
+# (ghim trong requirements.txt)
+DDGS_TESTED_VERSION = "8.1.1"
+
+
+def estimate_tokens(text: str) -> int:
+    """Ước lượng số token của một đoạn text (~4 byte UTF-8 mỗi token, cùng cách tính với ngữ cảnh chat)"""
+    if not text:
+        return 0
+    return (len(text.encode("utf-8")) + 3) // 4
+
+
+class SearchProvider(ABC):
+    """Interface nguồn tìm kiếm web"""
+
+    name = "base"
+
+    @abstractmethod
+    def search(self, query: str, max_results: int) -> List[dict]:
+        """Kết quả thô theo thứ tự xếp hạng: danh sách {"title", "href", "body"}"""
+
+    def close(self):
+        """Giải phóng kết nối"""
+
+
+class DuckDuckGoProvider(SearchProvider):
+    """Tìm kiếm qua DuckDuckGo, mỗi thread dùng lại một client DDGS"""
+
+    name = "duckduckgo"
+
+    def __init__(self, region: str = DEFAULT_REGION, timeout: int = 8):
+        # Import ở đây để chế độ stub không cần thư viện
+        import duckduckgo_search
+        from duckduckgo_search import DDGS
+
+        self._ddgs = DDGS
+        self.region = region
+        self.timeout = timeout
+        # DDGS tự chờ 0.75s giữa hai request liên tiếp trên cùng client; trước đây mỗi lần tìm kiếm
+        # dùng client mới nên không có khoảng chờ này. Dùng lại client chỉ khi đặt lại được mốc chờ
+        # qua thuộc tính nội bộ sleep_timestamp, tức là với phiên bản đã kiểm tra
+        self.reuse_clients = getattr(duckduckgo_search, "__version__", None) == DDGS_TESTED_VERSION
+        if not self.reuse_clients:
+            print(
+                f"duckduckgo_search {getattr(duckduckgo_search, '__version__', '?')} chưa được kiểm tra "
+                f"(cần {DDGS_TESTED_VERSION}), mỗi lần tìm kiếm dùng client mới"
+            )
+        # Client DDGS có trạng thái riêng (parser, mốc thời gian) nên không dùng chung giữa các thread
+        self._local = threading.local()
+
+    def _client(self):
+        if not self.reuse_clients:
+            return self._ddgs(timeout=self.timeout)
+        client = getattr(self._local, "client", None)
+        if client is None:
+            client = self._ddgs(timeout=self.timeout)
+            self._local.client = client
+        # Giữ nguyên nhịp gửi request như khi mỗi lần tìm kiếm dùng client mới
+        client.sleep_timestamp = 0.0
+        return client
+
+    def search(self, query: str, max_results: int) -> List[dict]:
+        return self._client().text(query, max_results=max_results, region=self.region) or []
+
+
+class StubSearchProvider(SearchProvider):
+    """Kết quả giả lập xác định theo câu truy vấn, không gọi mạng"""
+
+    name = "stub"
+
+    def __init__(self, latency: float = 0.0, domains: int = 4, body_words: int = 120):
+        self.latency = latency
+        self.domains = domains
+        self.body_words = body_words
+        self.calls = 0
+        self._lock = threading.Lock()
+
+    def search(self, query: str, max_results: int) -> List[dict]:
+        with self._lock:
+            self.calls += 1
+        if self.latency:
+            time.sleep(self.latency)
+        seed = zlib.crc32(query.encode("utf-8"))
+        slug = re.sub(r"\W+", "-", query.lower()).strip("-") or "ket-qua"
+        words = " ".join(f"{query} thông tin {n}" for n in range(self.body_words // 4))
+        return [
+            {
+                "title": f"Kết quả {i + 1} cho {query}",
+                # Vài kết quả trùng tên miền để kiểm tra bước bỏ trùng
+                "href": f"https://site{(seed + i) % self.domains}.example.vn/{slug}/{i + 1}",
+                "body": words,
+            }
+            for i in range(max_results)
+        ]
+
+
+def _domain(url: str) -> str:
+    netloc = urlparse(url or "").netloc.lower()
+    return netloc[4:] if netloc.startswith("www.") else netloc
+
+
+def trim_to_tokens(text: str, max_tokens: int) -> str:
+    """Cắt text trong ngân sách token (ước lượng), ở ranh giới từ, thêm dấu … nếu bị cắt"""
+    if estimate_tokens(text) <= max_tokens:
+        return text
+    limit = max(max_tokens * 4 - len(ELLIPSIS.encode("utf-8")), 0)
+    cut = text.encode("utf-8")[:limit].decode("utf-8", "ignore")
+    if " " in cut:
+        cut = cut.rsplit(" ", 1)[0]
+    return cut.rstrip(" ,;:.-") + ELLIPSIS
+
+
+def compact_results(results: List[dict], max_results: int, token_budget: int = DEFAULT_TOKEN_BUDGET) -> List[dict]:
+    """Hậu xử lý kết quả thô: mỗi tên miền giữ kết quả xếp hạng cao nhất, cắt snippet theo ngân sách token"""
+    selected, seen = [], set()
+    for result in results:
+        url = result.get("href") or result.get("url") or ""
+        domain = _domain(url)
+        if domain in seen:
+            continue
+        seen.add(domain)
+        selected.append((result, url))
+        if len(selected) >= max_results:
+            break
+    if not selected:
+        return []
+
+    per_result = token_budget // len(selected)
+    records = []
+    for result, url in selected:
+        title = " ".join((result.get("title") or "").split())
+        body = " ".join((result.get("body") or result.get("snippet") or "").split())
+        snippet_budget = max(per_result - estimate_tokens(title) - estimate_tokens(url), MIN_SNIPPET_TOKENS)
+        records.append({"title": title, "url": url, "snippet": trim_to_tokens(body, snippet_budget)})
+    return records
+
+
+def create_search_provider() -> SearchProvider:
+    """Tạo nguồn tìm kiếm theo cấu hình môi trường"""
+    kind = os.getenv("WEB_SEARCH_PROVIDER", "duckduckgo").lower()
+    if kind == "stub":
+        return StubSearchProvider(latency=float(os.getenv("WEB_SEARCH_STUB_LATENCY_MS", "0")) / 1000)
+    return DuckDuckGoProvider(
+        region=os.getenv("WEB_SEARCH_REGION", DEFAULT_REGION),
+        timeout=max(int(float(os.getenv("WEB_SEARCH_TIMEOUT", "8"))), 1),
+    )
@@ -1,10 +1,30 @@
 """
 Viết thành một tool để về sau sử dụng gắn vào AI Agent
+Kết quả được cache theo câu truy vấn (search_cache): TTL + LRU, gộp truy vấn trùng, timeout cứng.
+Nguồn tìm kiếm cấu hình qua WEB_SEARCH_PROVIDER (search_providers), kết quả được rút gọn
+(bỏ trùng tên miền, cắt snippet theo WEB_SEARCH_TOKEN_BUDGET) trước khi cache và đưa cho LLM.
 """
 
+import os
 from langchain_core.tools import tool
 from pydantic import BaseModel, Field
-from duckduckgo_search import DDGS
+from .search_cache import create_search_cache
+from .search_providers import DEFAULT_TOKEN_BUDGET, compact_results, create_search_provider
+
+
+SEARCH_TOKEN_BUDGET = int(os.getenv("WEB_SEARCH_TOKEN_BUDGET", str(DEFAULT_TOKEN_BUDGET)))
+
+search_provider = create_search_provider()
+
+
+def search_compact(query: str, max_results: int) -> list:
+    """Tìm kiếm qua provider và rút gọn kết quả"""
+    # Lấy dư kết quả để sau khi bỏ trùng tên miền vẫn đủ max_results
+    results = search_provider.search(query, max_results * 2)
+    return compact_results(results, max_results, SEARCH_TOKEN_BUDGET)
+
+
+search_cache = create_search_cache(search_compact)
 
 
 class WebSearchInput(BaseModel):
@@ -15,7 +35,5 @@ def web_search(input: str):
     """
     Tìm kiếm thông tin trên internet dựa vào nội dung người dùng cung cấp.
     """
-    results = DDGS().text(input, max_results=5, region="vn-vi")
+    results = search_cache.search(input, max_results=5)
     return results
-
-
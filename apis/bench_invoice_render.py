@@ -0,0 +1,105 @@
+"""
+Benchmark vẽ ảnh hóa đơn: cách cũ (thử nạp font và tạo canvas RGB mới mỗi lần, vẽ toàn bộ)
+so với InvoiceRenderer (font nạp sẵn, copy ảnh mẫu đã vẽ phần tĩnh, chỉ vẽ trường động).
+
+Chỉ đo việc vẽ + mã hóa PNG trong bộ nhớ, không qua cache và không ghi đĩa.
+
+Chạy: python bench_invoice_render.py --seconds 3
+"""
+
+import argparse
+import io
+import time
+from datetime import datetime
+
+from PIL import Image, ImageDraw, ImageFont
+
+from agents.tools.invoice_renderer import InvoiceRenderer
+from agents.tools.order_repository import SAMPLE_ORDERS
+
+
+WIDTH, HEIGHT = 820, 1100
+
+
+def legacy_render(order_id, order, width, height, issued_on):
+    """Cách vẽ cũ của image_tool (trước khi có InvoiceRenderer)"""
+    img = Image.new('RGB', (width, height), color='white')
+    draw = ImageDraw.Draw(img)
+    try:
+        font_large = ImageFont.truetype("arial.ttf", 24)
+        font_medium = ImageFont.truetype("arial.ttf", 18)
+        font_small = ImageFont.load_default()
+    except Exception:
+        font_large = ImageFont.load_default()
+        font_medium = ImageFont.load_default()
+        font_small = ImageFont.load_default()
+
+    y_position = 50
+    draw.text((50, y_position), f"HÓA ĐƠN - {order_id}", fill='black', font=font_large)
+    y_position += 40
+    draw.text((50, y_position), f"Ngày: {issued_on}", fill='black', font=font_medium)
+    y_position += 30
+    draw.text((50, y_position), "HIVESPACE COMPANY", fill='black', font=font_medium)
+    y_position += 25
+    draw.text((50, y_position), "info@hivespace.com", fill='black', font=font_small)
+    y_position += 40
+
+    if order:
+        draw.text((50, y_position), f"Khách hàng: {order['customer_name']}", fill='black', font=font_medium)
+        y_position += 25
+        draw.text((50, y_position), f"Email: {order['customer_email']}", fill='black', font=font_small)
+        y_position += 25
+        draw.text((50, y_position), f"Điện thoại: {order['customer_phone']}", fill='black', font=font_small)
+        y_position += 40
+        draw.text((50, y_position), "Sản phẩm:", fill='black', font=font_medium)
+        y_position += 25
+        for item in order['items'][:5]:
+            item_text = f"• {item['name']} x{item['quantity']} - {item['price']:,} VNĐ"
+            draw.text((70, y_position), item_text, fill='black', font=font_small)
+            y_position += 20
+        y_position += 20
+        subtotal = order['total_amount']
+        tax = int(subtotal * 0.1)
+        shipping = 50000
+        total = subtotal + tax + shipping
+        draw.text((50, y_position), f"Tạm tính: {subtotal:,} VNĐ", fill='black', font=font_medium)
+        y_position += 25
+        draw.text((50, y_position), f"Thuế (10%): {tax:,} VNĐ", fill='black', font=font_medium)
+        y_position += 25
+        draw.text((50, y_position), f"Vận chuyển: {shipping:,} VNĐ", fill='black', font=font_medium)
+        y_position += 25
+        draw.text((50, y_position), f"TỔNG: {total:,} VNĐ", fill='black', font=font_large)
+
+    buffer = io.BytesIO()
+    img.save(buffer, 'PNG')
+    return buffer.getvalue()
+
+
+def throughput(render, seconds: float):
+    """Số hóa đơn/giây và kích thước PNG trung bình khi vẽ lần lượt các đơn mẫu"""
+    issued_on = datetime.now().strftime('%d/%m/%Y')
+    count, total_bytes = 0, 0
+    deadline = time.perf_counter() + seconds
+    start = time.perf_counter()
+    while time.perf_counter() < deadline:
+        order = SAMPLE_ORDERS[count % len(SAMPLE_ORDERS)]
+        total_bytes += len(render(order["order_id"], order, WIDTH, HEIGHT, issued_on))
+        count += 1
+    return count / (time.perf_counter() - start), total_bytes / count
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--seconds", type=float, default=3.0, help="Thời gian đo mỗi cách")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    renderer = InvoiceRenderer()
+    renderer.template(WIDTH, HEIGHT)
+    print(f"Khởi tạo renderer (font + ảnh mẫu): {(time.perf_counter() - start) * 1000:.1f}ms")
+
+    before, before_size = throughput(legacy_render, args.seconds)
+    after, after_size = throughput(renderer.render, args.seconds)
+    print(f"  cũ     : {before:7.1f} hóa đơn/giây | PNG {before_size / 1024:5.1f}KB")
+    print(f"  renderer: {after:7.1f} hóa đơn/giây | PNG {after_size / 1024:5.1f}KB")
+    print(f"  nhanh hơn {after / before:.1f}x")
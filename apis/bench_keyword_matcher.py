@@ -0,0 +1,148 @@
+"""
+Benchmark phân loại yêu cầu tạo ảnh / ảnh hóa đơn theo từ khóa.
+
+So sánh:
+  - trước: lower() + any(k in t for k in keywords) trên từng danh sách, luồng stream phân loại hai lần
+    (is_invoice_image_request rồi is_image_request)
+  - sau  : KeywordMatcher biên dịch một lần, một lần quét trả về mọi intent (image_intent)
+
+Danh sách từ khóa thật được mở rộng bằng các cụm từ đa ngôn ngữ sinh ngẫu nhiên để xem chi phí
+tăng thế nào khi số cụm từ lên tới hàng trăm. Trước khi đo, kiểm tra hai cách cho cùng kết quả.
+
+Chạy: python bench_keyword_matcher.py --phrases 0 100 500 --messages 2000
+"""
+
+import argparse
+import random
+import time
+
+from agents.intent_router import IMAGE_KEYWORDS, INVOICE_IMAGE_KEYWORDS, INVOICE_KEYWORDS
+from agents.keyword_matcher import KeywordMatcher
+
+
+VERBS = ["tạo", "vẽ", "thiết kế", "make", "draw", "design", "créer", "dessiner", "erstellen", "zeichne", "生成", "画"]
+NOUNS = ["ảnh", "hình", "tranh", "picture", "illustration", "artwork", "image", "bild", "dessin", "图片", "插图", "hình nền"]
+DOCS = ["hóa đơn", "biên nhận", "phiếu", "statement", "facture", "rechnung", "quittung", "发票", "收据", "đơn mua"]
+FILLER = [
+    "cho tôi hỏi", "đơn hàng ORD-2024-001 đang ở đâu", "giá iPhone 15 Pro bao nhiêu", "thời tiết hôm nay thế nào",
+    "so sánh MacBook Air M2 và Dell XPS 13", "tôi muốn đổi địa chỉ giao hàng", "please check my order status",
+    "sản phẩm nào bán chạy nhất tháng này", "có khuyến mãi gì không", "cảm ơn bạn nhiều nhé",
+]
+
+
+def extend(keywords, extra, seed):
+    """Danh sách từ khóa gốc cộng thêm `extra` cụm từ sinh ngẫu nhiên (không trùng)"""
+    rng = random.Random(seed)
+    phrases = list(keywords)
+    seen = set(phrases)
+    while len(phrases) < len(keywords) + extra:
+        phrase = f"{rng.choice(VERBS)} {rng.choice(NOUNS)} {rng.randint(1, 99)}"
+        if phrase not in seen:
+            seen.add(phrase)
+            phrases.append(phrase)
+    return phrases
+
+
+def extend_docs(keywords, extra, seed):
+    rng = random.Random(seed)
+    phrases = list(keywords)
+    seen = set(phrases)
+    while len(phrases) < len(keywords) + extra:
+        phrase = f"{rng.choice(DOCS)} {rng.randint(1, 999)}"
+        if phrase not in seen:
+            seen.add(phrase)
+            phrases.append(phrase)
+    return phrases
+
+
+def make_messages(count, image, invoice, seed=42):
+    rng = random.Random(seed)
+    messages = []
+    for _ in range(count):
+        roll = rng.random()
+        text = rng.choice(FILLER)
+        if roll < 0.15:
+            text = f"{rng.choice(image)} {text}"
+        elif roll < 0.25:
+            text = f"{rng.choice(image)} {rng.choice(invoice)} {text}"
+        messages.append(text + " " + " ".join(rng.choice(FILLER) for _ in range(rng.randint(0, 3))))
+    return messages
+
+
+def legacy_classifiers(image, invoice, invoice_image):
+    def is_image_request(text):
+        t = text.lower()
+        return any(k in t for k in image)
+
+    def is_invoice_image_request(text):
+        t = text.lower()
+        return any(k in t for k in invoice) and any(k in t for k in invoice_image)
+
+    def classify(text):
+        # Như luồng stream trước đây: hai lần phân loại
+        if is_invoice_image_request(text):
+            return "invoice_image"
+        if is_image_request(text):
+            return "image"
+        return None
+
+    return classify
+
+
+def compiled_classifier(image, invoice, invoice_image):
+    matcher = KeywordMatcher({"image": image, "invoice": invoice, "invoice_image": invoice_image})
+
+    def classify(text):
+        intents = matcher.intents(text)
+        if "invoice" in intents and "invoice_image" in intents:
+            return "invoice_image"
+        if "image" in intents:
+            return "image"
+        return None
+
+    return classify, matcher
+
+
+def timed(classify, messages, repeat):
+    best = float("inf")
+    for _ in range(repeat):
+        started = time.perf_counter()
+        for message in messages:
+            classify(message)
+        best = min(best, time.perf_counter() - started)
+    return best / len(messages) * 1e6
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--phrases", type=int, nargs="+", default=[0, 100, 500], help="Số cụm từ thêm vào mỗi danh sách")
+    parser.add_argument("--messages", type=int, default=2000)
+    parser.add_argument("--repeat", type=int, default=5)
+    args = parser.parse_args()
+
+    for extra in args.phrases:
+        image = extend(IMAGE_KEYWORDS, extra, seed=1)
+        invoice_image = extend(INVOICE_IMAGE_KEYWORDS, extra, seed=2)
+        invoice = extend_docs(INVOICE_KEYWORDS, extra, seed=3)
+        messages = make_messages(args.messages, image, invoice)
+
+        legacy = legacy_classifiers(image, invoice, invoice_image)
+        started = time.perf_counter()
+        compiled, matcher = compiled_classifier(image, invoice, invoice_image)
+        build_ms = (time.perf_counter() - started) * 1000
+        mismatches = sum(legacy(m) != compiled(m) for m in messages)
+
+        before = timed(legacy, messages, args.repeat)
+        after = timed(compiled, messages, args.repeat)
+        total = len(image) + len(invoice) + len(invoice_image)
+        print(
+            f"{total:5d} cụm từ | trước {before:7.2f} µs/câu | sau {after:6.2f} µs/câu"
+            f" | x{before / after:5.1f} | biên dịch {build_ms:6.1f} ms | lệch kết quả: {mismatches}"
+        )
+
+    sample = "Tạo ảnh hóa đơn cho đơn hàng ORD-2024-001"
+    print(f"\nVí dụ find({sample!r}):")
+    for match in KeywordMatcher({
+        "image": IMAGE_KEYWORDS, "invoice": INVOICE_KEYWORDS, "invoice_image": INVOICE_IMAGE_KEYWORDS,
+    }).find(sample):
+        print(f"  {match}")
@@ -0,0 +1,118 @@
+"""
+Benchmark truy vấn lọc/tổng hợp sản phẩm: quét list dict (cách cũ) so với catalog dạng cột (NumPy).
+
+Dữ liệu sản phẩm được sinh ngẫu nhiên theo cùng schema với products.json.
+Các truy vấn:
+  - filter   : còn hàng, giá 100-800, rating >= 4.5, thương hiệu Apple
+  - cheapest : sản phẩm còn hàng rẻ nhất của mỗi danh mục
+  - avg      : đánh giá trung bình theo thương hiệu
+
+Chạy: python bench_product_columns.py --rows 10000 100000 1000000
+"""
+
+import argparse
+import random
+import time
+
+from agents.tools.product_catalog import CATEGORIES
+from agents.tools.product_columns import ProductColumns
+
+
+BRANDS = ["Apple", "Samsung", "Sony", "Dell", "Lenovo", "Asus", "Xiaomi", "LG", "Nike", "Adidas"] + [
+    f"Brand {i}" for i in range(190)
+]
+
+
+def generate_products(rows: int, seed: int = 42):
+    rng = random.Random(seed)
+    return [
+        {
+            "id": i + 1,
+            "name": f"Product {i + 1}",
+            "price": round(rng.uniform(5, 3000), 2),
+            "category": rng.choice(CATEGORIES),
+            "in_stock": rng.random() < 0.7,
+            "brand": rng.choice(BRANDS),
+            "rating": round(rng.uniform(3, 5), 1),
+        }
+        for i in range(rows)
+    ]
+
+
+def dict_filter(products):
+    return [
+        p for p in products
+        if p["in_stock"] and 100 <= p["price"] <= 800 and p["rating"] >= 4.5 and p["brand"].lower() == "apple"
+    ]
+
+
+def dict_cheapest(products):
+    best = {}
+    for p in products:
+        if p["in_stock"]:
+            current = best.get(p["category"])
+            if current is None or p["price"] < current["price"]:
+                best[p["category"]] = p
+    return sorted(best.values(), key=lambda p: p["price"])
+
+
+def dict_avg(products):
+    sums, counts = {}, {}
+    for p in products:
+        sums[p["brand"]] = sums.get(p["brand"], 0.0) + p["rating"]
+        counts[p["brand"]] = counts.get(p["brand"], 0) + 1
+    return {brand: sums[brand] / counts[brand] for brand in sums}
+
+
+def column_filter(columns):
+    return columns.rows(columns.mask(in_stock=True, min_price=100, max_price=800, min_rating=4.5, brand="apple"))
+
+
+def column_cheapest(columns):
+    return columns.cheapest_by("category", columns.mask(in_stock=True))
+
+
+def column_avg(columns):
+    return columns.group_stats("brand", "rating")
+
+
+def best_of(func, arg, repeat):
+    timings = []
+    for _ in range(repeat):
+        start = time.perf_counter()
+        func(arg)
+        timings.append(time.perf_counter() - start)
+    return min(timings)
+
+
+def run(rows: int, repeat: int):
+    products = generate_products(rows)
+    start = time.perf_counter()
+    columns = ProductColumns(products)
+    build = time.perf_counter() - start
+
+    # Hai cách phải cho cùng kết quả (các nhóm cùng giá có thể khác thứ tự)
+    assert [p["id"] for p in dict_filter(products)] == [p["id"] for p in column_filter(columns)]
+    assert {p["id"] for p in dict_cheapest(products)} == {g["product"]["id"] for g in column_cheapest(columns)}
+
+    print(f"rows={rows:,} | dựng catalog dạng cột: {build * 1000:.0f}ms")
+    for name, dict_func, column_func in (
+        ("filter", dict_filter, column_filter),
+        ("cheapest", dict_cheapest, column_cheapest),
+        ("avg", dict_avg, column_avg),
+    ):
+        dict_time = best_of(dict_func, products, repeat)
+        column_time = best_of(column_func, columns, repeat)
+        print(
+            f"  {name:<9}: dict {dict_time * 1000:8.2f}ms | cột {column_time * 1000:8.2f}ms"
+            f" | nhanh hơn {dict_time / column_time:5.1f}x"
+        )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--rows", type=int, nargs="+", default=[10_000, 100_000, 1_000_000], help="Số sản phẩm")
+    parser.add_argument("--repeat", type=int, default=5, help="Số lần đo mỗi truy vấn (lấy lần nhanh nhất)")
+    args = parser.parse_args()
+    for rows in args.rows:
+        run(rows, args.repeat)
@@ -0,0 +1,90 @@
+"""
+Benchmark độ trễ của /api/messages/send/stream khi có N stream đồng thời.
+
+LLM được giả lập (không gọi Gemini) bằng một độ trễ cố định, graph LangGraph
+vẫn là graph thật của HiveSpaceAgent. Chế độ --blocking mô phỏng cách chạy cũ
+(gọi LLM đồng bộ ngay trên event loop) để so sánh.
+
+Chạy: python bench_stream_concurrency.py --streams 50 --latency 0.5
+"""
+
+import argparse
+import asyncio
+import statistics
+import time
+
+import httpx
+from langchain_core.messages import AIMessage
+from langchain_core.runnables import RunnableLambda
+
+import main
+from agents import agent as agent_module
+
+
+def build_fake_agent(latency: float, blocking: bool):
+    """Tạo HiveSpaceAgent với LLM giả lập, không cần API key"""
+    def fake_llm(messages, config=None):
+        time.sleep(latency)
+        return AIMessage(content="Xin chào, đây là phản hồi giả lập.")
+
+    async def afake_llm(messages, config=None):
+        if blocking:
+            # Mô phỏng gọi LLM đồng bộ trên event loop
+            time.sleep(latency)
+        else:
+            await asyncio.sleep(latency)
+        return AIMessage(content="Xin chào, đây là phản hồi giả lập.")
+
+    agent = agent_module.HiveSpaceAgent.__new__(agent_module.HiveSpaceAgent)
+    agent.tools = []
+    agent.react_agent = RunnableLambda(fake_llm, afunc=afake_llm)
+    agent._setup_workflow()
+    return agent
+
+
+def percentile(values, p):
+    ordered = sorted(values)
+    k = max(0, min(len(ordered) - 1, int(round(p / 100 * len(ordered) + 0.5)) - 1))
+    return ordered[k]
+
+
+async def run(streams: int, latency: float, blocking: bool):
+    fake_agent = build_fake_agent(latency, blocking)
+    agent_module.agent_registry._factory = lambda: fake_agent
+    agent_module.agent_registry._agent = fake_agent
+
+    transport = httpx.ASGITransport(app=main.app)
+    async with httpx.AsyncClient(transport=transport, base_url="http://bench") as client:
+        session_ids = []
+        for i in range(streams):
+            resp = await client.post("/api/sessions/new", json={"title": f"bench {i}"})
+            session_ids.append(resp.json()["id"])
+
+        async def one_stream(session_id):
+            start = time.perf_counter()
+            resp = await client.post(
+                "/api/messages/send/stream",
+                json={"session_id": session_id, "message": "Xin chào"},
+            )
+            assert '"type": "complete"' in resp.text, resp.text
+            return time.perf_counter() - start
+
+        wall_start = time.perf_counter()
+        latencies = await asyncio.gather(*(one_stream(sid) for sid in session_ids))
+        wall = time.perf_counter() - wall_start
+
+    mode = "blocking (cũ)" if blocking else "async"
+    print(f"Chế độ: {mode} | streams={streams} | LLM latency={latency * 1000:.0f}ms")
+    print(f"  wall time : {wall * 1000:.0f}ms")
+    print(f"  p50       : {statistics.median(latencies) * 1000:.0f}ms")
+    print(f"  p95       : {percentile(latencies, 95) * 1000:.0f}ms")
+    print(f"  p99       : {percentile(latencies, 99) * 1000:.0f}ms")
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--streams", type=int, default=50, help="Số stream đồng thời")
+    parser.add_argument("--latency", type=float, default=0.5, help="Độ trễ giả lập của mỗi lượt LLM (giây)")
+    parser.add_argument("--blocking", action="store_true", help="Mô phỏng LLM chạy đồng bộ trên event loop")
+    args = parser.parse_args()
+    asyncio.run(run(args.streams, args.latency, args.blocking))
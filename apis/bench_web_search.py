@@ -0,0 +1,87 @@
+"""
+Thử tải web_search bằng StubSearchProvider (không gọi mạng).
+
+So sánh:
+  - trước: mỗi lần gọi đi thẳng tới provider, kết quả thô đưa nguyên vào ngữ cảnh
+  - sau  : SearchCache (TTL + LRU + gộp truy vấn trùng) + kết quả đã rút gọn (compact_results)
+
+Truy vấn lấy từ một tập câu hỏi với phân bố lệch (vài câu rất phổ biến), chạy song song nhiều thread.
+
+Chạy: python bench_web_search.py --requests 2000 --concurrency 32 --latency-ms 200
+"""
+
+import argparse
+import json
+import random
+import statistics
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from agents.tools.search_cache import SearchCache
+from agents.tools.search_providers import StubSearchProvider, compact_results, estimate_tokens, DEFAULT_TOKEN_BUDGET
+
+
+MAX_RESULTS = 5
+
+
+def make_queries(count: int, distinct: int, seed: int = 42):
+    rng = random.Random(seed)
+    pool = [f"câu hỏi phổ biến số {n}" for n in range(distinct)]
+    # Phân bố Zipf xấp xỉ: câu thứ n có trọng số 1/(n+1)
+    weights = [1 / (n + 1) for n in range(distinct)]
+    return rng.choices(pool, weights=weights, k=count)
+
+
+def run(search, queries, concurrency: int):
+    latencies, tokens = [], []
+
+    def one(query):
+        started = time.perf_counter()
+        results = search(query)
+        latencies.append(time.perf_counter() - started)
+        tokens.append(estimate_tokens(json.dumps(results, ensure_ascii=False)))
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        list(executor.map(one, queries))
+    wall = time.perf_counter() - started
+    latencies.sort()
+    return {
+        "rps": len(queries) / wall,
+        "p50": latencies[len(latencies) // 2] * 1000,
+        "p95": latencies[int(len(latencies) * 0.95)] * 1000,
+        "tokens": statistics.mean(tokens),
+    }
+
+
+def report(name, stats, provider_calls):
+    print(
+        f"  {name:<6}: {stats['rps']:8.1f} req/s | p50 {stats['p50']:7.1f}ms | p95 {stats['p95']:7.1f}ms"
+        f" | {stats['tokens']:6.0f} token/lần | provider {provider_calls} lần"
+    )
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--requests", type=int, default=2000)
+    parser.add_argument("--concurrency", type=int, default=32)
+    parser.add_argument("--distinct", type=int, default=200, help="Số câu truy vấn khác nhau")
+    parser.add_argument("--latency-ms", type=float, default=200, help="Độ trễ giả lập của provider")
+    parser.add_argument("--token-budget", type=int, default=DEFAULT_TOKEN_BUDGET)
+    args = parser.parse_args()
+
+    queries = make_queries(args.requests, args.distinct)
+    print(f"{args.requests} truy vấn ({args.distinct} câu khác nhau), {args.concurrency} thread, provider {args.latency_ms:g}ms")
+
+    before_provider = StubSearchProvider(latency=args.latency_ms / 1000)
+    before = run(lambda q: before_provider.search(q, MAX_RESULTS), queries, args.concurrency)
+    report("trước", before, before_provider.calls)
+
+    after_provider = StubSearchProvider(latency=args.latency_ms / 1000)
+    cache = SearchCache(
+        lambda q, n: compact_results(after_provider.search(q, n * 2), n, args.token_budget),
+        max_workers=args.concurrency,
+    )
+    after = run(lambda q: cache.search(q, MAX_RESULTS), queries, args.concurrency)
+    report("sau", after, after_provider.calls)
+    print(f"  cache: {cache.stats()}")
@@ -3,17 +3,29 @@ HiveSpace Chatbox API
 API backend cho hệ thống chatbox HiveSpace với quản lý phiên chat và lịch sử tin nhắn
 """
 
-from fastapi import FastAPI, HTTPException, UploadFile, File, Form
+from fastapi import FastAPI, HTTPException, UploadFile, File, Form, Query, Request, Response
 from fastapi.middleware.cors import CORSMiddleware
-from fastapi.responses import StreamingResponse
+from fastapi.responses import StreamingResponse, FileResponse
+from starlette.concurrency import run_in_threadpool
 from pydantic import BaseModel
 from typing import List, Optional
 from datetime import datetime
 import uuid
 import json
+import hashlib
 import os
-from agents.agent import create_agent
-from agents.tools.image_tool import build_general_image_markdown, build_invoice_html, invoice_html_to_image
+import time
+from agents.agent import agent_registry, get_agent, tool_stats
+from agents.intent_router import KEYWORD_MATCHER, create_intent_router, image_intent
+from agents.response_cache import create_response_cache
+from agents.tools.image_tool import build_general_image_markdown, arender_invoice_markdown, invoice_pool
+from agents.tools.invoice_batch import BATCH_FORMATS, MAX_BATCH_ORDERS, batch_path, run_invoice_batch, select_batch_orders
+from agents.tools.product_catalog import product_catalog
+from agents.tools.product_semantic import create_semantic_index
+from sessions.store import SessionStore
+from sessions.persistence import create_backend
+from sessions.context import ContextBuilder
+from sessions.summarizer import ConversationSummarizer
 import json
 import os
 
@@ -39,8 +51,18 @@ app.add_middleware(
     allow_credentials=True,
     allow_methods=["*"],
     allow_headers=["*"],
+    expose_headers=["ETag", "X-Next-Cursor"],
 )
 
+@app.on_event("startup")
+async def init_agent():
+    """Khởi tạo HiveSpaceAgent dùng chung một lần khi server khởi động"""
+    try:
+        await run_in_threadpool(agent_registry.get)
+    except Exception as e:
+        # Không chặn server khởi động, agent sẽ được khởi tạo lại ở request đầu tiên
+        print(f"Error initializing AI agent: {str(e)}")
+
 # Models
 class Message(BaseModel):
     id: str
@@ -65,6 +87,11 @@ class ChatSessionDetail(BaseModel):
     created_at: str
     updated_at: str
 
+class MessagePage(BaseModel):
+    messages: List[Message]
+    has_more: bool
+    next_before: Optional[str] = None
+
 class NewMessageRequest(BaseModel):
     session_id: str
     message: str
@@ -72,8 +99,50 @@ class NewMessageRequest(BaseModel):
 class NewSessionRequest(BaseModel):
     title: str
 
-# Fake data - Danh sách phiên chat (khởi tạo rỗng, không có dữ liệu mẫu)
-chat_sessions = []
+class InvoiceBatchRequest(BaseModel):
+    # Danh sách mã đơn, hoặc lọc theo trạng thái và/hoặc ngày đặt hàng ("2024-01-15", "2024-01")
+    order_ids: Optional[List[str]] = None
+    status: Optional[str] = None
+    order_date: Optional[str] = None
+    format: str = "zip"  # zip | pdf
+
+# Cache câu trả lời của agent cho câu hỏi lặp lại (bật bằng AGENT_RESPONSE_CACHE=1)
+response_cache = create_response_cache()
+
+# Trả lời trực tiếp câu tra cứu mã đơn / tên sản phẩm, không qua LLM (tắt bằng INTENT_ROUTER=0)
+intent_router = create_intent_router()
+
+# Kho phiên chat, lưu bền vững qua backend cấu hình bằng SESSION_BACKEND
+session_store = SessionStore(create_backend())
+
+@app.on_event("startup")
+async def load_sessions():
+    """Nạp header các phiên chat đã lưu (tin nhắn được nạp lười khi mở phiên)"""
+    await run_in_threadpool(session_store.load)
+
+@app.on_event("startup")
+async def init_product_catalog():
+    """Nạp sẵn catalog sản phẩm và bật tìm kiếm ngữ nghĩa nếu được cấu hình"""
+    await run_in_threadpool(lambda: product_catalog.products)
+    semantic_index = await run_in_threadpool(create_semantic_index)
+    if semantic_index is not None:
+        # Embedding của sản phẩm chưa có trong chỉ mục được tính ở thread nền
+        product_catalog.enable_semantic(semantic_index)
+
+@app.on_event("startup")
+async def init_invoice_pool():
+    """Khởi động sẵn các worker vẽ hóa đơn (nạp font, vẽ ảnh mẫu) trước request đầu tiên"""
+    await run_in_threadpool(invoice_pool.warm)
+
+@app.on_event("shutdown")
+async def close_sessions():
+    """Ghi nốt các thay đổi đang chờ trước khi tắt server"""
+    await run_in_threadpool(session_store.close)
+
+@app.on_event("shutdown")
+async def close_invoice_pool():
+    """Dừng các worker vẽ hóa đơn"""
+    await run_in_threadpool(invoice_pool.shutdown)
 
 # Helper functions
 def get_current_timestamp():
@@ -121,6 +190,7 @@ def load_ai_system_prompt():
             "3. Tìm kiếm thông tin đơn hàng và trạng thái giao hàng\n"
             "4. Tạo hình ảnh theo yêu cầu (hóa đơn hoặc tổng quát)\n\n"
             "Khi người dùng hỏi về sản phẩm, hãy sử dụng product_search tool để tìm thông tin chi tiết.\n"
+            "Khi cần so sánh hoặc thống kê sản phẩm theo danh mục/thương hiệu, hãy sử dụng product_stats tool.\n"
             "Khi cần thông tin mới nhất, hãy sử dụng web_search tool để tìm kiếm trên internet.\n"
             "Khi người dùng hỏi về đơn hàng, hãy sử dụng order_search tool để tìm thông tin đơn hàng.\n"
             "Khi người dùng yêu cầu tạo hình ảnh hóa đơn/đơn hàng, tôi sẽ tạo hóa đơn đơn giản với background trắng, text đen, không trang trí, kích thước 400x600.\n"
@@ -130,6 +200,15 @@ def load_ai_system_prompt():
 # Nạp prompt ngay khi khởi động
 load_ai_system_prompt()
 
+# Dựng ngữ cảnh hội thoại theo ngân sách token (prefix hệ thống được cache giữa các lượt)
+context_builder = ContextBuilder(
+    lambda: AI_SYSTEM_PROMPT,
+    max_tokens=int(os.getenv("CONTEXT_MAX_TOKENS", "8000")),
+)
+
+# Tóm tắt nền các tin nhắn bị đẩy ra khỏi ngữ cảnh của phiên dài
+summarizer = ConversationSummarizer(session_store, lambda: get_agent().basic_agent)
+
 PRODUCTS_DB_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), "database", "products.json")
 
 def _ensure_products_db_dir():
@@ -227,52 +306,38 @@ def import_products_from_txt(file_content: bytes):
         existing.append(item)
 
     save_imported_products(existing)
+    # Nạp lại catalog ngay, không chờ phát hiện thay đổi mtime
+    product_catalog.refresh()
+    # Chỉ tính embedding cho các sản phẩm vừa thêm (nếu bật tìm kiếm ngữ nghĩa)
+    product_catalog.schedule_semantic_sync()
     names = ", ".join([p["name"] for p in imported])
     return {"success": True, "count": len(imported), "names": names}
 
 def update_session_activity(session_id: str):
     """Cập nhật thời gian hoạt động của phiên chat"""
-    for session in chat_sessions:
-        if session["id"] == session_id:
-            session["updated_at"] = get_current_timestamp()
-            session["last_activity"] = "Just now"
-            break
+    session_store.touch(session_id, get_current_timestamp())
 
 # Image utilities
 def is_image_request(text: str) -> bool:
     """Nhận diện yêu cầu tạo hình ảnh từ người dùng"""
     if not text:
         return False
-    keywords = [
-        "tạo hình", "tạo ảnh", "vẽ ảnh", "vẽ hình", "generate image", "create an image",
-        "image of", "hình minh họa", "poster", "logo", "bìa", "banner"
-    ]
-    t = text.lower()
-    return any(k in t for k in keywords)
+    return "image" in KEYWORD_MATCHER.intents(text)
 
 def is_invoice_image_request(text: str) -> bool:
     """Nhận diện yêu cầu tạo hình ảnh hóa đơn cụ thể"""
     if not text:
         return False
-    t = text.lower()
-    
-    # Từ khóa liên quan đến hóa đơn/đơn hàng
-    invoice_keywords = [
-        "hóa đơn", "hoá đơn", "bill", "invoice", "receipt", "đơn hàng", "order",
-        "biên lai", "phiếu thu", "chứng từ"
-    ]
-    
-    # Từ khóa tạo ảnh
-    image_keywords = [
-        "tạo hình", "tạo ảnh", "vẽ ảnh", "vẽ hình", "generate image", "create an image",
-        "hình minh họa", "minh họa"
-    ]
-    
-    # Phải có cả hai loại từ khóa
-    has_invoice = any(k in t for k in invoice_keywords)
-    has_image = any(k in t for k in image_keywords)
-    
-    return has_invoice and has_image
+    # Phải có cả hai loại từ khóa: hóa đơn/đơn hàng và tạo ảnh
+    return image_intent(text) == "invoice_image"
+
+def stream_metrics(started_at: float, first_token_at: Optional[float]) -> dict:
+    """Số liệu thời gian của một lượt streaming (gửi kèm event complete)"""
+    now = time.perf_counter()
+    return {
+        "ttft_ms": round(((first_token_at or now) - started_at) * 1000, 1),
+        "total_ms": round((now - started_at) * 1000, 1),
+    }
 
 """Image helpers moved to agents.tools.image_tool.
 We import and reuse them here to avoid duplication and keep main.py slim.
@@ -281,8 +346,8 @@ We import and reuse them here to avoid duplication and keep main.py slim.
 def generate_ai_response(user_message: str) -> str:
     """Tạo phản hồi AI sử dụng HiveSpace Agent"""
     try:
-        # Tạo agent instance
-        agent = create_agent()
+        # Lấy agent dùng chung
+        agent = get_agent()
         
         # Gọi agent để xử lý câu hỏi
         response = agent.ask_simple_question(user_message)
@@ -312,26 +377,120 @@ async def root():
         }
     }
 
+@app.post("/api/admin/agent/reload")
+async def reload_agent():
+    """Hot-reload agent dùng chung sau khi thay đổi cấu hình (.env, model...)"""
+    try:
+        await run_in_threadpool(agent_registry.reload)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Không thể tải lại agent: {str(e)}")
+    return {"success": True, "generation": agent_registry.generation}
+
+@app.get("/api/admin/response-cache")
+async def get_response_cache_stats():
+    """Số liệu cache câu trả lời của agent (hit/miss, tỉ lệ hit)"""
+    return response_cache.stats()
+
+@app.get("/api/admin/intent-router")
+async def get_intent_router_stats():
+    """Số câu được router trả lời trực tiếp theo loại và số câu chuyển cho agent"""
+    return intent_router.stats()
+
+@app.get("/api/admin/tools")
+async def get_tool_stats():
+    """Thread chạy tool của agent (số tool quá AGENT_TOOL_TIMEOUT vẫn đang chạy) và pool vẽ hóa đơn"""
+    return {**tool_stats(), "invoice_pool": invoice_pool.stats()}
+
+def session_summary(session: dict) -> dict:
+    """Header của phiên chat để trả về danh sách (không kèm tin nhắn)"""
+    return {
+        "id": session["id"],
+        "title": session["title"],
+        "last_activity": format_time_ago(session["updated_at"]),
+        "message_count": session["message_count"],
+        "created_at": session["created_at"],
+        "updated_at": session["updated_at"],
+    }
+
 @app.get("/api/sessions", response_model=List[ChatSession])
-async def get_chat_sessions():
-    """Lấy danh sách tất cả phiên chat"""
-    # Cập nhật last_activity cho tất cả sessions
-    for session in chat_sessions:
-        session["last_activity"] = format_time_ago(session["updated_at"])
-        session["message_count"] = len(session["messages"])
+async def get_chat_sessions(
+    request: Request,
+    response: Response,
+    limit: Optional[int] = Query(None, ge=1, le=200, description="Số phiên mỗi trang"),
+    cursor: Optional[str] = Query(None, description="Giá trị X-Next-Cursor của trang trước"),
+    since: Optional[str] = Query(None, description="Chỉ trả về các phiên có updated_at mới hơn mốc này"),
+):
+    """Lấy danh sách phiên chat (mới cập nhật nhất trước)
+
+    - Không có tham số: trả về tất cả phiên
+    - limit/cursor: phân trang, cursor của trang tiếp theo nằm ở header X-Next-Cursor
+    - since: chỉ trả về các phiên thay đổi sau mốc updated_at này (bỏ qua limit/cursor)
+    - Hỗ trợ ETag/If-None-Match: trả về 304 nếu danh sách không đổi
+    """
+    # last_activity hiển thị theo phút nên ETag của danh sách đầy đủ đổi theo phút kể cả khi dữ liệu
+    # không đổi; polling bằng since chỉ phụ thuộc dữ liệu (client tự tính lại "X min ago" từ updated_at)
+    minute = "" if since else int(time.time() // 60)
+    etag_source = f"{session_store.version}:{minute}:{limit}:{cursor}:{since}"
+    etag = f'W/"{hashlib.md5(etag_source.encode()).hexdigest()[:16]}"'
+    if request.headers.get("if-none-match") == etag:
+        return Response(status_code=304, headers={"ETag": etag})
+    
+    next_cursor = None
+    if since:
+        sessions = session_store.list_since(since)
+    elif limit:
+        sessions, next_cursor = session_store.list_page(limit, cursor)
+    else:
+        sessions = session_store.list_sessions()
     
-    return chat_sessions
+    response.headers["ETag"] = etag
+    if next_cursor:
+        response.headers["X-Next-Cursor"] = next_cursor
+    return [session_summary(session) for session in sessions]
 
 @app.get("/api/sessions/{session_id}", response_model=ChatSessionDetail)
 async def get_chat_session_detail(session_id: str):
     """Lấy chi tiết phiên chat và lịch sử tin nhắn"""
-    for session in chat_sessions:
-        if session["id"] == session_id:
-            # Cập nhật last_activity
-            session["last_activity"] = format_time_ago(session["updated_at"])
-            return session
+    session = await run_in_threadpool(session_store.get, session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Phiên chat không tồn tại")
+    
+    # Cập nhật last_activity
+    session["last_activity"] = format_time_ago(session["updated_at"])
+    return {**session, "messages": await run_in_threadpool(session_store.get_messages, session_id)}
+
+@app.get("/api/sessions/{session_id}/header", response_model=ChatSession)
+async def get_chat_session_header(session_id: str):
+    """Lấy thông tin phiên chat (không kèm tin nhắn)"""
+    session = await run_in_threadpool(session_store.get, session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Phiên chat không tồn tại")
+    
+    return session_summary(session)
+
+@app.get("/api/sessions/{session_id}/messages", response_model=MessagePage)
+async def get_chat_session_messages(
+    session_id: str,
+    limit: int = Query(50, ge=1, le=200, description="Số tin nhắn mỗi trang"),
+    before: Optional[str] = Query(None, description="Chỉ lấy tin nhắn cũ hơn tin nhắn có id này"),
+):
+    """Lấy lịch sử tin nhắn theo trang, trang đầu là các tin nhắn mới nhất
+
+    Dùng next_before của trang hiện tại làm before để tải trang cũ hơn.
+    """
+    try:
+        page = await run_in_threadpool(session_store.get_messages_page, session_id, limit, before)
+    except KeyError:
+        raise HTTPException(status_code=404, detail="Tin nhắn không tồn tại")
+    if page is None:
+        raise HTTPException(status_code=404, detail="Phiên chat không tồn tại")
     
-    raise HTTPException(status_code=404, detail="Phiên chat không tồn tại")
+    messages, has_more = page
+    return {
+        "messages": messages,
+        "has_more": has_more,
+        "next_before": messages[0]["id"] if has_more and messages else None,
+    }
 
 @app.post("/api/sessions/new", response_model=ChatSessionDetail)
 async def create_new_chat_session(request: NewSessionRequest):
@@ -354,18 +513,14 @@ async def create_new_chat_session(request: NewSessionRequest):
         ]
     }
     
-    chat_sessions.append(new_session)
+    session_store.add(new_session)
     return new_session
 
 @app.post("/api/messages/send")
 async def send_message(request: NewMessageRequest):
     """Gửi tin nhắn mới và nhận phản hồi AI"""
     # Tìm phiên chat
-    session = None
-    for s in chat_sessions:
-        if s["id"] == request.session_id:
-            session = s
-            break
+    session = await run_in_threadpool(session_store.get, request.session_id)
     
     if not session:
         raise HTTPException(status_code=404, detail="Phiên chat không tồn tại")
@@ -379,39 +534,37 @@ async def send_message(request: NewMessageRequest):
         "sender_name": "User"
     }
     
-    session["messages"].append(user_message)
+    await run_in_threadpool(session_store.append_message, session["id"], user_message)
     
-    # Phân loại yêu cầu tạo ảnh: hóa đơn hoặc tổng quát
-    if is_invoice_image_request(request.message):
+    # Phân loại yêu cầu tạo ảnh (một lần quét từ khóa): hóa đơn hoặc tổng quát
+    intent = image_intent(request.message)
+    if intent == "invoice_image":
         prompt = request.message
-        order_id, html = build_invoice_html(prompt)
-        ai_response = invoice_html_to_image(order_id, html)
-    elif is_image_request(request.message):
+        # Ảnh hóa đơn được vẽ ở invoice_pool, event loop chỉ chờ kết quả
+        ai_response = await arender_invoice_markdown(prompt)
+    elif intent == "image":
         prompt = request.message
         ai_response = build_general_image_markdown(prompt)
     else:
         try:
-            agent = create_agent()
-            # Lấy tối đa 20 tin nhắn gần nhất để làm ngữ cảnh
-            recent_messages = session["messages"][-20:] if len(session["messages"]) > 0 else []
-            # Chuyển đổi định dạng tin nhắn sang format mà agent mong đợi
-            history = []
-            # Thêm system prompt từ tài liệu bên ngoài
-            history.append({"role": "system", "content": AI_SYSTEM_PROMPT})
-            history.append({
-                "role": "system",
-                "content": f"Thông tin bổ sung:\n- Thời gian hiện tại: {datetime.now().strftime('%m-%Y')}"
-            })
-
-            # Đưa lịch sử cũ vào
-            for m in recent_messages:
-                role = "assistant" if m["type"] == "ai" else "user"
-                history.append({"role": role, "content": m["text"]})
-
-            # Thêm câu hỏi hiện tại
-            history.append({"role": "user", "content": request.message})
-
-            ai_response = agent.ask_react_agent(history)
+            # Tra cứu mã đơn / tên sản phẩm: trả lời theo mẫu từ dữ liệu, không gọi agent
+            routed = await run_in_threadpool(intent_router.route, request.message)
+            if routed is not None:
+                ai_response = routed["response"]
+            else:
+                agent = get_agent()
+                # Dựng ngữ cảnh: system prompt + lịch sử gần nhất trong ngân sách token
+                # (tin nhắn hiện tại đã nằm cuối lịch sử nên không thêm lại)
+                context = context_builder.build(
+                    await run_in_threadpool(session_store.get_messages, session["id"]),
+                    request.message,
+                    session.get("summary"),
+                    session.get("summary_upto") or 0,
+                )
+
+                ai_response = await response_cache.aask(agent, context.messages)
+                # Tóm tắt nền phần hội thoại đã bị đẩy ra khỏi ngữ cảnh
+                summarizer.schedule(session["id"], context.start)
         except Exception as e:
             ai_response = f"Xin lỗi, tôi gặp sự cố khi xử lý câu hỏi của bạn. Vui lòng thử lại sau. (Lỗi: {str(e)})"
     ai_message = {
@@ -422,7 +575,7 @@ async def send_message(request: NewMessageRequest):
         "sender_name": "HiveSpace AI"
     }
     
-    session["messages"].append(ai_message)
+    await run_in_threadpool(session_store.append_message, session["id"], ai_message)
     
     # Cập nhật thời gian hoạt động
     update_session_activity(request.session_id)
@@ -438,11 +591,7 @@ async def send_message(request: NewMessageRequest):
 async def send_message_stream(request: NewMessageRequest):
     """Gửi tin nhắn mới và nhận phản hồi AI streaming"""
     # Tìm phiên chat
-    session = None
-    for s in chat_sessions:
-        if s["id"] == request.session_id:
-            session = s
-            break
+    session = await run_in_threadpool(session_store.get, request.session_id)
     
     if not session:
         raise HTTPException(status_code=404, detail="Phiên chat không tồn tại")
@@ -456,20 +605,21 @@ async def send_message_stream(request: NewMessageRequest):
         "sender_name": "User"
     }
     
-    session["messages"].append(user_message)
+    await run_in_threadpool(session_store.append_message, session["id"], user_message)
     
     # Cập nhật thời gian hoạt động
     update_session_activity(request.session_id)
     
+    # Mốc thời gian để đo TTFT (time-to-first-token)
+    started_at = time.perf_counter()
+    
     async def generate_stream():
         try:
-            # Tạo agent instance
-            agent = create_agent()
-            
-            # Phân loại yêu cầu tạo ảnh: hóa đơn hoặc tổng quát -> stream markdown ngay
-            if is_invoice_image_request(request.message):
-                order_id, html = build_invoice_html(request.message)
-                md = invoice_html_to_image(order_id, html)
+            # Phân loại yêu cầu tạo ảnh (một lần quét từ khóa): hóa đơn hoặc tổng quát -> stream markdown ngay
+            intent = image_intent(request.message)
+            if intent == "invoice_image":
+                md = await arender_invoice_markdown(request.message)
+                first_token_at = time.perf_counter()
                 yield f"data: {json.dumps({'type': 'chunk', 'content': md})}\n\n"
                 ai_message = {
                     "id": f"msg_{str(uuid.uuid4())[:8]}",
@@ -478,11 +628,13 @@ async def send_message_stream(request: NewMessageRequest):
                     "timestamp": get_current_timestamp(),
                     "sender_name": "HiveSpace AI"
                 }
-                session["messages"].append(ai_message)
-                yield f"data: {json.dumps({'type': 'complete', 'ai_message': ai_message})}\n\n"
+                await run_in_threadpool(session_store.append_message, session["id"], ai_message)
+                metrics = stream_metrics(started_at, first_token_at)
+                yield f"data: {json.dumps({'type': 'complete', 'ai_message': ai_message, 'metrics': metrics})}\n\n"
                 return
-            elif is_image_request(request.message):
+            elif intent == "image":
                 md = build_general_image_markdown(request.message)
+                first_token_at = time.perf_counter()
                 yield f"data: {json.dumps({'type': 'chunk', 'content': md})}\n\n"
                 ai_message = {
                     "id": f"msg_{str(uuid.uuid4())[:8]}",
@@ -491,37 +643,47 @@ async def send_message_stream(request: NewMessageRequest):
                     "timestamp": get_current_timestamp(),
                     "sender_name": "HiveSpace AI"
                 }
-                session["messages"].append(ai_message)
-                yield f"data: {json.dumps({'type': 'complete', 'ai_message': ai_message})}\n\n"
+                await run_in_threadpool(session_store.append_message, session["id"], ai_message)
+                metrics = stream_metrics(started_at, first_token_at)
+                yield f"data: {json.dumps({'type': 'complete', 'ai_message': ai_message, 'metrics': metrics})}\n\n"
                 return
 
-            # Chuẩn bị lịch sử hội thoại (tối đa 20 tin nhắn gần nhất)
-            recent_messages = session["messages"][-20:] if len(session["messages"]) > 0 else []
-            history = [
-                {"role": "system", "content": AI_SYSTEM_PROMPT},
-                {"role": "system", "content": f"Thông tin bổ sung:\n- Thời gian hiện tại: {datetime.now().strftime('%m-%Y')}"}
-            ]
-
-            for m in recent_messages:
-                role = "assistant" if m["type"] == "ai" else "user"
-                history.append({"role": role, "content": m["text"]})
+            # Tra cứu mã đơn / tên sản phẩm: trả lời theo mẫu từ dữ liệu, không gọi agent
+            routed = await run_in_threadpool(intent_router.route, request.message)
+            if routed is not None:
+                first_token_at = time.perf_counter()
+                yield f"data: {json.dumps({'type': 'chunk', 'content': routed['response']})}\n\n"
+                ai_message = {
+                    "id": f"msg_{str(uuid.uuid4())[:8]}",
+                    "type": "ai",
+                    "text": routed["response"],
+                    "timestamp": get_current_timestamp(),
+                    "sender_name": "HiveSpace AI"
+                }
+                await run_in_threadpool(session_store.append_message, session["id"], ai_message)
+                metrics = stream_metrics(started_at, first_token_at)
+                yield f"data: {json.dumps({'type': 'complete', 'ai_message': ai_message, 'metrics': metrics})}\n\n"
+                return
 
-            history.append({"role": "user", "content": request.message})
+            # Chuẩn bị ngữ cảnh hội thoại trong ngân sách token
+            context = context_builder.build(
+                await run_in_threadpool(session_store.get_messages, session["id"]),
+                request.message,
+                session.get("summary"),
+                session.get("summary_upto") or 0,
+            )
 
-            # Gọi agent để xử lý câu hỏi với streaming kèm lịch sử
+            # Gọi agent để xử lý câu hỏi với streaming từng token kèm lịch sử
+            agent = get_agent()
             response_content = ""
-            for event in agent.react_agent_graph.stream({"messages": history}):
-                for key, value in event.items():
-                    if key != "llm" or value["messages"][-1].content == "":
-                        continue
-                    
-                    current_content = value["messages"][-1].content
-                    if current_content != response_content:
-                        # Gửi phần mới
-                        new_part = current_content[len(response_content):]
-                        if new_part:
-                            yield f"data: {json.dumps({'type': 'chunk', 'content': new_part})}\n\n"
-                        response_content = current_content
+            first_token_at = None
+            async for event in response_cache.astream(agent, context.messages):
+                if event["type"] == "token":
+                    if first_token_at is None:
+                        first_token_at = time.perf_counter()
+                    yield f"data: {json.dumps({'type': 'chunk', 'content': event['content']})}\n\n"
+                else:
+                    response_content = event["content"]
             
             # Lưu tin nhắn AI hoàn chỉnh
             ai_message = {
@@ -532,10 +694,14 @@ async def send_message_stream(request: NewMessageRequest):
                 "sender_name": "HiveSpace AI"
             }
             
-            session["messages"].append(ai_message)
+            await run_in_threadpool(session_store.append_message, session["id"], ai_message)
             
-            # Gửi signal hoàn thành
-            yield f"data: {json.dumps({'type': 'complete', 'ai_message': ai_message})}\n\n"
+            # Gửi signal hoàn thành kèm số liệu TTFT
+            metrics = stream_metrics(started_at, first_token_at)
+            yield f"data: {json.dumps({'type': 'complete', 'ai_message': ai_message, 'metrics': metrics})}\n\n"
+            
+            # Tóm tắt nền phần hội thoại đã bị đẩy ra khỏi ngữ cảnh
+            summarizer.schedule(session["id"], context.start)
             
         except Exception as e:
             error_msg = f"Xin lỗi, tôi gặp sự cố khi xử lý câu hỏi của bạn. Vui lòng thử lại sau. (Lỗi: {str(e)})"
@@ -551,6 +717,57 @@ async def send_message_stream(request: NewMessageRequest):
         }
     )
 
+@app.post("/api/invoices/batch")
+async def create_invoice_batch(request: InvoiceBatchRequest):
+    """Tạo hóa đơn hàng loạt (SSE): sự kiện start, progress cho từng đơn, cuối cùng là complete
+    kèm download_url để tải file ZIP/PDF"""
+    fmt = request.format.lower()
+    if fmt not in BATCH_FORMATS:
+        raise HTTPException(status_code=400, detail="Định dạng không hỗ trợ, chọn zip hoặc pdf")
+    if not request.order_ids and not request.status and not request.order_date:
+        raise HTTPException(status_code=400, detail="Cần danh sách mã đơn hoặc bộ lọc trạng thái/ngày")
+    if request.order_ids and len(request.order_ids) > MAX_BATCH_ORDERS:
+        raise HTTPException(status_code=400, detail=f"Tối đa {MAX_BATCH_ORDERS} đơn mỗi lô")
+
+    orders, missing, total = await run_in_threadpool(
+        select_batch_orders, request.order_ids, request.status, request.order_date
+    )
+    if total > MAX_BATCH_ORDERS:
+        raise HTTPException(
+            status_code=400,
+            detail=f"Có {total} đơn khớp bộ lọc, vượt giới hạn {MAX_BATCH_ORDERS} đơn mỗi lô",
+        )
+    if not orders:
+        raise HTTPException(status_code=404, detail="Không tìm thấy đơn hàng nào")
+
+    async def generate_stream():
+        async for event in run_invoice_batch(orders, fmt):
+            if event["type"] == "start":
+                event["missing"] = missing
+            elif event["type"] == "complete":
+                event["download_url"] = f"/api/invoices/batch/{event['batch_id']}"
+            yield f"data: {json.dumps(event)}\n\n"
+
+    return StreamingResponse(
+        generate_stream(),
+        media_type="text/plain",
+        headers={
+            "Cache-Control": "no-cache",
+            "Connection": "keep-alive",
+            "Content-Type": "text/event-stream"
+        }
+    )
+
+@app.get("/api/invoices/batch/{batch_id}")
+async def download_invoice_batch(batch_id: str):
+    """Tải file ZIP/PDF của một lô hóa đơn đã tạo"""
+    path = batch_path(batch_id)
+    if path is None:
+        raise HTTPException(status_code=404, detail="Lô hóa đơn không tồn tại hoặc đã hết hạn")
+    extension = os.path.splitext(path)[1]
+    media_type = "application/pdf" if extension == ".pdf" else "application/zip"
+    return FileResponse(path, media_type=media_type, filename=f"hoa_don_{batch_id[:8]}{extension}")
+
 @app.post("/api/messages/with-file")
 async def send_message_with_file(
     session_id: str = Form(...),
@@ -559,11 +776,7 @@ async def send_message_with_file(
 ):
     """Gửi tin nhắn mới kèm file và nhận phản hồi AI thông minh"""
     # Tìm phiên chat
-    session = None
-    for s in chat_sessions:
-        if s["id"] == session_id:
-            session = s
-            break
+    session = await run_in_threadpool(session_store.get, session_id)
     
     if not session:
         raise HTTPException(status_code=404, detail="Phiên chat không tồn tại")
@@ -596,7 +809,7 @@ async def send_message_with_file(
         "sender_name": "User"
     }
     
-    session["messages"].append(user_message)
+    await run_in_threadpool(session_store.append_message, session["id"], user_message)
     
     # Xử lý file và tạo phản hồi AI thông minh
     try:
@@ -639,7 +852,7 @@ async def send_message_with_file(
         "sender_name": "HiveSpace AI"
     }
     
-    session["messages"].append(ai_message)
+    await run_in_threadpool(session_store.append_message, session["id"], ai_message)
     
     # Cập nhật thời gian hoạt động
     update_session_activity(session_id)
@@ -926,45 +1139,43 @@ async def process_general_file(file: UploadFile, file_content: bytes, user_reque
 @app.delete("/api/sessions/{session_id}/clear")
 async def clear_chat_session(session_id: str):
     """Xóa tất cả tin nhắn trong phiên chat"""
-    for session in chat_sessions:
-        if session["id"] == session_id:
-            # Giữ lại tin nhắn chào mừng
-            session["messages"] = [
-                {
-                    "id": f"msg_{str(uuid.uuid4())[:8]}",
-                    "type": "ai",
-                    "text": "Chat cleared. How can I help you today?",
-                    "timestamp": get_current_timestamp(),
-                    "sender_name": "HiveSpace AI"
-                }
-            ]
-            session["message_count"] = 1
-            update_session_activity(session_id)
-            return {"success": True, "message": "Đã xóa tất cả tin nhắn"}
+    # Giữ lại tin nhắn chào mừng
+    cleared = await run_in_threadpool(session_store.replace_messages, session_id, [
+        {
+            "id": f"msg_{str(uuid.uuid4())[:8]}",
+            "type": "ai",
+            "text": "Chat cleared. How can I help you today?",
+            "timestamp": get_current_timestamp(),
+            "sender_name": "HiveSpace AI"
+        }
+    ])
+    if not cleared:
+        raise HTTPException(status_code=404, detail="Phiên chat không tồn tại")
     
-    raise HTTPException(status_code=404, detail="Phiên chat không tồn tại")
+    update_session_activity(session_id)
+    return {"success": True, "message": "Đã xóa tất cả tin nhắn"}
 
 @app.get("/api/sessions/{session_id}/export")
 async def export_chat_session(session_id: str):
     """Xuất phiên chat thành text"""
-    for session in chat_sessions:
-        if session["id"] == session_id:
-            chat_text = f"HiveSpace Chat Export - {session['title']}\n"
-            chat_text += f"Created: {session['created_at']}\n"
-            chat_text += f"Last Updated: {session['updated_at']}\n"
-            chat_text += "=" * 50 + "\n\n"
-            
-            for msg in session["messages"]:
-                sender = msg["sender_name"] if msg["sender_name"] else msg["type"].upper()
-                chat_text += f"[{msg['timestamp']}] {sender}: {msg['text']}\n\n"
-            
-            return {
-                "success": True,
-                "filename": f"hivespace-chat-{session['title'].replace(' ', '-')}.txt",
-                "content": chat_text
-            }
+    session = await run_in_threadpool(session_store.get, session_id)
+    if not session:
+        raise HTTPException(status_code=404, detail="Phiên chat không tồn tại")
+    
+    chat_text = f"HiveSpace Chat Export - {session['title']}\n"
+    chat_text += f"Created: {session['created_at']}\n"
+    chat_text += f"Last Updated: {session['updated_at']}\n"
+    chat_text += "=" * 50 + "\n\n"
+    
+    for msg in await run_in_threadpool(session_store.get_messages, session_id):
+        sender = msg["sender_name"] if msg["sender_name"] else msg["type"].upper()
+        chat_text += f"[{msg['timestamp']}] {sender}: {msg['text']}\n\n"
     
-    raise HTTPException(status_code=404, detail="Phiên chat không tồn tại")
+    return {
+        "success": True,
+        "filename": f"hivespace-chat-{session['title'].replace(' ', '-')}.txt",
+        "content": chat_text
+    }
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1 @@
+# This file makes the sessions directory a Python package
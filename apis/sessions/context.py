@@ -0,0 +1,134 @@
+"""
+Context Builder - Dựng ngữ cảnh hội thoại gửi cho agent theo ngân sách token
+- Prefix hệ thống (system prompt + thông tin thời gian) được cache và dùng lại giữa các lượt
+- Lịch sử được cắt theo số token ước lượng thay vì số tin nhắn cố định
+- Tin nhắn hiện tại của user không bị thêm hai lần
+- Bản tóm tắt cuốn chiếu của phần hội thoại cũ được chèn thành một system message; các tin nhắn đã gộp
+  vào bản tóm tắt (trước summary_upto) không được đưa lại vào cửa sổ
+"""
+
+import threading
+from datetime import datetime
+from typing import Callable, List, NamedTuple, Optional
+
+
+# Chi phí cố định ước lượng cho mỗi message (role, phân tách...)
+MESSAGE_OVERHEAD_TOKENS = 4
+
+TRUNCATED_MARKER = "\n…[nội dung đã được rút gọn]…\n"
+
+
+def estimate_tokens(text: str) -> int:
+    """Ước lượng số token của một đoạn text (~4 byte UTF-8 mỗi token)"""
+    if not text:
+        return 0
+    return (len(text.encode("utf-8")) + 3) // 4
+
+
+class Context(NamedTuple):
+    """Kết quả dựng ngữ cảnh"""
+    # Danh sách message {"role", "content"} gửi cho agent
+    messages: List[dict]
+    # Vị trí (trong danh sách tin nhắn của phiên) của tin nhắn cũ nhất được đưa vào
+    start: int
+    # Tổng số token ước lượng
+    tokens: int
+
+
+class ContextBuilder:
+    """Dựng ngữ cảnh hội thoại cho agent trong giới hạn token"""
+
+    def __init__(
+        self,
+        system_prompt: Callable[[], str],
+        max_tokens: int = 8000,
+        max_message_tokens: int = 2000,
+    ):
+        # Hàm trả về system prompt hiện tại (để nhận được prompt mới khi reload)
+        self._system_prompt = system_prompt
+        # Tổng ngân sách token cho prefix + lịch sử
+        self.max_tokens = max_tokens
+        # Giới hạn token của một tin nhắn đơn lẻ (tin nhắn dài hơn sẽ bị rút gọn)
+        self.max_message_tokens = max_message_tokens
+        self._prefix_key = None
+        self._prefix_messages: List[dict] = []
+        self._prefix_tokens = 0
+        self._lock = threading.Lock()
+
+    def prefix(self):
+        """Prefix hệ thống đã cache: (messages, tokens)"""
+        system_prompt = self._system_prompt()
+        month = datetime.now().strftime('%m-%Y')
+        key = (system_prompt, month)
+        with self._lock:
+            if key != self._prefix_key:
+                messages = [
+                    {"role": "system", "content": system_prompt},
+                    {"role": "system", "content": f"Thông tin bổ sung:\n- Thời gian hiện tại: {month}"},
+                ]
+                self._prefix_messages = messages
+                self._prefix_tokens = sum(estimate_tokens(m["content"]) + MESSAGE_OVERHEAD_TOKENS for m in messages)
+                self._prefix_key = key
+            return self._prefix_messages, self._prefix_tokens
+
+    def build(
+        self,
+        session_messages: List[dict],
+        current_message: Optional[str] = None,
+        summary: Optional[str] = None,
+        summary_upto: int = 0,
+    ) -> Context:
+        """Dựng ngữ cảnh từ lịch sử của phiên.
+
+        Args:
+            session_messages: Tin nhắn của phiên (đã gồm tin nhắn hiện tại của user nếu đã lưu)
+            current_message: Tin nhắn hiện tại, chỉ được thêm nếu chưa nằm cuối lịch sử
+            summary: Bản tóm tắt phần hội thoại cũ (nếu có)
+            summary_upto: Số tin nhắn đầu phiên đã được gộp vào bản tóm tắt
+        """
+        prefix_messages, prefix_tokens = self.prefix()
+        # Cửa sổ không bắt đầu trước phần đã có trong bản tóm tắt
+        floor = min(summary_upto or 0, len(session_messages)) if summary else 0
+        if summary:
+            summary_message = {"role": "system", "content": f"Tóm tắt phần hội thoại trước đó:\n{summary}"}
+            prefix_messages = prefix_messages + [summary_message]
+            prefix_tokens += estimate_tokens(summary_message["content"]) + MESSAGE_OVERHEAD_TOKENS
+        budget = self.max_tokens - prefix_tokens
+
+        turns = [
+            {"role": "assistant" if m["type"] == "ai" else "user", "content": m["text"]}
+            for m in session_messages
+        ]
+        start = len(session_messages)
+        last = turns[-1] if turns else None
+        if current_message is not None and not (last and last["role"] == "user" and last["content"] == current_message):
+            turns.append({"role": "user", "content": current_message})
+
+        # Lấy từ mới nhất về cũ nhất cho tới khi hết ngân sách; tin nhắn cuối luôn được giữ
+        selected = []
+        used = 0
+        for index in range(len(turns) - 1, floor - 1, -1):
+            turn = self._fit(turns[index])
+            cost = estimate_tokens(turn["content"]) + MESSAGE_OVERHEAD_TOKENS
+            if selected and used + cost > budget:
+                break
+            selected.append(turn)
+            used += cost
+            if index < len(session_messages):
+                start = index
+        selected.reverse()
+
+        return Context(messages=prefix_messages + selected, start=start, tokens=prefix_tokens + used)
+
+    def _fit(self, turn: dict) -> dict:
+        """Rút gọn tin nhắn quá dài, giữ phần đầu và phần cuối"""
+        content = turn["content"] or ""
+        if estimate_tokens(content) <= self.max_message_tokens:
+            return turn
+        # Cắt theo byte UTF-8 như estimate_tokens (tiếng Việt ~3 byte mỗi ký tự): hai phía cộng với
+        # marker vừa đủ max_message_tokens; ký tự bị cắt đôi ở mép được bỏ đi
+        data = content.encode("utf-8")
+        keep = max(0, (self.max_message_tokens * 4 - len(TRUNCATED_MARKER.encode("utf-8"))) // 2)
+        head = data[:keep].decode("utf-8", errors="ignore")
+        tail = data[len(data) - keep:].decode("utf-8", errors="ignore")
+        return {"role": turn["role"], "content": head + TRUNCATED_MARKER + tail}
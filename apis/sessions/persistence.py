@@ -0,0 +1,298 @@
+"""
+Session Persistence - Backend lưu trữ bền vững cho SessionStore
+- MemoryBackend: không lưu gì (mặc định cũ, dữ liệu mất khi restart)
+- SQLiteBackend: SQLite (WAL), ghi theo lô ở thread nền, không nằm trên đường request
+Chọn backend bằng biến môi trường SESSION_BACKEND (sqlite | memory) và SESSION_DB_PATH.
+"""
+
+import os
+import json
+import queue
+import sqlite3
+import threading
+from typing import List, Optional
+
+
+# Các trường header của một phiên (không gồm danh sách tin nhắn)
+HEADER_FIELDS = ("id", "title", "created_at", "updated_at", "message_count", "summary", "summary_upto")
+
+DEFAULT_DB_PATH = os.path.join(
+    os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "database", "sessions.db"
+)
+
+
+class SessionBackend:
+    """Interface backend lưu trữ phiên chat"""
+
+    # Backend có lưu bền vững hay không (cho phép giải phóng tin nhắn khỏi bộ nhớ)
+    durable = False
+
+    def load_headers(self) -> List[dict]:
+        """Đọc header của tất cả phiên (không đọc tin nhắn)"""
+        return []
+
+    def load_header(self, session_id: str) -> Optional[dict]:
+        """Đọc header của một phiên, None nếu không có"""
+        return None
+
+    def load_messages(self, session_id: str) -> List[dict]:
+        """Đọc toàn bộ tin nhắn của một phiên"""
+        return []
+
+    def save_session(self, session: dict):
+        """Ghi (upsert) header của phiên"""
+
+    def append_message(self, session_id: str, message: dict):
+        """Ghi thêm một tin nhắn vào cuối phiên"""
+
+    def replace_messages(self, session_id: str, messages: List[dict]):
+        """Thay toàn bộ tin nhắn của phiên"""
+
+    def flush(self):
+        """Chờ mọi thao tác ghi đang chờ được commit"""
+
+    def close(self):
+        """Đóng backend"""
+
+
+class MemoryBackend(SessionBackend):
+    """Backend rỗng: phiên chat chỉ nằm trong bộ nhớ process"""
+
+
+class SQLiteBackend(SessionBackend):
+    """Backend SQLite ở chế độ WAL với group commit ở thread nền.
+
+    Request chỉ đẩy thao tác ghi vào hàng đợi; thread writer gom nhiều thao tác
+    thành một transaction (tối đa batch_size thao tác hoặc sau flush_interval giây).
+    flush() chỉ chờ khi còn thao tác chưa commit, và writer commit ngay khi gặp mốc flush.
+    Nếu transaction của lô bị lỗi, các thao tác được ghi lại từng cái một để một dòng lỗi
+    không làm mất dữ liệu của các phiên khác (thao tác lỗi được log kèm id phiên).
+    """
+
+    durable = True
+
+    _SCHEMA = """
+    CREATE TABLE IF NOT EXISTS sessions (
+        id TEXT PRIMARY KEY,
+        title TEXT NOT NULL,
+        created_at TEXT NOT NULL,
+        updated_at TEXT NOT NULL,
+        message_count INTEGER NOT NULL DEFAULT 0,
+        summary TEXT,
+        summary_upto INTEGER NOT NULL DEFAULT 0
+    );
+    CREATE TABLE IF NOT EXISTS messages (
+        seq INTEGER PRIMARY KEY AUTOINCREMENT,
+        session_id TEXT NOT NULL,
+        id TEXT NOT NULL,
+        type TEXT NOT NULL,
+        text TEXT NOT NULL,
+        timestamp TEXT NOT NULL,
+        sender_name TEXT
+    );
+    CREATE INDEX IF NOT EXISTS idx_messages_session ON messages(session_id, seq);
+    """
+
+    _UPSERT_SESSION = """
+    INSERT INTO sessions (id, title, created_at, updated_at, message_count, summary, summary_upto)
+    VALUES (:id, :title, :created_at, :updated_at, :message_count, :summary, :summary_upto)
+    ON CONFLICT(id) DO UPDATE SET
+        title = excluded.title,
+        updated_at = excluded.updated_at,
+        message_count = excluded.message_count,
+        summary = excluded.summary,
+        summary_upto = excluded.summary_upto
+    """
+
+    # Các cột được thêm sau phiên bản schema đầu tiên
+    _MIGRATIONS = {
+        "summary": "ALTER TABLE sessions ADD COLUMN summary TEXT",
+        "summary_upto": "ALTER TABLE sessions ADD COLUMN summary_upto INTEGER NOT NULL DEFAULT 0",
+    }
+
+    _SELECT_HEADER = "SELECT id, title, created_at, updated_at, message_count, summary, summary_upto FROM sessions"
+
+    _INSERT_MESSAGE = """
+    INSERT INTO messages (session_id, id, type, text, timestamp, sender_name)
+    VALUES (?, ?, ?, ?, ?, ?)
+    """
+
+    _STOP = object()
+
+    def __init__(self, db_path: str = DEFAULT_DB_PATH, batch_size: int = 256, flush_interval: float = 0.05):
+        os.makedirs(os.path.dirname(db_path), exist_ok=True)
+        self.db_path = db_path
+        self.batch_size = batch_size
+        self.flush_interval = flush_interval
+
+        # Kết nối đọc dùng chung, được bảo vệ bởi khóa
+        self._read_conn = self._connect()
+        self._read_conn.executescript(self._SCHEMA)
+        self._migrate()
+        self._read_lock = threading.Lock()
+
+        self._queue = queue.Queue()
+        # Số thao tác ghi đã đưa vào hàng đợi nhưng chưa commit
+        self._pending = 0
+        self._pending_lock = threading.Lock()
+        self._writer = threading.Thread(target=self._write_loop, name="session-writer", daemon=True)
+        self._writer.start()
+
+    def _connect(self):
+        conn = sqlite3.connect(self.db_path, check_same_thread=False)
+        conn.row_factory = sqlite3.Row
+        conn.execute("PRAGMA journal_mode=WAL")
+        conn.execute("PRAGMA synchronous=NORMAL")
+        return conn
+
+    def _migrate(self):
+        columns = {row["name"] for row in self._read_conn.execute("PRAGMA table_info(sessions)")}
+        for column, statement in self._MIGRATIONS.items():
+            if column not in columns:
+                self._read_conn.execute(statement)
+        self._read_conn.commit()
+
+    # ---- Đọc ----
+
+    def load_headers(self) -> List[dict]:
+        with self._read_lock:
+            rows = self._read_conn.execute(f"{self._SELECT_HEADER} ORDER BY updated_at").fetchall()
+        return [dict(row) for row in rows]
+
+    def load_header(self, session_id: str) -> Optional[dict]:
+        self.flush()
+        with self._read_lock:
+            row = self._read_conn.execute(f"{self._SELECT_HEADER} WHERE id = ?", (session_id,)).fetchone()
+        return dict(row) if row else None
+
+    def load_messages(self, session_id: str) -> List[dict]:
+        # Đảm bảo các tin nhắn đang chờ ghi đã được commit trước khi đọc lại
+        self.flush()
+        with self._read_lock:
+            rows = self._read_conn.execute(
+                "SELECT id, type, text, timestamp, sender_name FROM messages WHERE session_id = ? ORDER BY seq",
+                (session_id,),
+            ).fetchall()
+        return [dict(row) for row in rows]
+
+    # ---- Ghi (bất đồng bộ qua hàng đợi) ----
+
+    def save_session(self, session: dict):
+        header = {field: session.get(field) for field in HEADER_FIELDS}
+        header["summary_upto"] = header["summary_upto"] or 0
+        self._enqueue(("session", header))
+
+    def append_message(self, session_id: str, message: dict):
+        self._enqueue(("append", session_id, dict(message)))
+
+    def replace_messages(self, session_id: str, messages: List[dict]):
+        self._enqueue(("replace", session_id, [dict(m) for m in messages]))
+
+    def _enqueue(self, op):
+        with self._pending_lock:
+            self._pending += 1
+        self._queue.put(op)
+
+    def flush(self):
+        # Không có gì chờ ghi: đọc ngay, không đi qua writer
+        with self._pending_lock:
+            if not self._pending:
+                return
+        # Đặt một mốc vào hàng đợi và chờ writer commit tới mốc đó
+        done = threading.Event()
+        self._queue.put(("barrier", done))
+        done.wait()
+
+    def close(self):
+        self._queue.put(self._STOP)
+        self._writer.join(timeout=5)
+        with self._read_lock:
+            self._read_conn.close()
+
+    def _write_loop(self):
+        conn = self._connect()
+        stopping = False
+        while not stopping:
+            batch = [self._queue.get()]
+            # Gom thêm các thao tác đến trong khoảng flush_interval (group commit),
+            # trừ khi đã có người đang chờ flush: commit ngay
+            while len(batch) < self.batch_size and not self._is_barrier(batch[-1]):
+                try:
+                    batch.append(self._queue.get(timeout=self.flush_interval))
+                except queue.Empty:
+                    break
+            ops = [op for op in batch if op is not self._STOP]
+            stopping = len(ops) != len(batch)
+            try:
+                self._commit(conn, ops)
+            finally:
+                with self._pending_lock:
+                    self._pending -= sum(1 for op in ops if op[0] != "barrier")
+                for op in ops:
+                    if op[0] == "barrier":
+                        op[1].set()
+        conn.close()
+
+    def _commit(self, conn, ops):
+        writes = [op for op in ops if op[0] != "barrier"]
+        try:
+            with conn:
+                for op in writes:
+                    self._apply(conn, op)
+            return
+        except Exception as e:
+            if len(writes) <= 1:
+                print(f"Error persisting chat session {self._session_of(writes[0]) if writes else ''}: {str(e)}")
+                return
+            print(f"Error persisting chat sessions, retrying {len(writes)} writes one by one: {str(e)}")
+        # Một thao tác lỗi không được làm mất các thao tác khác trong lô: ghi lại từng thao tác
+        for op in writes:
+            try:
+                with conn:
+                    self._apply(conn, op)
+            except Exception as e:
+                print(f"Error persisting chat session {self._session_of(op)}, {op[0]} lost: {str(e)}")
+
+    @staticmethod
+    def _session_of(op) -> str:
+        return op[1]["id"] if op[0] == "session" else op[1]
+
+    @classmethod
+    def _is_barrier(cls, op) -> bool:
+        return op is not cls._STOP and op[0] == "barrier"
+
+    def _apply(self, conn, op):
+        kind = op[0]
+        if kind == "session":
+            conn.execute(self._UPSERT_SESSION, op[1])
+        elif kind == "append":
+            _, session_id, message = op
+            conn.execute(self._INSERT_MESSAGE, self._message_row(session_id, message))
+            conn.execute("UPDATE sessions SET message_count = message_count + 1 WHERE id = ?", (session_id,))
+        elif kind == "replace":
+            _, session_id, messages = op
+            conn.execute("DELETE FROM messages WHERE session_id = ?", (session_id,))
+            conn.executemany(self._INSERT_MESSAGE, [self._message_row(session_id, m) for m in messages])
+            conn.execute("UPDATE sessions SET message_count = ? WHERE id = ?", (len(messages), session_id))
+
+    @staticmethod
+    def _message_row(session_id: str, message: dict):
+        text = message.get("text")
+        if not isinstance(text, str):
+            text = json.dumps(text, ensure_ascii=False)
+        return (
+            session_id,
+            message["id"],
+            message["type"],
+            text,
+            message["timestamp"],
+            message.get("sender_name"),
+        )
+
+
+def create_backend() -> SessionBackend:
+    """Tạo backend theo cấu hình môi trường"""
+    kind = os.getenv("SESSION_BACKEND", "sqlite").lower()
+    if kind == "memory":
+        return MemoryBackend()
+    return SQLiteBackend(os.getenv("SESSION_DB_PATH", DEFAULT_DB_PATH))
@@ -0,0 +1,258 @@
+"""
+Session Store - Lưu trữ phiên chat có đánh chỉ mục
+- Tra cứu phiên theo id với chi phí O(1)
+- Chỉ mục có thứ tự theo updated_at để liệt kê phiên mới nhất trước
+- Khóa theo từng phiên để các request đồng thời ghi tin nhắn an toàn
+- Lưu bền vững qua backend (sessions.persistence), chỉ nạp header khi khởi động,
+  tin nhắn được nạp lười khi cần và giải phóng khỏi bộ nhớ theo LRU
+"""
+
+import bisect
+import threading
+from collections import OrderedDict
+from contextlib import contextmanager
+from typing import Dict, List, Optional, Tuple
+
+from .persistence import SessionBackend, MemoryBackend
+
+
+class SessionStore:
+    """Kho phiên chat trong bộ nhớ với chỉ mục theo id và theo updated_at"""
+
+    def __init__(self, backend: Optional[SessionBackend] = None, max_loaded_sessions: int = 1000):
+        self.backend = backend or MemoryBackend()
+        # Số phiên tối đa giữ tin nhắn trong bộ nhớ (chỉ áp dụng với backend bền vững)
+        self.max_loaded_sessions = max_loaded_sessions
+        # id -> session dict (session["messages"] chỉ có khi đã nạp)
+        self._sessions: Dict[str, dict] = {}
+        # Danh sách (updated_at, id) sắp xếp tăng dần, dùng để liệt kê theo thời gian
+        self._order: List[Tuple[str, str]] = []
+        # Khóa riêng cho từng phiên
+        self._session_locks: Dict[str, threading.RLock] = {}
+        # Vị trí tin nhắn theo id cho từng phiên (tạo khi cần, dùng để phân trang)
+        self._positions: Dict[str, Dict[str, int]] = {}
+        # Các phiên đang giữ tin nhắn trong bộ nhớ, theo thứ tự truy cập (LRU)
+        self._loaded: "OrderedDict[str, None]" = OrderedDict()
+        # Khóa bảo vệ các chỉ mục
+        self._lock = threading.RLock()
+        # Tăng mỗi khi có thay đổi, dùng làm ETag cho danh sách phiên
+        self._version = 0
+
+    @property
+    def version(self) -> int:
+        """Phiên bản dữ liệu hiện tại của kho"""
+        return self._version
+
+    def __len__(self) -> int:
+        return len(self._sessions)
+
+    def __contains__(self, session_id: str) -> bool:
+        return session_id in self._sessions
+
+    def load(self):
+        """Nạp header các phiên từ backend (không nạp tin nhắn)"""
+        headers = self.backend.load_headers()
+        with self._lock:
+            for header in headers:
+                session = dict(header)
+                session["last_activity"] = session.get("last_activity", "")
+                self._index(session)
+
+    def close(self):
+        """Ghi nốt các thay đổi đang chờ và đóng backend"""
+        self.backend.flush()
+        self.backend.close()
+
+    def get(self, session_id: str) -> Optional[dict]:
+        """Lấy phiên chat theo id, trả về None nếu không tồn tại"""
+        session = self._sessions.get(session_id)
+        if session is None and self.backend.durable:
+            # Phiên có thể do worker khác tạo sau khi process này khởi động
+            header = self.backend.load_header(session_id)
+            if header is not None:
+                with self._lock:
+                    session = self._sessions.get(session_id)
+                    if session is None:
+                        session = dict(header, last_activity="")
+                        self._index(session)
+        return session
+
+    def get_messages(self, session_id: str) -> Optional[List[dict]]:
+        """Lấy danh sách tin nhắn của phiên, nạp từ backend nếu chưa có trong bộ nhớ"""
+        with self.lock(session_id) as session:
+            if session is None:
+                return None
+            return self._ensure_loaded(session)
+
+    def get_messages_page(self, session_id: str, limit: int, before: Optional[str] = None):
+        """Lấy một trang tin nhắn, mới nhất ở cuối trang.
+
+        before là id tin nhắn: chỉ lấy các tin nhắn cũ hơn tin nhắn này.
+        Trả về (danh sách tin nhắn, còn tin nhắn cũ hơn hay không), hoặc None nếu phiên không tồn tại.
+        Raise KeyError nếu `before` không thuộc phiên.
+        """
+        with self.lock(session_id) as session:
+            if session is None:
+                return None
+            messages = self._ensure_loaded(session)
+            end = len(messages)
+            if before:
+                positions = self._positions.get(session_id)
+                if positions is None:
+                    positions = {m["id"]: i for i, m in enumerate(messages)}
+                    self._positions[session_id] = positions
+                end = positions[before]
+            start = max(0, end - limit)
+            return messages[start:end], start > 0
+
+    def add(self, session: dict) -> dict:
+        """Thêm phiên chat mới vào kho"""
+        with self._lock:
+            session_id = session["id"]
+            if session_id in self._sessions:
+                self._remove_from_order(session_id)
+            session["message_count"] = len(session.get("messages", []))
+            self._index(session)
+            self._mark_loaded(session_id)
+        self.backend.save_session(session)
+        self.backend.replace_messages(session_id, session.get("messages", []))
+        return session
+
+    @contextmanager
+    def lock(self, session_id: str):
+        """Khóa một phiên chat trong khi thao tác trên nó"""
+        session = self.get(session_id)
+        with self._lock:
+            session_lock = self._session_locks.setdefault(session_id, threading.RLock())
+        with session_lock:
+            yield session
+
+    def touch(self, session_id: str, updated_at: str) -> bool:
+        """Cập nhật updated_at của phiên và sắp xếp lại chỉ mục thời gian"""
+        with self._lock:
+            session = self._sessions.get(session_id)
+            if session is None:
+                return False
+            self._remove_from_order(session_id)
+            session["updated_at"] = updated_at
+            session["last_activity"] = "Just now"
+            bisect.insort(self._order, (updated_at, session_id))
+            self._version += 1
+            self.backend.save_session(session)
+        return True
+
+    def append_message(self, session_id: str, message: dict) -> bool:
+        """Thêm tin nhắn vào phiên chat (an toàn khi ghi đồng thời)"""
+        with self.lock(session_id) as session:
+            if session is None:
+                return False
+            messages = self._ensure_loaded(session)
+            messages.append(message)
+            session["message_count"] = len(messages)
+            if session_id in self._positions:
+                self._positions[session_id][message["id"]] = len(messages) - 1
+            self._version += 1
+            self.backend.append_message(session_id, message)
+        return True
+
+    def replace_messages(self, session_id: str, messages: List[dict]) -> bool:
+        """Thay toàn bộ tin nhắn của phiên chat (dùng khi xóa lịch sử)"""
+        with self.lock(session_id) as session:
+            if session is None:
+                return False
+            messages = list(messages)
+            session["messages"] = messages
+            # Lịch sử mới nên bản tóm tắt cũ không còn giá trị
+            session["summary"] = None
+            session["summary_upto"] = 0
+            self._positions.pop(session_id, None)
+            session["message_count"] = len(messages)
+            self._mark_loaded(session_id)
+            self._version += 1
+            self.backend.save_session(session)
+            self.backend.replace_messages(session_id, messages)
+        return True
+
+    def set_summary(self, session_id: str, summary: str, upto: int, expected_upto: int, anchor_id: str) -> bool:
+        """Lưu bản tóm tắt của phiên, bao phủ `upto` tin nhắn đầu tiên.
+
+        Chỉ ghi nếu summary_upto hiện tại vẫn bằng expected_upto và tin nhắn thứ
+        `upto` vẫn là anchor_id (tránh ghi đè khi phiên vừa bị xóa lịch sử hoặc
+        một lượt tóm tắt khác đã chạy xong).
+        """
+        with self.lock(session_id) as session:
+            if session is None or (session.get("summary_upto") or 0) != expected_upto:
+                return False
+            messages = self._ensure_loaded(session)
+            if len(messages) < upto or messages[upto - 1]["id"] != anchor_id:
+                return False
+            session["summary"] = summary
+            session["summary_upto"] = upto
+            self.backend.save_session(session)
+        return True
+
+    def list_sessions(self) -> List[dict]:
+        """Liệt kê các phiên chat, mới cập nhật nhất trước"""
+        with self._lock:
+            return [self._sessions[session_id] for _, session_id in reversed(self._order)]
+
+    def list_page(self, limit: int, cursor: Optional[str] = None) -> Tuple[List[dict], Optional[str]]:
+        """Liệt kê một trang phiên chat (mới nhất trước) theo cursor.
+
+        cursor là giá trị next_cursor của trang trước ("updated_at|id").
+        Trả về (danh sách phiên, next_cursor hoặc None nếu đã hết).
+        """
+        with self._lock:
+            end = len(self._order)
+            if cursor:
+                updated_at, _, session_id = cursor.partition("|")
+                end = bisect.bisect_left(self._order, (updated_at, session_id))
+            start = max(0, end - limit)
+            keys = self._order[start:end]
+            sessions = [self._sessions[session_id] for _, session_id in reversed(keys)]
+        next_cursor = f"{keys[0][0]}|{keys[0][1]}" if start > 0 and keys else None
+        return sessions, next_cursor
+
+    def list_since(self, since: str) -> List[dict]:
+        """Liệt kê các phiên có updated_at mới hơn `since` (mới nhất trước)"""
+        with self._lock:
+            # "\uffff" lớn hơn mọi id nên bỏ qua mọi phiên có updated_at == since
+            start = bisect.bisect_right(self._order, (since, "\uffff"))
+            return [self._sessions[session_id] for _, session_id in reversed(self._order[start:])]
+
+    def _index(self, session: dict):
+        session_id = session["id"]
+        self._sessions[session_id] = session
+        self._session_locks.setdefault(session_id, threading.RLock())
+        bisect.insort(self._order, (session["updated_at"], session_id))
+        self._version += 1
+
+    def _ensure_loaded(self, session: dict) -> List[dict]:
+        messages = session.get("messages")
+        if messages is None:
+            messages = self.backend.load_messages(session["id"])
+            session["messages"] = messages
+            session["message_count"] = len(messages)
+        self._mark_loaded(session["id"])
+        return messages
+
+    def _mark_loaded(self, session_id: str):
+        if not self.backend.durable:
+            return
+        with self._lock:
+            self._loaded[session_id] = None
+            self._loaded.move_to_end(session_id)
+            # Giải phóng tin nhắn của các phiên ít dùng nhất (đã lưu ở backend)
+            while len(self._loaded) > self.max_loaded_sessions:
+                evicted_id, _ = self._loaded.popitem(last=False)
+                evicted = self._sessions.get(evicted_id)
+                if evicted is not None:
+                    evicted.pop("messages", None)
+                self._positions.pop(evicted_id, None)
+
+    def _remove_from_order(self, session_id: str):
+        session = self._sessions[session_id]
+        key = (session["updated_at"], session_id)
+        index = bisect.bisect_left(self._order, key)
+        if index < len(self._order) and self._order[index] == key:
+            del self._order[index]
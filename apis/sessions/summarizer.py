@@ -0,0 +1,99 @@
+"""
+Conversation Summarizer - Tóm tắt cuốn chiếu cho các phiên chat dài
+- Các tin nhắn bị đẩy ra khỏi cửa sổ ngữ cảnh được gộp dần vào bản tóm tắt của phiên
+- Chạy nền sau khi phản hồi đã trả về, không nằm trên đường request; mọi lần đọc/ghi SessionStore
+  (có thể chờ backend flush) chạy ở thread khác, không chặn event loop
+- Bản tóm tắt được lưu cùng phiên (summary, summary_upto) và chèn vào ngữ cảnh
+  dưới dạng một system message ngắn
+"""
+
+import asyncio
+from typing import Callable, Dict, List
+
+from .store import SessionStore
+
+
+SUMMARY_PROMPT = """Bạn đang duy trì bản tóm tắt của một cuộc hội thoại giữa người dùng và trợ lý AI HiveSpace.
+
+Bản tóm tắt hiện tại:
+{summary}
+
+Các tin nhắn cũ cần gộp thêm vào bản tóm tắt:
+{transcript}
+
+Hãy viết lại bản tóm tắt (tối đa khoảng 200 từ, tiếng Việt) giữ lại: yêu cầu của người dùng,
+thông tin quan trọng (mã đơn hàng, sản phẩm, số liệu, quyết định) và các việc còn dang dở.
+Chỉ trả về nội dung bản tóm tắt."""
+
+
+class ConversationSummarizer:
+    """Gộp các tin nhắn bị loại khỏi ngữ cảnh vào bản tóm tắt của phiên"""
+
+    def __init__(
+        self,
+        store: SessionStore,
+        llm: Callable[[], object],
+        min_new_messages: int = 6,
+        max_batch_messages: int = 40,
+        max_message_chars: int = 1000,
+    ):
+        self.store = store
+        # Hàm trả về chat model (không tools) dùng để tóm tắt
+        self._llm = llm
+        # Chỉ tóm tắt khi có ít nhất chừng này tin nhắn mới bị đẩy ra khỏi ngữ cảnh
+        self.min_new_messages = min_new_messages
+        # Số tin nhắn tối đa gộp trong một lượt (phần còn lại để lượt sau)
+        self.max_batch_messages = max_batch_messages
+        self.max_message_chars = max_message_chars
+        # Các task đang chạy, giữ tham chiếu để không bị garbage collect
+        self._tasks: Dict[str, asyncio.Task] = {}
+
+    def schedule(self, session_id: str, window_start: int):
+        """Lên lịch tóm tắt nền cho phiên, window_start là vị trí tin nhắn cũ nhất còn trong ngữ cảnh"""
+        if session_id in self._tasks:
+            return
+        task = asyncio.create_task(self._run(session_id, window_start))
+        self._tasks[session_id] = task
+        task.add_done_callback(lambda _: self._tasks.pop(session_id, None))
+
+    async def _run(self, session_id: str, window_start: int) -> bool:
+        session = await asyncio.to_thread(self.store.get, session_id)
+        if session is None or window_start - (session.get("summary_upto") or 0) < self.min_new_messages:
+            return False
+        return await self.update(session_id, window_start)
+
+    async def update(self, session_id: str, window_start: int) -> bool:
+        """Gộp các tin nhắn [summary_upto, window_start) vào bản tóm tắt"""
+        session = await asyncio.to_thread(self.store.get, session_id)
+        if session is None:
+            return False
+        upto = session.get("summary_upto") or 0
+        messages = await asyncio.to_thread(self.store.get_messages, session_id) or []
+        end = min(window_start, len(messages), upto + self.max_batch_messages)
+        if end <= upto:
+            return False
+
+        evicted = messages[upto:end]
+        try:
+            response = await self._llm().ainvoke(SUMMARY_PROMPT.format(
+                summary=session.get("summary") or "(chưa có)",
+                transcript=self._transcript(evicted),
+            ))
+        except Exception as e:
+            print(f"Error summarizing chat session {session_id}: {str(e)}")
+            return False
+
+        summary = response.content if isinstance(response.content, str) else str(response.content)
+        return await asyncio.to_thread(
+            self.store.set_summary, session_id, summary.strip(), end, upto, evicted[-1]["id"]
+        )
+
+    def _transcript(self, messages: List[dict]) -> str:
+        lines = []
+        for m in messages:
+            speaker = "Trợ lý" if m["type"] == "ai" else "Người dùng"
+            text = m["text"] or ""
+            if len(text) > self.max_message_chars:
+                text = text[:self.max_message_chars] + "…"
+            lines.append(f"{speaker}: {text}")
+        return "\n".join(lines)
@@ -0,0 +1,9 @@
+"""
+Cấu hình pytest: chạy từ thư mục apis (python -m pytest -q tests)
+"""
+
+import os
+import sys
+
+# Các module của API được import theo đường dẫn tương đối với apis/ (như khi chạy main.py)
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
@@ -0,0 +1,28 @@
+import threading
+import time
+
+import pytest
+
+agent = pytest.importorskip("agents.agent")
+
+
+def test_abandoned_tool_is_counted_until_it_finishes():
+    release = threading.Event()
+    future = agent.TOOL_EXECUTOR.submit(release.wait, 5)
+    before = agent.tool_stats()
+
+    agent._abandon("slow_tool", future)
+    stats = agent.tool_stats()
+    assert stats["abandoned_running"] == before["abandoned_running"] + 1
+    assert stats["abandoned_total"] == before["abandoned_total"] + 1
+    assert stats["timeout"] == agent.TOOL_TIMEOUT
+
+    release.set()
+    future.result(timeout=5)
+    # Callback hoàn tất chạy ngay sau khi future có kết quả
+    deadline = time.monotonic() + 2
+    while agent.tool_stats()["abandoned_running"] != before["abandoned_running"] and time.monotonic() < deadline:
+        time.sleep(0.005)
+    stats = agent.tool_stats()
+    assert stats["abandoned_running"] == before["abandoned_running"]
+    assert stats["abandoned_total"] == before["abandoned_total"] + 1
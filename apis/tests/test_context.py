@@ -0,0 +1,74 @@
+import pytest
+
+from sessions.context import MESSAGE_OVERHEAD_TOKENS, TRUNCATED_MARKER, ContextBuilder, estimate_tokens
+
+
+def message(index, text=None, kind=None):
+    return {"id": f"m{index}", "type": kind or ("user" if index % 2 == 0 else "ai"), "text": text or f"tin nhắn số {index}"}
+
+
+def history(count, text=None):
+    return [message(i, text) for i in range(count)]
+
+
+def test_estimate_tokens_counts_utf8_bytes():
+    assert estimate_tokens("") == 0
+    assert estimate_tokens("abcd") == 1
+    assert estimate_tokens("ệệệệ") == 3  # 12 byte
+
+
+def test_prefix_is_cached_until_prompt_changes():
+    prompts = ["prompt 1"]
+    builder = ContextBuilder(lambda: prompts[-1])
+    first = builder.prefix()
+    assert builder.prefix()[0] is first[0]
+    prompts.append("prompt 2")
+    assert builder.prefix()[0][0]["content"] == "prompt 2"
+
+
+def test_window_keeps_newest_messages_within_budget():
+    builder = ContextBuilder(lambda: "system", max_tokens=200)
+    messages = history(50)
+    context = builder.build(messages)
+    turns = context.messages[2:]
+    assert turns[-1]["content"] == messages[-1]["text"]
+    assert [t["content"] for t in turns] == [m["text"] for m in messages[context.start:]]
+    assert 0 < context.start < 50
+    assert context.tokens <= 200
+    assert context.tokens == builder.prefix()[1] + sum(estimate_tokens(t["content"]) + MESSAGE_OVERHEAD_TOKENS for t in turns)
+
+
+def test_current_message_is_added_once():
+    builder = ContextBuilder(lambda: "system")
+    messages = history(3)
+    assert len(builder.build(messages, messages[-1]["text"]).messages) == 2 + 3
+    assert builder.build(messages, "câu hỏi mới").messages[-1] == {"role": "user", "content": "câu hỏi mới"}
+
+
+def test_last_message_is_kept_even_over_budget():
+    builder = ContextBuilder(lambda: "system", max_tokens=10, max_message_tokens=1000)
+    context = builder.build(history(4), "x" * 2000)
+    assert context.messages[-1]["role"] == "user" and len(context.messages) == 3
+
+
+@pytest.mark.parametrize("text", ["a" * 50000, "ệ" * 20000, "Đơn hàng của tôi 🚚 " * 3000])
+def test_long_message_is_truncated_to_the_token_cap(text):
+    builder = ContextBuilder(lambda: "system", max_tokens=100000, max_message_tokens=500)
+    content = builder.build([message(0, text, "user")]).messages[-1]["content"]
+    assert TRUNCATED_MARKER in content
+    assert 480 <= estimate_tokens(content) <= 500
+    head, _, tail = content.partition(TRUNCATED_MARKER)
+    assert text.startswith(head) and text.endswith(tail)
+
+
+def test_summarized_messages_are_not_repeated():
+    builder = ContextBuilder(lambda: "system", max_tokens=100000)
+    messages = history(20)
+    context = builder.build(messages, summary="tóm tắt", summary_upto=12)
+    assert context.start == 12
+    assert context.messages[2]["content"].endswith("tóm tắt")
+    assert [t["content"] for t in context.messages[3:]] == [m["text"] for m in messages[12:]]
+    # Không có bản tóm tắt thì summary_upto bị bỏ qua
+    assert builder.build(messages, summary_upto=12).start == 0
+    # Bản tóm tắt bao phủ toàn bộ lịch sử: vẫn còn tin nhắn hiện tại
+    assert builder.build(messages, "mới", summary="tóm tắt", summary_upto=20).messages[-1]["content"] == "mới"
@@ -0,0 +1,93 @@
+from types import SimpleNamespace
+
+import pytest
+
+from agents.intent_router import IntentRouter, image_intent
+from agents.tools.order_repository import OrderRepository, SAMPLE_ORDERS
+
+
+PRODUCTS = [
+    {"name": "iPhone 15 Pro", "brand": "Apple", "category": "Phone", "price": 999, "in_stock": True, "rating": 4.8},
+    {"name": "iPhone 15", "brand": "Apple", "category": "Phone", "price": 799, "in_stock": True},
+    {"name": "MacBook Air M2", "brand": "Apple", "category": "Laptop", "price": 1199, "in_stock": False},
+    {"name": "Galaxy Tab", "brand": "Samsung", "price": 499, "in_stock": True},
+    {"name": "Galaxy Tab", "brand": "Samsung", "price": 549, "in_stock": True},
+]
+
+
+@pytest.fixture
+def catalog():
+    return SimpleNamespace(version=1, products=list(PRODUCTS))
+
+
+@pytest.fixture
+def router(catalog):
+    orders = OrderRepository(SAMPLE_ORDERS)
+    return IntentRouter(catalog=catalog, order_source=lambda: orders)
+
+
+@pytest.mark.parametrize("message", [
+    "ORD-2024-003",
+    "đơn hàng ord-2024-001 đang ở đâu?",
+    "kiem tra don ORD-2024-002 giup minh",
+])
+def test_order_lookup(router, message):
+    result = router.route(message)
+    assert result["intent"] == "order_lookup"
+    assert result["response"].startswith("**Đơn hàng ORD-2024-00")
+
+
+def test_unknown_order_is_answered_without_agent(router):
+    result = router.route("ORD-2024-999")
+    assert result["intent"] == "order_lookup"
+    assert "Không tìm thấy đơn hàng **ORD-2024-999**" in result["response"]
+
+
+@pytest.mark.parametrize("message, name", [
+    ("giá iPhone 15 Pro", "iPhone 15 Pro"),
+    ("iphone 15 bao nhiêu tiền", "iPhone 15"),
+    ("MacBook Air M2 còn hàng không", "MacBook Air M2"),
+])
+def test_product_lookup_prefers_longest_name(router, message, name):
+    result = router.route(message)
+    assert result["intent"] == "product_lookup"
+    assert result["response"].startswith(f"**{name}**")
+
+
+@pytest.mark.parametrize("message", [
+    "",
+    "xin chào",
+    "hủy đơn ORD-2024-001",
+    "so sánh ORD-2024-001 và ORD-2024-002",
+    "tạo ảnh hóa đơn ORD-2024-001",
+    "vẽ hình iPhone 15 Pro",
+    "so sánh iPhone 15 Pro và MacBook Air M2",
+    "iPhone 15 Pro có tốt không",
+    "iPhone",
+    "giá Galaxy Tab",
+    "kiểm tra " * 50 + "ORD-2024-001",
+])
+def test_falls_back_to_agent(router, message):
+    assert router.route(message) is None
+
+
+def test_product_names_follow_catalog_version(router, catalog):
+    assert router.route("giá Pixel 9") is None
+    catalog.products.append({"name": "Pixel 9", "brand": "Google", "price": 699, "in_stock": True})
+    assert router.route("giá Pixel 9") is None
+    catalog.version = 2
+    assert router.route("giá Pixel 9")["response"].startswith("**Pixel 9**")
+
+
+def test_disabled_router_and_stats(catalog):
+    router = IntentRouter(enabled=False, catalog=catalog, order_source=lambda: OrderRepository(SAMPLE_ORDERS))
+    assert router.route("ORD-2024-001") is None
+    stats = router.stats()
+    assert stats["fallbacks"] == 1 and stats["routed_rate"] == 0.0
+
+
+def test_image_intent():
+    assert image_intent("Tạo ảnh hóa đơn cho ORD-2024-001") == "invoice_image"
+    assert image_intent("vẽ hình một con mèo") == "image"
+    assert image_intent("hóa đơn ORD-2024-001") is None
+    assert image_intent("") is None
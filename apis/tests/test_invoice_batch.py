@@ -0,0 +1,70 @@
+import asyncio
+import threading
+import zipfile
+
+import pytest
+
+from agents.tools import invoice_batch
+from agents.tools import invoice_pool as pool_module
+from agents.tools.invoice_pool import InvoiceRenderPool
+from agents.tools.order_repository import SAMPLE_ORDERS
+
+
+@pytest.fixture
+def pool(monkeypatch, tmp_path):
+    """Pool thread với việc vẽ giả chờ gate; lô dùng pool này và ghi file vào tmp_path"""
+    gate = threading.Event()
+
+    def fake_render(order_id, order, width, height, issued_on):
+        gate.wait(5)
+        return order_id.encode()
+
+    monkeypatch.setattr(pool_module, "_render", fake_render)
+    monkeypatch.setattr(pool_module, "_init_worker", lambda: None)
+    pool = InvoiceRenderPool(max_workers=0, max_pending=4, queue_timeout=5.0)
+    pool.gate = gate
+
+    async def render_png(order):
+        return await pool.render_async(order["order_id"], order, 10, 10, "2024-01-01")
+
+    monkeypatch.setattr(invoice_batch, "_render_png", render_png)
+    monkeypatch.setattr(invoice_batch, "BATCH_DIR", str(tmp_path))
+    monkeypatch.setattr(invoice_batch, "BATCH_CONCURRENCY", 2)
+    monkeypatch.setattr(invoice_batch, "_slots_by_loop", {})
+    yield pool
+    gate.set()
+    pool.shutdown()
+
+
+def test_batch_leaves_slots_for_interactive_renders(pool):
+    orders = [dict(SAMPLE_ORDERS[i % len(SAMPLE_ORDERS)], order_id=f"ORD-2030-{i:03d}") for i in range(20)]
+
+    async def scenario():
+        events = []
+
+        async def consume():
+            async for event in invoice_batch.run_invoice_batch(orders, "zip"):
+                events.append(event)
+
+        batch = asyncio.ensure_future(consume())
+        await asyncio.sleep(0.05)
+        # Lô chỉ giữ BATCH_CONCURRENCY slot, hóa đơn trong chat vẫn lấy được slot ngay
+        assert pool.stats()["free_slots"] == 2
+        interactive = asyncio.ensure_future(pool.render_async("ORD-2024-001", None, 10, 10, "2024-01-01"))
+        await asyncio.sleep(0.01)
+        assert pool.stats()["waiting"] == 0
+        pool.gate.set()
+        await batch
+        return events, await interactive
+
+    events, png = asyncio.run(scenario())
+    assert png == b"ORD-2024-001"
+    complete = events[-1]
+    assert complete["type"] == "complete" and complete["count"] == 20
+    with zipfile.ZipFile(invoice_batch.batch_path(complete["batch_id"])) as archive:
+        assert "manifest.csv" in archive.namelist()
+    assert pool.stats()["free_slots"] == 4
+
+
+def test_batch_concurrency_is_below_pool_queue():
+    assert 1 <= invoice_batch.BATCH_CONCURRENCY < max(invoice_batch.invoice_pool.max_pending, 2)
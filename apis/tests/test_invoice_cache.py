@@ -0,0 +1,82 @@
+import os
+
+from agents.tools.invoice_cache import KEY_LENGTH, PINNED_FILE, InvoiceCache
+
+
+ORDER = {"order_id": "ORD-2024-001", "total_amount": 2500000, "items": [{"name": "Laptop", "quantity": 1}]}
+
+
+def cache_file(order_id="ORD-2024-001", **inputs):
+    return InvoiceCache.filename(order_id, InvoiceCache.key(order_id, ORDER, 820, 1100, **inputs))
+
+
+def write(directory, name, size, mtime):
+    path = os.path.join(directory, name)
+    with open(path, "wb") as f:
+        f.write(b"x" * size)
+    os.utime(path, (mtime, mtime))
+
+
+def test_key_depends_on_every_render_input():
+    key = InvoiceCache.key("ORD-2024-001", ORDER, 820, 1100, date="01/01/2024", layout=1)
+    assert len(key) == KEY_LENGTH and all(ch in "0123456789abcdef" for ch in key)
+    assert key == InvoiceCache.key("ORD-2024-001", dict(reversed(list(ORDER.items()))), 820, 1100, date="01/01/2024", layout=1)
+    assert key != InvoiceCache.key("ORD-2024-001", dict(ORDER, total_amount=1), 820, 1100, date="01/01/2024", layout=1)
+    assert key != InvoiceCache.key("ORD-2024-001", ORDER, 821, 1100, date="01/01/2024", layout=1)
+    assert key != InvoiceCache.key("ORD-2024-001", ORDER, 820, 1100, date="02/01/2024", layout=1)
+    assert key != InvoiceCache.key("ORD-2024-001", ORDER, 820, 1100, date="01/01/2024", layout=2)
+
+
+def test_filename_is_safe():
+    assert InvoiceCache.filename("ORD-2024-001", "0" * KEY_LENGTH) == f"invoice_ORD-2024-001_{'0' * KEY_LENGTH}.png"
+    assert InvoiceCache.filename("../x y", "a" * KEY_LENGTH) == f"invoice____x_y_{'a' * KEY_LENGTH}.png"
+
+
+def test_quota_evicts_least_recently_used(tmp_path):
+    cache = InvoiceCache(str(tmp_path), max_bytes=25)
+    names = [cache_file(date=str(i)) for i in range(3)]
+    cache.put(names[0], b"a" * 10)
+    cache.put(names[1], b"b" * 10)
+    assert cache.get(names[0])
+    cache.put(names[2], b"c" * 10)
+    assert not cache.get(names[1]) and not (tmp_path / names[1]).exists()
+    assert cache.get(names[0]) and cache.get(names[2])
+    assert cache.stats()["bytes"] == 20
+
+
+def test_pinned_images_are_never_evicted(tmp_path):
+    cache = InvoiceCache(str(tmp_path), max_bytes=15)
+    chat, batch = cache_file(date="chat"), cache_file(date="batch")
+    cache.put(chat, b"a" * 10, pin=True)
+    for i in range(5):
+        cache.put(cache_file(date=f"batch-{i}"), b"b" * 10)
+    cache.put(batch, b"b" * 10)
+    assert cache.get(chat) and (tmp_path / chat).exists()
+    assert cache.stats() == {"entries": 1, "bytes": 10, "pinned": 1, "hits": 1, "misses": 0}
+
+    # Ảnh lô trúng cache rồi được chèn vào chat: pin, không còn tính vào dung lượng
+    assert cache.get(batch, pin=True)
+    cache.put(cache_file(date="later"), b"c" * 10)
+    assert (tmp_path / batch).exists()
+
+
+def test_scan_restores_index_pins_and_quota(tmp_path):
+    directory = str(tmp_path)
+    old, new, pinned = (cache_file(date=d) for d in ("old", "new", "pinned"))
+    write(directory, old, 10, 1000)
+    write(directory, new, 10, 2000)
+    write(directory, pinned, 10, 500)
+    # Không thuộc cache: ảnh mẫu cũ, file tạm, file khác
+    write(directory, "invoice_ORD-2024-001.png", 50, 100)
+    write(directory, f"{new}.123.tmp", 50, 100)
+    write(directory, "notes.txt", 50, 100)
+    with open(os.path.join(directory, PINNED_FILE), "w", encoding="utf-8") as f:
+        f.write(pinned + "\n")
+
+    cache = InvoiceCache(directory, max_bytes=15)
+    # Ảnh cũ nhất (mtime) chưa pin bị xóa khi khởi động vì vượt dung lượng
+    assert not os.path.exists(os.path.join(directory, old))
+    assert cache.get(new) and cache.get(pinned)
+    assert os.path.exists(os.path.join(directory, "invoice_ORD-2024-001.png"))
+    stats = cache.stats()
+    assert stats["entries"] == 1 and stats["bytes"] == 10 and stats["pinned"] == 1
@@ -0,0 +1,136 @@
+import asyncio
+import threading
+
+import pytest
+
+from agents.tools import invoice_pool as pool_module
+from agents.tools.invoice_pool import InvoiceQueueFull, InvoiceRenderPool, InvoiceRenderTimeout
+
+
+@pytest.fixture
+def gate(monkeypatch):
+    """Thay việc vẽ bằng hàm chờ gate được mở (pool chạy bằng thread, INVOICE_RENDER_WORKERS=0)"""
+    event = threading.Event()
+
+    def fake_render(order_id, order, width, height, issued_on):
+        event.wait(5)
+        return order_id.encode()
+
+    monkeypatch.setattr(pool_module, "_render", fake_render)
+    monkeypatch.setattr(pool_module, "_init_worker", lambda: None)
+    return event
+
+
+def make_pool(max_pending, queue_timeout=5.0):
+    return InvoiceRenderPool(max_workers=0, max_pending=max_pending, queue_timeout=queue_timeout)
+
+
+def render(pool, order_id):
+    return pool.render_async(order_id, None, 10, 10, "2024-01-01")
+
+
+def test_full_queue_rejects_after_timeout(gate):
+    pool = make_pool(max_pending=2, queue_timeout=0.1)
+
+    async def scenario():
+        running = [asyncio.ensure_future(render(pool, f"o{i}")) for i in range(2)]
+        await asyncio.sleep(0.01)
+        with pytest.raises(InvoiceQueueFull):
+            await render(pool, "late")
+        gate.set()
+        return await asyncio.gather(*running)
+
+    assert asyncio.run(scenario()) == [b"o0", b"o1"]
+    stats = pool.stats()
+    assert (stats["rejected"], stats["completed"], stats["free_slots"]) == (1, 2, 2)
+    pool.shutdown()
+
+
+def test_cancelled_waiters_do_not_leak_slots(gate):
+    pool = make_pool(max_pending=2)
+
+    async def scenario():
+        running = [asyncio.ensure_future(render(pool, f"o{i}")) for i in range(2)]
+        await asyncio.sleep(0.01)
+        waiters = [asyncio.ensure_future(render(pool, f"w{i}")) for i in range(5)]
+        await asyncio.sleep(0.01)
+        for waiter in waiters:
+            waiter.cancel()
+        gate.set()
+        await asyncio.gather(*running)
+        await asyncio.gather(*waiters, return_exceptions=True)
+        # Toàn bộ slot dùng được lại
+        return await asyncio.gather(*(render(pool, f"n{i}") for i in range(2)))
+
+    assert asyncio.run(scenario()) == [b"n0", b"n1"]
+    stats = pool.stats()
+    assert (stats["free_slots"], stats["pending"], stats["waiting"]) == (2, 0, 0)
+    pool.shutdown()
+
+
+def test_slot_granted_to_cancelled_waiter_is_returned(gate):
+    gate.set()
+    pool = make_pool(max_pending=1)
+
+    async def scenario():
+        with pool._lock:
+            assert pool._take_slot()
+        waiter = asyncio.ensure_future(render(pool, "w"))
+        await asyncio.sleep(0.01)
+        # Slot được trao và coroutine bị hủy trong cùng một vòng lặp của event loop
+        pool._release_slot()
+        waiter.cancel()
+        await asyncio.gather(waiter, return_exceptions=True)
+        await asyncio.sleep(0.01)
+
+    asyncio.run(scenario())
+    assert pool.stats()["free_slots"] == 1
+    pool.shutdown()
+
+
+def test_thread_and_async_callers_share_slots(gate):
+    gate.set()
+    pool = make_pool(max_pending=2)
+    results = []
+
+    def thread_caller(index):
+        results.append(pool.render(f"t{index}", None, 10, 10, "2024-01-01"))
+
+    async def scenario():
+        threads = [threading.Thread(target=thread_caller, args=(i,)) for i in range(10)]
+        for thread in threads:
+            thread.start()
+        pngs = await asyncio.gather(*(render(pool, f"a{i}") for i in range(10)))
+        for thread in threads:
+            thread.join()
+        return pngs
+
+    assert len(asyncio.run(scenario())) == 10
+    assert len(results) == 10
+    stats = pool.stats()
+    assert (stats["free_slots"], stats["completed"]) == (2, 20)
+    pool.shutdown()
+
+
+def test_hung_render_times_out_but_keeps_its_slot(gate):
+    pool = InvoiceRenderPool(max_workers=0, max_pending=2, render_timeout=0.05)
+    with pytest.raises(InvoiceRenderTimeout):
+        pool.render("sync", None, 10, 10, "2024-01-01")
+
+    async def scenario():
+        with pytest.raises(InvoiceRenderTimeout):
+            await render(pool, "async")
+
+    asyncio.run(scenario())
+    # Việc vẽ vẫn chạy nên slot chưa được trả
+    assert pool.stats()["timeouts"] == 2 and pool.stats()["free_slots"] < 2
+    gate.set()
+    pool.shutdown()
+    assert pool.stats()["free_slots"] == 2
+
+
+def test_worker_processes_are_not_forked_by_default(monkeypatch):
+    monkeypatch.delenv("INVOICE_RENDER_START_METHOD", raising=False)
+    assert pool_module.create_invoice_pool().start_method == "spawn"
+    monkeypatch.setenv("INVOICE_RENDER_START_METHOD", "forkserver")
+    assert pool_module.create_invoice_pool().start_method == "forkserver"
@@ -0,0 +1,106 @@
+import random
+import unicodedata
+
+import pytest
+
+from agents.intent_router import IMAGE_KEYWORDS, INVOICE_IMAGE_KEYWORDS, INVOICE_KEYWORDS, KEYWORD_MATCHER
+from agents.keyword_matcher import KeywordMatcher, keyword_pattern, normalize_text
+
+
+INTENTS = {
+    "image": IMAGE_KEYWORDS,
+    "invoice": INVOICE_KEYWORDS,
+    "invoice_image": INVOICE_IMAGE_KEYWORDS,
+}
+
+
+def naive_intents(text):
+    """Cách kiểm tra trước khi có KeywordMatcher: any(k in text) cho từng nhóm"""
+    text = text.lower()
+    return frozenset(intent for intent, keywords in INTENTS.items() if any(k in text for k in keywords))
+
+
+SENTENCES = [
+    "Tạo hình hóa đơn cho đơn hàng ORD-2024-001",
+    "vẽ ảnh minh họa cho bài viết",
+    "Please generate image of the receipt",
+    "in biên lai giúp tôi",
+    "tôi muốn xem phiếu thu",
+    "thiết kế logo và banner",
+    "border collie",  # "order" nằm trong "border"
+    "hoá đơn tháng này bao nhiêu",
+    "cho mình hỏi giá iphone",
+    "",
+]
+
+
+@pytest.mark.parametrize("text", SENTENCES)
+def test_intents_match_naive_substring_checks(text):
+    assert KEYWORD_MATCHER.intents(text) == naive_intents(text)
+
+
+def test_intents_match_naive_on_random_text():
+    rng = random.Random(25)
+    keywords = sorted({k for group in INTENTS.values() for k in group})
+    filler = ["xin", "chào", "tôi", "cần", "một", "cái", "cho", "shop", "ơi", "hình", "ảnh", "đơn", "vẽ", "tạo"]
+    for _ in range(500):
+        words = [rng.choice(filler) for _ in range(rng.randint(0, 8))]
+        for _ in range(rng.randint(0, 2)):
+            words.insert(rng.randint(0, len(words)), rng.choice(keywords))
+        # Ghép không khoảng trắng đôi khi, để từ khóa nằm giữa từ khác
+        text = "".join(w + rng.choice([" ", " ", ""]) for w in words)
+        assert KEYWORD_MATCHER.intents(text) == naive_intents(text), text
+
+
+def test_find_reports_positions_in_order():
+    matcher = KeywordMatcher({"greet": ["xin chào"], "thanks": ["cảm ơn"]})
+    text = "Xin chào, cảm ơn bạn. XIN CHÀO!"
+    matches = matcher.find(text)
+    normalized = normalize_text(text)
+    assert [(m.intent, m.keyword) for m in matches] == [("greet", "xin chào"), ("thanks", "cảm ơn"), ("greet", "xin chào")]
+    assert [m.start for m in matches] == sorted(m.start for m in matches)
+    for m in matches:
+        assert normalized[m.start:m.end] == m.keyword
+
+
+def test_longest_match_also_reports_contained_phrases():
+    matcher = KeywordMatcher({"image": ["tạo hình minh họa"], "illustration": ["minh họa"], "draw": ["tạo"]})
+    assert matcher.intents("tạo hình minh họa") == {"image", "illustration", "draw"}
+    matches = matcher.find("tạo hình minh họa")
+    assert matches[0].keyword == "tạo hình minh họa"
+    assert {m.intent for m in matches if m.start == 0} == {"image", "illustration", "draw"}
+
+
+def test_overlapping_matches_are_found():
+    matcher = KeywordMatcher({"a": ["hóa đơn"], "b": ["đơn hàng"]})
+    matches = matcher.find("hóa đơn hàng")
+    assert [(m.intent, m.start) for m in matches] == [("a", 0), ("b", 4)]
+
+
+def test_phrase_whitespace_is_flexible():
+    matcher = KeywordMatcher({"image": ["tạo   hình"]})
+    assert matcher.intents("tạo\thình") == {"image"}
+    assert matcher.find("tạo  hình")[0].keyword == "tạo hình"
+
+
+def test_normalization_is_nfc_and_casefold():
+    decomposed = unicodedata.normalize("NFD", "HÓA ĐƠN")
+    assert decomposed != "HÓA ĐƠN"
+    assert normalize_text(decomposed) == "hóa đơn"
+    assert KEYWORD_MATCHER.intents(decomposed) == {"invoice"}
+    assert KeywordMatcher({"street": ["straße"]}).intents("STRASSE") == {"street"}
+
+
+def test_empty_matcher():
+    matcher = KeywordMatcher({"empty": ["", "   "]})
+    assert matcher.intents("anything") == frozenset()
+    assert matcher.find("anything") == []
+
+
+def test_keyword_pattern_whole_words():
+    partial = keyword_pattern(["đơn", "mã đơn"])
+    whole = keyword_pattern(["đơn", "mã đơn"], whole_words=True)
+    assert partial.search("đơnhàng")
+    assert not whole.search("đơnhàng")
+    assert whole.search("xem mã  đơn nhé").group() == "mã  đơn"
+    assert whole.sub("", "mã đơn ORD-1").strip() == "ORD-1"
@@ -0,0 +1,72 @@
+import pytest
+
+from agents.tools.order_repository import ORDER_STATUSES, OrderRepository, SAMPLE_ORDERS
+
+
+def baseline_search(orders, query):
+    """order_search trước khi có chỉ mục: chuỗi con trên mã đơn, tên, email hoặc trạng thái"""
+    query_lower = query.lower()
+    return [
+        order for order in orders
+        if query_lower in order["order_id"].lower()
+        or query_lower in order["customer_name"].lower()
+        or query_lower in order["customer_email"].lower()
+        or query_lower in order["status"].lower()
+    ]
+
+
+@pytest.fixture
+def repository():
+    return OrderRepository(SAMPLE_ORDERS)
+
+
+def ids(orders):
+    return [order["order_id"] for order in orders]
+
+
+@pytest.mark.parametrize("query", ["an", "AN", "đang", "giao", "hủy", "văn", "email.com", "ord-2024", "thị", "xyz"])
+def test_substring_search_matches_baseline_union(repository, query):
+    assert ids(repository.search(query).orders) == ids(baseline_search(SAMPLE_ORDERS, query))
+
+
+def test_status_substring_keeps_name_matches(repository):
+    found = ids(repository.search("an").orders)
+    assert "ORD-2024-001" in found  # "Nguyễn Văn An", trạng thái "Đã giao hàng" cũng chứa "an"
+    assert found == sorted(found)
+
+
+def test_indexed_lookups(repository):
+    assert ids(repository.search(" ORD-2024-002 ").orders) == ["ORD-2024-002"]
+    assert ids(repository.search("NguyenVanAn@Email.com").orders) == ["ORD-2024-001"]
+    assert ids(repository.search("+84 901 234 567").orders) == ["ORD-2024-001"]
+
+
+def test_pagination_and_all(repository):
+    page = repository.search("", limit=2, offset=1)
+    assert page.total == len(SAMPLE_ORDERS)
+    assert ids(page.orders) == ids(SAMPLE_ORDERS[1:3])
+    assert ids(repository.all().orders) == ids(SAMPLE_ORDERS)
+
+
+def test_update_status_keeps_indexes_and_counts(repository):
+    before = repository.status_counts()
+    version = repository.version
+    assert repository.update_status("ord-2024-001", "Đã hủy")
+    assert not repository.update_status("ORD-2099-001", "Đã hủy")
+    counts = repository.status_counts()
+    assert counts["Đã hủy"] == before["Đã hủy"] + 1
+    assert counts["Đã giao hàng"] == before["Đã giao hàng"] - 1
+    assert "ORD-2024-001" in ids(repository.find(status="Đã hủy").orders)
+    assert "ORD-2024-001" not in ids(repository.find(status="Đã giao hàng").orders)
+    assert repository.version > version
+    # Thứ tự thêm vào không đổi khi cập nhật
+    assert ids(repository.all().orders) == ids(SAMPLE_ORDERS)
+
+
+def test_find_by_status_and_date_prefix(repository):
+    page = repository.find(order_date="2024-01", limit=2)
+    assert page.total == sum(order["order_date"].startswith("2024-01") for order in SAMPLE_ORDERS)
+    assert len(page.orders) == min(2, page.total)
+    for status in ORDER_STATUSES:
+        expected = [order for order in SAMPLE_ORDERS if order["status"] == status]
+        assert ids(repository.find(status=status).orders) == ids(expected)
@@ -0,0 +1,49 @@
+import pytest
+
+from agents.tools.order_repository import OrderRepository, SAMPLE_ORDERS
+from agents.tools.order_sqlite import SQLiteOrderSource
+
+
+@pytest.fixture
+def source(tmp_path):
+    source = SQLiteOrderSource(str(tmp_path / "orders.db"), pool_size=2)
+    source.seed(SAMPLE_ORDERS)
+    yield source
+    source.close()
+
+
+def ids(page):
+    return [order["order_id"] for order in page.orders]
+
+
+@pytest.mark.parametrize("query", [
+    "", "an", "đang", "giao", "hủy", "văn", "email.com", "ord-2024", "ORD-2024-003",
+    "tranthibinh@email.com", "0912 345 678", "xyz",
+])
+def test_search_matches_memory_repository(source, query):
+    memory = OrderRepository(SAMPLE_ORDERS)
+    assert ids(source.search(query)) == ids(memory.search(query))
+    assert source.search(query).total == memory.search(query).total
+
+
+def test_status_substring_keeps_name_matches_across_pages(source):
+    everything = ids(source.search("an"))
+    assert "ORD-2024-001" in everything
+    pages = [ids(source.search("an", limit=2, offset=offset)) for offset in range(0, len(everything), 2)]
+    assert sum(pages, []) == everything
+
+
+def test_status_list_follows_updates(source):
+    assert source.search("hoàn tiền").total == 0
+    assert source.update_status("ORD-2024-002", "Hoàn tiền")
+    assert ids(source.search("hoàn tiền")) == ["ORD-2024-002"]
+    assert source.status_counts()["Hoàn tiền"] == 1
+
+
+def test_find_and_seed_once(source):
+    assert source.seed(SAMPLE_ORDERS) == 0
+    memory = OrderRepository(SAMPLE_ORDERS)
+    for status in set(order["status"] for order in SAMPLE_ORDERS):
+        assert ids(source.find(status=status)) == ids(memory.find(status=status))
+    assert ids(source.find(order_date="2024-01", limit=3, offset=1)) == ids(memory.find(order_date="2024-01", limit=3, offset=1))
+    assert source.get("ord-2024-001")["items"] == SAMPLE_ORDERS[0]["items"]
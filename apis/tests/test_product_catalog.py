@@ -0,0 +1,119 @@
+import json
+
+import pytest
+
+from agents.tools.product_catalog import MAX_TOP_K, ProductCatalog, fold, tokenize
+
+
+PRODUCTS = [
+    {"id": 1, "name": "iPhone 15 Pro", "price": 1200, "category": "Electronics", "in_stock": False, "brand": "Apple", "rating": 4.9},
+    {"id": 2, "name": "Samsung Galaxy S24", "price": 900, "category": "Electronics", "in_stock": True, "brand": "Samsung", "rating": 4.7},
+    {"id": 3, "name": "Ốp lưng iPhone silicon", "price": 15, "category": "Phụ kiện", "in_stock": True, "brand": "Apple", "rating": 4.2},
+    {"id": 4, "name": "Tai nghe Sony WH-1000XM5", "price": 350, "category": "Âm thanh", "in_stock": True, "brand": "Sony", "rating": 4.8},
+    {"id": 5, "name": "Điện thoại Xiaomi Redmi Note 13", "price": 250, "category": "Electronics", "in_stock": True, "brand": "Xiaomi", "rating": 4.4},
+    {"id": 6, "name": "Smartphone Nokia G42", "price": 180, "category": "Electronics", "in_stock": False, "brand": "Nokia", "rating": 3.9},
+]
+
+
+@pytest.fixture
+def catalog(tmp_path):
+    return ProductCatalog(products_path=str(tmp_path / "products.json"), builtin_products=PRODUCTS)
+
+
+def ids(result):
+    return [product["id"] for product in result.products]
+
+
+def test_fold_and_tokenize():
+    assert fold("Điện Thoại") == "dien thoai"
+    assert tokenize(fold("Tai nghe WH-1000XM5")) == ["tai", "nghe", "wh", "1000xm5"]
+
+
+def test_exact_name_ranks_first(catalog):
+    result = catalog.search("iphone 15 pro")
+    assert ids(result)[0] == 1
+    # Ốp lưng iPhone cũng khớp "iphone" nhưng xếp sau
+    assert 3 in ids(result)
+
+
+def test_accents_are_ignored(catalog):
+    assert ids(catalog.search("dien thoai"))[0] == 5
+    assert ids(catalog.search("ĐIỆN THOẠI"))[0] == 5
+    assert ids(catalog.search("op lung"))[0] == 3
+
+
+def test_typo_matches_fuzzily(catalog):
+    assert ids(catalog.search("iphnoe"))[:2] == ids(catalog.search("iphone"))[:2]
+    assert ids(catalog.search("samsnug"))[0] == 2
+
+
+def test_partial_token_matches(catalog):
+    # "phone" nằm trong "iphone" và "smartphone"
+    assert set(ids(catalog.search("phone"))) >= {1, 3, 6}
+
+
+def test_brand_and_category_are_searchable(catalog):
+    assert ids(catalog.search("sony")) == [4]
+    assert set(ids(catalog.search("am thanh"))) == {4}
+
+
+def test_no_match_returns_empty(catalog):
+    result = catalog.search("máy giặt")
+    assert result.products == [] and result.total == 0
+
+
+def test_price_and_stock_filters(catalog):
+    result = catalog.search("", min_price=100, max_price=1000)
+    assert set(ids(result)) == {2, 4, 5, 6}
+    assert set(ids(catalog.search("", in_stock=False))) == {1, 6}
+    assert set(ids(catalog.search("iphone", in_stock=True))) == {3}
+
+
+def test_brand_filter_is_case_and_accent_insensitive(catalog):
+    assert set(ids(catalog.search("", brand="  apple "))) == {1, 3}
+    assert ids(catalog.search("iphone", brand="APPLE", max_price=100)) == [3]
+
+
+def test_min_rating_filter(catalog):
+    assert set(ids(catalog.search("", min_rating=4.8))) == {1, 4}
+
+
+def test_empty_query_sorts_by_rating(catalog):
+    ratings = [product["rating"] for product in catalog.search("").products]
+    assert ratings == sorted(ratings, reverse=True)
+
+
+def test_top_k_limits_products_but_not_total(catalog):
+    result = catalog.search("", top_k=2)
+    assert ids(result) == [1, 4]
+    assert result.total == len(PRODUCTS)
+    assert len(catalog.search("", top_k=0).products) == 1
+
+
+def test_top_k_is_capped(tmp_path):
+    products = [{"id": i, "name": f"Cáp sạc {i}", "price": i, "brand": "Anker", "rating": 4.0} for i in range(1, 80)]
+    catalog = ProductCatalog(products_path=str(tmp_path / "products.json"), builtin_products=products)
+    result = catalog.search("cap sac", top_k=1000)
+    assert len(result.products) == MAX_TOP_K
+    assert result.total == len(products)
+
+
+def test_imported_products_reload_and_bump_version(catalog, tmp_path):
+    version = catalog.version
+    assert catalog.search("bàn phím").products == []
+
+    imported = [{"id": 100, "name": "Bàn phím cơ Keychron K2", "price": 90, "category": "Phụ kiện", "in_stock": True, "brand": "Keychron", "rating": 4.6}]
+    (tmp_path / "products.json").write_text(json.dumps(imported, ensure_ascii=False), encoding="utf-8")
+    catalog.refresh()
+
+    assert ids(catalog.search("ban phim")) == [100]
+    assert catalog.version == version + 1
+    assert len(catalog.products) == len(PRODUCTS) + 1
+    # Không đổi file thì không nạp lại
+    assert catalog.version == version + 1
+
+
+def test_invalid_products_file_falls_back_to_builtin(catalog, tmp_path):
+    (tmp_path / "products.json").write_text("{not json", encoding="utf-8")
+    catalog.refresh()
+    assert len(catalog.products) == len(PRODUCTS)
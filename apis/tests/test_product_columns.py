@@ -0,0 +1,150 @@
+import random
+
+import pytest
+
+from agents.tools import product_stats_tool
+from agents.tools.product_catalog import BUILTIN_PRODUCTS, ProductCatalog, fold
+from agents.tools.product_columns import ProductColumns
+
+
+def naive_filter(products, category=None, brand=None, in_stock=None, min_price=None, max_price=None, min_rating=None):
+    """Lọc từng sản phẩm bằng vòng lặp Python, để so với mask vectorized"""
+    result = []
+    for p in products:
+        if category and fold(p.get("category") or "").strip() != fold(category).strip():
+            continue
+        if brand and fold(p.get("brand") or "").strip() != fold(brand).strip():
+            continue
+        if in_stock is not None and bool(p.get("in_stock")) != in_stock:
+            continue
+        if min_price is not None and (p.get("price") or 0) < min_price:
+            continue
+        if max_price is not None and (p.get("price") or 0) > max_price:
+            continue
+        if min_rating is not None and (p.get("rating") or 0) < min_rating:
+            continue
+        result.append(p)
+    return result
+
+
+@pytest.fixture
+def columns():
+    return ProductColumns(BUILTIN_PRODUCTS)
+
+
+FILTERS = [
+    {},
+    {"category": "electronics"},
+    {"brand": "APPLE"},
+    {"in_stock": True},
+    {"in_stock": False, "max_price": 500},
+    {"min_price": 100, "max_price": 1000, "min_rating": 4.5},
+    {"category": "Electronics", "brand": "Samsung", "in_stock": True},
+    {"brand": "không tồn tại"},
+]
+
+
+@pytest.mark.parametrize("filters", FILTERS)
+def test_mask_matches_naive_filter(columns, filters):
+    assert columns.rows(columns.mask(**filters)) == naive_filter(BUILTIN_PRODUCTS, **filters)
+
+
+@pytest.mark.parametrize("group_by", ["category", "brand"])
+def test_cheapest_by_matches_naive(columns, group_by):
+    mask = columns.mask(in_stock=True)
+    cheapest = {}
+    for p in naive_filter(BUILTIN_PRODUCTS, in_stock=True):
+        label = p.get(group_by) or ""
+        if label not in cheapest or p["price"] < cheapest[label]["price"]:
+            cheapest[label] = p
+
+    groups = columns.cheapest_by(group_by, mask)
+    assert {g[group_by]: g["product"]["id"] for g in groups} == {label: p["id"] for label, p in cheapest.items()}
+    prices = [g["product"]["price"] for g in groups]
+    assert prices == sorted(prices)
+
+
+def test_cheapest_by_keeps_first_row_on_price_tie():
+    products = [
+        {"id": 1, "name": "A", "price": 10, "category": "X"},
+        {"id": 2, "name": "B", "price": 5, "category": "X"},
+        {"id": 3, "name": "C", "price": 5, "category": "X"},
+        {"id": 4, "name": "D", "price": 1, "category": "Y"},
+    ]
+    groups = ProductColumns(products).cheapest_by("category")
+    assert [(g["category"], g["product"]["id"]) for g in groups] == [("Y", 4), ("X", 2)]
+
+
+def test_cheapest_by_empty_mask(columns):
+    assert columns.cheapest_by("brand", columns.mask(min_price=10**9)) == []
+
+
+@pytest.mark.parametrize("field", ["price", "rating"])
+def test_group_stats_matches_naive(field):
+    rng = random.Random(7)
+    products = [
+        {
+            "id": i,
+            "name": f"P{i}",
+            "price": rng.randint(1, 2000),
+            "rating": round(rng.uniform(1, 5), 1),
+            "category": rng.choice(["Electronics", "Home", "Sports"]),
+            "brand": rng.choice(["Apple", "Sony", "LG", ""]),
+            "in_stock": rng.random() < 0.6,
+        }
+        for i in range(500)
+    ]
+    columns = ProductColumns(products)
+    mask = columns.mask(in_stock=True)
+
+    expected = {}
+    for p in naive_filter(products, in_stock=True):
+        expected.setdefault(p["brand"], []).append(p[field])
+
+    stats = {g["brand"]: g for g in columns.group_stats("brand", field, mask)}
+    assert set(stats) == set(expected)
+    for label, values in expected.items():
+        assert stats[label]["count"] == len(values)
+        assert stats[label]["avg"] == round(sum(values) / len(values), 2)
+        assert stats[label]["min"] == min(values)
+        assert stats[label]["max"] == max(values)
+
+
+def test_group_stats_empty_mask(columns):
+    assert columns.group_stats("category", "price", columns.mask(brand="không tồn tại")) == []
+
+
+@pytest.fixture
+def stats_catalog(monkeypatch, tmp_path):
+    products = [
+        {"id": 1, "name": "iPhone 15", "price": 1000, "category": "Electronics", "brand": "Apple", "in_stock": True, "rating": 4.9},
+        {"id": 2, "name": "Galaxy S24", "price": 800, "category": "Electronics", "brand": "Samsung", "in_stock": True, "rating": 4.6},
+        {"id": 3, "name": "Ốp lưng", "price": 20, "category": "Accessories", "brand": "Apple", "in_stock": True, "rating": 4.0},
+        {"id": 4, "name": "Sạc nhanh", "price": 30, "category": "Accessories", "brand": "Samsung", "in_stock": False, "rating": 4.4},
+    ]
+    catalog = ProductCatalog(products_path=str(tmp_path / "products.json"), builtin_products=products)
+    monkeypatch.setattr(product_stats_tool, "product_catalog", catalog)
+    return catalog
+
+
+def test_product_stats_tool_cheapest(stats_catalog):
+    result = product_stats_tool.product_stats.invoke({"metric": "cheapest", "group_by": "category", "in_stock": True})
+    assert result["total"] == 3
+    assert [(g["category"], g["product"]["id"]) for g in result["groups"]] == [("Accessories", 3), ("Electronics", 2)]
+
+
+def test_product_stats_tool_aggregates(stats_catalog):
+    result = product_stats_tool.product_stats.invoke({"metric": "avg_price", "group_by": "brand"})
+    assert result["groups"] == [
+        {"brand": "Apple", "avg_price": 510.0, "count": 2},
+        {"brand": "Samsung", "avg_price": 415.0, "count": 2},
+    ]
+    result = product_stats_tool.product_stats.invoke({"metric": "min_price", "group_by": "category"})
+    assert [g["category"] for g in result["groups"]] == ["Accessories", "Electronics"]
+    result = product_stats_tool.product_stats.invoke({"metric": "count", "group_by": "category", "min_rating": 4.5})
+    assert result["groups"] == [{"category": "Electronics", "count": 2}]
+
+
+def test_product_stats_tool_no_match(stats_catalog):
+    result = product_stats_tool.product_stats.invoke({"metric": "count", "brand": "Nokia"})
+    assert result["groups"] == [] and result["total"] == 0
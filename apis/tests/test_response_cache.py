@@ -0,0 +1,155 @@
+import asyncio
+from types import SimpleNamespace
+
+from agents.response_cache import ResponseCache
+from sessions.context import ContextBuilder
+
+
+GREETING = {"type": "ai", "text": "Xin chào! Tôi là trợ lý AI HiveSpace. Tôi có thể giúp gì cho bạn hôm nay?"}
+
+
+class FakeAgent:
+    """Agent giả: trả lời kèm số lần gọi, ghi tool message theo nội dung câu hỏi"""
+
+    def __init__(self):
+        self.calls = 0
+
+    def _trace(self, question, tool_trace):
+        if tool_trace is None:
+            return
+        if "ORD" in question:
+            tool_trace.append(SimpleNamespace(name="order_search", status="success"))
+        if "giá" in question:
+            tool_trace.append(SimpleNamespace(name="product_search", status="success"))
+        if "lỗi" in question:
+            tool_trace.append(SimpleNamespace(name="order_search", status="error"))
+        if "tin tức" in question:
+            tool_trace.append(SimpleNamespace(name="web_search", status="success"))
+
+    async def aask_react_agent(self, messages, tool_trace=None):
+        self.calls += 1
+        question = messages[-1]["content"]
+        self._trace(question, tool_trace)
+        return f"answer {self.calls}"
+
+    async def astream_react_agent(self, messages, tool_trace=None):
+        response = await self.aask_react_agent(messages, tool_trace)
+        yield {"type": "token", "content": response}
+        yield {"type": "final", "content": response}
+
+
+def make_cache(**kwargs):
+    versions = {"agent": 1, "products": 1, "orders": 1}
+    now = [0.0]
+    cache = ResponseCache(
+        {name: (lambda name=name: versions[name]) for name in versions},
+        clock=lambda: now[0],
+        **kwargs,
+    )
+    return cache, versions, now
+
+
+def new_session_context(question):
+    """Ngữ cảnh như main.py dựng cho câu hỏi đầu tiên của một phiên mới (có lời chào của AI)"""
+    builder = ContextBuilder(lambda: "system prompt")
+    history = [GREETING, {"type": "user", "text": question}]
+    return builder.build(history, question).messages
+
+
+def ask(cache, agent, messages):
+    return asyncio.run(cache.aask(agent, messages))
+
+
+def test_first_question_of_new_session_is_cached():
+    cache, _, _ = make_cache()
+    agent = FakeAgent()
+    answers = [ask(cache, agent, new_session_context("Giá iPhone 15 Pro?")) for _ in range(3)]
+    assert answers == ["answer 1"] * 3
+    assert agent.calls == 1
+    stats = cache.stats()
+    assert (stats["stores"], stats["hits"], stats["skipped"]) == (1, 2, 0)
+
+
+def test_follow_up_question_is_skipped():
+    cache, _, _ = make_cache()
+    agent = FakeAgent()
+    history = [GREETING, {"type": "user", "text": "xin chào"}, {"type": "ai", "text": "chào bạn"},
+               {"type": "user", "text": "giá của nó?"}]
+    messages = ContextBuilder(lambda: "system prompt").build(history, "giá của nó?").messages
+    ask(cache, agent, messages)
+    ask(cache, agent, messages)
+    assert agent.calls == 2
+    assert cache.stats()["skipped"] == 2
+
+
+def test_normalized_question_hits():
+    cache, _, _ = make_cache()
+    agent = FakeAgent()
+    ask(cache, agent, new_session_context("Đơn ORD-2024-001 đang ở đâu?"))
+    assert ask(cache, agent, new_session_context("đơn  ord-2024-001 đang ở đâu")) == "answer 1"
+    assert agent.calls == 1
+
+
+def test_entry_invalidated_when_dependency_changes():
+    cache, versions, _ = make_cache()
+    agent = FakeAgent()
+    question = new_session_context("đơn ORD-2024-001 đang ở đâu")
+    ask(cache, agent, question)
+    # Catalog sản phẩm không phải phụ thuộc của câu trả lời về đơn hàng
+    versions["products"] += 1
+    assert ask(cache, agent, question) == "answer 1"
+    versions["orders"] += 1
+    assert ask(cache, agent, question) == "answer 2"
+    versions["agent"] += 1
+    assert ask(cache, agent, question) == "answer 3"
+    assert cache.stats()["invalidated"] == 2
+
+
+def test_volatile_answers_expire_with_search_ttl():
+    cache, _, now = make_cache(volatile_ttl=10)
+    agent = FakeAgent()
+    question = new_session_context("tin tức hôm nay")
+    ask(cache, agent, question)
+    now[0] = 5
+    assert ask(cache, agent, question) == "answer 1"
+    now[0] = 11
+    assert ask(cache, agent, question) == "answer 2"
+
+
+def test_tool_errors_are_not_cached():
+    cache, _, _ = make_cache()
+    agent = FakeAgent()
+    question = new_session_context("lỗi ORD-2024-001")
+    ask(cache, agent, question)
+    ask(cache, agent, question)
+    assert agent.calls == 2
+    assert cache.stats()["stores"] == 0
+
+
+def test_stream_stores_and_serves_from_cache():
+    cache, _, _ = make_cache()
+    agent = FakeAgent()
+    question = new_session_context("giá MacBook Air M2")
+
+    async def collect():
+        return [event async for event in cache.astream(agent, question)]
+
+    first = asyncio.run(collect())
+    second = asyncio.run(collect())
+    assert first[-1] == {"type": "final", "content": "answer 1"}
+    assert second == [{"type": "token", "content": "answer 1"}, {"type": "final", "content": "answer 1"}]
+    assert agent.calls == 1
+
+
+def test_semantic_match_requires_same_numbers():
+    def embed(texts):
+        import numpy as np
+        # Cùng một vector cho mọi câu: chỉ điều kiện con số quyết định có khớp hay không
+        return np.ones((len(texts), 4)) / 2
+
+    cache, _, _ = make_cache(embed=embed, similarity=0.9)
+    agent = FakeAgent()
+    ask(cache, agent, new_session_context("đơn ORD-2024-001 đang ở đâu"))
+    assert ask(cache, agent, new_session_context("cho hỏi đơn ORD-2024-001")) == "answer 1"
+    assert ask(cache, agent, new_session_context("đơn ORD-2024-002 đang ở đâu")) == "answer 2"
+    assert cache.stats()["semantic_hits"] == 1
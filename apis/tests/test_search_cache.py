@@ -0,0 +1,121 @@
+import threading
+import time
+
+import pytest
+
+from agents.tools.search_cache import SearchCache, SearchTimeout
+
+
+class Clock:
+    def __init__(self):
+        self.now = 0.0
+
+    def __call__(self):
+        return self.now
+
+
+class SlowProvider:
+    """Provider đếm số lần gọi, chờ gate trước khi trả kết quả"""
+
+    def __init__(self):
+        self.calls = 0
+        self.gate = threading.Event()
+        self.lock = threading.Lock()
+
+    def __call__(self, query, max_results):
+        with self.lock:
+            self.calls += 1
+            call = self.calls
+        self.gate.wait(5)
+        return [{"title": f"{query} #{call}", "href": f"https://example.com/{call}", "body": ""}]
+
+
+def wait_until(predicate, timeout=2.0):
+    deadline = time.monotonic() + timeout
+    while not predicate():
+        assert time.monotonic() < deadline
+        time.sleep(0.005)
+
+
+@pytest.fixture
+def provider():
+    provider = SlowProvider()
+    yield provider
+    provider.gate.set()
+
+
+def test_concurrent_identical_queries_call_provider_once(provider):
+    cache = SearchCache(provider, timeout=5)
+    results = []
+    queries = ["Giá iPhone 15", "giá  iphone 15?", "GIÁ IPHONE 15"] * 3
+    threads = [threading.Thread(target=lambda q=q: results.append(cache.search(q))) for q in queries]
+    for thread in threads:
+        thread.start()
+    wait_until(lambda: cache.stats()["misses"] == len(queries))
+    provider.gate.set()
+    for thread in threads:
+        thread.join()
+
+    assert provider.calls == 1
+    assert len(results) == len(queries) and all(r == results[0] for r in results)
+    stats = cache.stats()
+    assert stats["coalesced"] == len(queries) - 1
+    assert stats["inflight"] == 0
+
+
+def test_stale_entry_is_served_while_one_refresh_runs(provider):
+    clock = Clock()
+    cache = SearchCache(provider, ttl=10, stale_ttl=100, clock=clock)
+    provider.gate.set()
+    first = cache.search("tin tức")
+    assert cache.search("tin tức") == first and cache.stats()["hits"] == 1
+
+    provider.gate.clear()
+    clock.now = 50
+    # Hết TTL: trả kết quả cũ ngay, chỉ một lần làm mới ở nền cho nhiều lần đọc
+    assert cache.search("tin tức") == first
+    assert cache.search("tin tức") == first
+    assert cache.stats()["stale_hits"] == 2
+    assert cache.stats()["inflight"] == 1
+    wait_until(lambda: provider.calls == 2)
+
+    provider.gate.set()
+    wait_until(lambda: cache.stats()["inflight"] == 0)
+    refreshed = cache.search("tin tức")
+    assert refreshed != first and refreshed[0]["title"].endswith("#2")
+
+
+def test_expired_beyond_stale_window_fetches_again(provider):
+    clock = Clock()
+    cache = SearchCache(provider, ttl=10, stale_ttl=5, clock=clock)
+    provider.gate.set()
+    cache.search("thời tiết")
+    clock.now = 20
+    assert cache.search("thời tiết")[0]["title"].endswith("#2")
+    assert cache.stats()["misses"] == 2
+
+
+def test_timeout_keeps_late_result(provider):
+    cache = SearchCache(provider, timeout=0.05)
+    with pytest.raises(SearchTimeout):
+        cache.search("chậm")
+    provider.gate.set()
+    wait_until(lambda: cache.stats()["entries"] == 1)
+    assert cache.search("chậm")[0]["title"].endswith("#1")
+    assert cache.stats()["timeouts"] == 1 and cache.stats()["hits"] == 1
+
+
+def test_errors_are_not_cached():
+    calls = []
+
+    def failing(query, max_results):
+        calls.append(query)
+        if len(calls) == 1:
+            raise RuntimeError("network down")
+        return [{"title": "ok", "href": "https://example.com", "body": ""}]
+
+    cache = SearchCache(failing)
+    with pytest.raises(RuntimeError):
+        cache.search("lỗi")
+    assert cache.search("lỗi")[0]["title"] == "ok"
+    assert cache.stats()["errors"] == 1 and len(calls) == 2
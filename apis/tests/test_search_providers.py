@@ -0,0 +1,93 @@
+import sys
+from types import ModuleType
+
+import pytest
+
+from agents.tools.search_providers import (
+    DDGS_TESTED_VERSION, ELLIPSIS, MIN_SNIPPET_TOKENS, DuckDuckGoProvider, StubSearchProvider,
+    compact_results, estimate_tokens, trim_to_tokens,
+)
+from sessions.context import estimate_tokens as context_estimate_tokens
+
+
+def test_estimate_matches_chat_context():
+    for text in ["", "abc", "Giá iPhone 15 Pro là bao nhiêu?", "🚚" * 7]:
+        assert estimate_tokens(text) == context_estimate_tokens(text)
+
+
+def test_trim_to_tokens_cuts_at_word_boundary():
+    assert trim_to_tokens("ngắn gọn", 10) == "ngắn gọn"
+    text = "Điện thoại iPhone 15 Pro có màn hình 6.1 inch, chip A17 Pro và khung titan. " * 10
+    trimmed = trim_to_tokens(text, 20)
+    assert trimmed.endswith(ELLIPSIS) and estimate_tokens(trimmed) <= 20
+    body = trimmed[:-len(ELLIPSIS)]
+    assert text.startswith(body) and text[len(body)] in " ,."
+
+
+def test_trim_to_tokens_never_splits_a_character():
+    trimmed = trim_to_tokens("ệ" * 100, 5)
+    assert set(trimmed[:-1]) == {"ệ"} and estimate_tokens(trimmed) <= 5
+
+
+def test_compact_results_dedupes_domains_and_respects_budget():
+    results = [
+        {"title": "A  1", "href": "https://www.shop.vn/a", "body": "x " * 500},
+        {"title": "A 2", "href": "https://shop.vn/b", "body": "trùng tên miền"},
+        {"title": "B", "href": "https://news.vn/b", "body": "  nội   dung  ngắn "},
+        {"title": "C", "url": "https://blog.vn/c", "snippet": "y " * 500},
+        {"title": "D", "href": "https://d.vn/d", "body": "bị bỏ vì vượt max_results"},
+    ]
+    records = compact_results(results, max_results=3, token_budget=150)
+    assert [r["url"] for r in records] == ["https://www.shop.vn/a", "https://news.vn/b", "https://blog.vn/c"]
+    assert records[0]["title"] == "A 1"
+    assert records[1]["snippet"] == "nội dung ngắn"
+    for record in records:
+        assert estimate_tokens(record["snippet"]) <= max(50 - estimate_tokens(record["title"]) - estimate_tokens(record["url"]), MIN_SNIPPET_TOKENS)
+    assert compact_results([], 5) == []
+
+
+def test_stub_provider_is_deterministic():
+    provider = StubSearchProvider(domains=2)
+    assert provider.search("giá vàng", 4) == provider.search("giá vàng", 4)
+    assert len(compact_results(provider.search("giá vàng", 4), 4)) == 2
+
+
+class FakeDDGS:
+    created = 0
+
+    def __init__(self, timeout):
+        FakeDDGS.created += 1
+        self.sleep_timestamp = 123.0
+
+    def text(self, query, max_results, region):
+        return [{"title": query, "href": "https://a.vn", "body": str(self.sleep_timestamp)}]
+
+
+@pytest.fixture
+def fake_ddgs(monkeypatch):
+    def install(version):
+        module = ModuleType("duckduckgo_search")
+        module.__version__ = version
+        module.DDGS = FakeDDGS
+        monkeypatch.setitem(sys.modules, "duckduckgo_search", module)
+        FakeDDGS.created = 0
+    return install
+
+
+def test_tested_ddgs_version_reuses_client_and_resets_rate_limit(fake_ddgs):
+    fake_ddgs(DDGS_TESTED_VERSION)
+    provider = DuckDuckGoProvider()
+    assert provider.reuse_clients
+    assert provider.search("a", 1)[0]["body"] == "0.0"
+    provider.search("b", 1)
+    assert FakeDDGS.created == 1
+
+
+def test_other_ddgs_version_uses_a_fresh_client(fake_ddgs, capsys):
+    fake_ddgs("9.0.0")
+    provider = DuckDuckGoProvider()
+    assert not provider.reuse_clients and "9.0.0" in capsys.readouterr().out
+    # Không đụng tới thuộc tính nội bộ
+    assert provider.search("a", 1)[0]["body"] == "123.0"
+    provider.search("b", 1)
+    assert FakeDDGS.created == 2
@@ -0,0 +1,107 @@
+import threading
+import time
+
+from sessions.persistence import SQLiteBackend
+from sessions.store import SessionStore
+
+
+def make_session(session_id, updated_at="2024-01-01T00:00:00"):
+    return {
+        "id": session_id,
+        "title": session_id,
+        "created_at": updated_at,
+        "updated_at": updated_at,
+        "message_count": 0,
+        "messages": [],
+    }
+
+
+def make_message(index):
+    return {"id": f"msg_{index}", "type": "user", "text": f"tin nhắn {index}", "timestamp": "t", "sender_name": "User"}
+
+
+def test_flush_without_pending_writes_returns_immediately(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "sessions.db"), flush_interval=0.5)
+    try:
+        started = time.perf_counter()
+        for _ in range(20):
+            assert backend.load_header("nope") is None
+        assert time.perf_counter() - started < 0.2
+    finally:
+        backend.close()
+
+
+def test_barrier_commits_without_waiting_for_flush_interval(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "sessions.db"), flush_interval=0.5)
+    try:
+        backend.save_session(make_session("s1"))
+        backend.append_message("s1", make_message(0))
+        started = time.perf_counter()
+        messages = backend.load_messages("s1")
+        assert time.perf_counter() - started < 0.25
+        assert [m["id"] for m in messages] == ["msg_0"]
+        assert backend.load_header("s1")["message_count"] == 1
+    finally:
+        backend.close()
+
+
+def test_concurrent_writes_are_group_committed(tmp_path):
+    backend = SQLiteBackend(str(tmp_path / "sessions.db"))
+    try:
+        backend.save_session(make_session("s1"))
+
+        def writer(offset):
+            for index in range(offset, offset + 50):
+                backend.append_message("s1", make_message(index))
+
+        threads = [threading.Thread(target=writer, args=(n * 50,)) for n in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        messages = backend.load_messages("s1")
+        assert sorted(m["id"] for m in messages) == sorted(f"msg_{i}" for i in range(200))
+        assert backend.load_header("s1")["message_count"] == 200
+        assert backend._pending == 0
+    finally:
+        backend.close()
+
+
+def test_store_reloads_evicted_session_from_backend(tmp_path):
+    path = str(tmp_path / "sessions.db")
+    store = SessionStore(SQLiteBackend(path), max_loaded_sessions=1)
+    store.add(make_session("s1"))
+    store.append_message("s1", make_message(1))
+    # Phiên thứ hai đẩy tin nhắn của s1 ra khỏi bộ nhớ
+    store.add(make_session("s2", "2024-01-02T00:00:00"))
+    assert "messages" not in store.get("s1")
+    assert [m["id"] for m in store.get_messages("s1")] == ["msg_1"]
+    store.close()
+
+    reopened = SessionStore(SQLiteBackend(path))
+    reopened.load()
+    assert [s["id"] for s in reopened.list_sessions()] == ["s2", "s1"]
+    assert [m["id"] for m in reopened.get_messages("s1")] == ["msg_1"]
+    reopened.close()
+
+
+def test_one_bad_write_does_not_roll_back_the_batch(tmp_path, capsys):
+    backend = SQLiteBackend(str(tmp_path / "sessions.db"), flush_interval=0.5)
+    try:
+        backend.save_session(make_session("s1"))
+        backend.save_session(make_session("s2"))
+        backend.append_message("s1", make_message(0))
+        # Thiếu timestamp: thao tác này lỗi khi ghi
+        backend.append_message("s2", {"id": "bad", "type": "user", "text": "x"})
+        backend.append_message("s2", make_message(1))
+        backend.flush()
+
+        assert [m["id"] for m in backend.load_messages("s1")] == ["msg_0"]
+        assert [m["id"] for m in backend.load_messages("s2")] == ["msg_1"]
+        assert backend.load_header("s2")["message_count"] == 1
+        assert backend._pending == 0
+        output = capsys.readouterr().out
+        assert "Error persisting chat session s2, append lost" in output
+        assert "s1" not in output
+    finally:
+        backend.close()
@@ -0,0 +1,169 @@
+import threading
+
+import pytest
+
+from sessions.persistence import SQLiteBackend
+from sessions.store import SessionStore
+
+
+def make_session(session_id, updated_at="2024-01-01T00:00:00", messages=None):
+    return {
+        "id": session_id,
+        "title": session_id,
+        "created_at": updated_at,
+        "updated_at": updated_at,
+        "messages": messages if messages is not None else [],
+    }
+
+
+def make_message(index):
+    return {"id": f"msg_{index}", "type": "user", "text": f"tin nhắn {index}", "timestamp": "t", "sender_name": "User"}
+
+
+def ids(sessions):
+    return [session["id"] for session in sessions]
+
+
+@pytest.fixture
+def store():
+    store = SessionStore()
+    for day in (3, 1, 2):
+        store.add(make_session(f"s{day}", f"2024-01-0{day}T00:00:00"))
+    return store
+
+
+def test_get_and_list_newest_first(store):
+    assert store.get("s2")["id"] == "s2"
+    assert store.get("missing") is None
+    assert "s1" in store and len(store) == 3
+    assert ids(store.list_sessions()) == ["s3", "s2", "s1"]
+
+
+def test_touch_moves_session_to_front(store):
+    version = store.version
+    assert store.touch("s1", "2024-01-05T00:00:00")
+    assert not store.touch("missing", "2024-01-05T00:00:00")
+    assert ids(store.list_sessions()) == ["s1", "s3", "s2"]
+    assert store.get("s1")["last_activity"] == "Just now"
+    assert store.version > version
+
+
+def test_add_replaces_existing_session(store):
+    store.add(make_session("s3", "2023-12-31T00:00:00", [make_message(0)]))
+    assert ids(store.list_sessions()) == ["s2", "s1", "s3"]
+    assert store.get("s3")["message_count"] == 1
+
+
+def test_concurrent_appends_are_not_lost(store):
+    def writer(offset):
+        for index in range(offset, offset + 100):
+            assert store.append_message("s1", make_message(index))
+
+    threads = [threading.Thread(target=writer, args=(n * 100,)) for n in range(4)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    assert sorted(m["id"] for m in store.get_messages("s1")) == sorted(f"msg_{i}" for i in range(400))
+    assert store.get("s1")["message_count"] == 400
+    assert not store.append_message("missing", make_message(0))
+    assert store.get_messages("missing") is None
+
+
+def test_replace_messages_resets_summary(store):
+    store.append_message("s2", make_message(0))
+    store.get("s2").update(summary="cũ", summary_upto=1)
+    assert store.replace_messages("s2", [])
+    session = store.get("s2")
+    assert session["messages"] == [] and session["message_count"] == 0
+    assert session["summary"] is None and session["summary_upto"] == 0
+
+
+def test_lru_unloads_messages_and_reloads_on_demand(tmp_path):
+    store = SessionStore(SQLiteBackend(str(tmp_path / "sessions.db")), max_loaded_sessions=2)
+    try:
+        for index in range(3):
+            store.add(make_session(f"s{index}", f"2024-01-0{index + 1}T00:00:00"))
+            store.append_message(f"s{index}", make_message(index))
+        # s0 ít dùng nhất nên bị giải phóng tin nhắn, header vẫn còn
+        assert "messages" not in store.get("s0")
+        assert "messages" in store.get("s1") and "messages" in store.get("s2")
+        assert store.get("s0")["message_count"] == 1
+
+        assert ids(store.get_messages("s0")) == ["msg_0"]
+        # Nạp lại s0 đẩy s1 (ít dùng nhất lúc này) ra khỏi bộ nhớ
+        assert "messages" not in store.get("s1")
+        assert ids(store.get_messages("s1")) == ["msg_1"]
+    finally:
+        store.close()
+
+
+def test_memory_backend_never_unloads():
+    store = SessionStore(max_loaded_sessions=1)
+    for index in range(3):
+        store.add(make_session(f"s{index}"))
+    assert all("messages" in store.get(f"s{index}") for index in range(3))
+
+
+def paged_store(count):
+    store = SessionStore()
+    for index in range(count):
+        # Hai phiên cùng updated_at để kiểm tra cursor phân biệt theo id
+        store.add(make_session(f"s{index:02d}", f"2024-01-01T00:00:{index // 2:02d}"))
+    return store
+
+
+def test_list_page_walks_every_session_once():
+    store = paged_store(11)
+    pages, cursor = [], None
+    while True:
+        sessions, cursor = store.list_page(4, cursor)
+        pages.append(ids(sessions))
+        if cursor is None:
+            break
+    assert [len(page) for page in pages] == [4, 4, 3]
+    assert sum(pages, []) == ids(store.list_sessions())
+
+
+def test_list_page_cursor_is_stable_when_sessions_are_touched():
+    store = paged_store(6)
+    first, cursor = store.list_page(3)
+    # Phiên ở trang sau được cập nhật: chuyển lên đầu, không xuất hiện lại ở trang tiếp theo
+    store.touch("s00", "2024-02-01T00:00:00")
+    rest, cursor = store.list_page(3, cursor)
+    assert cursor is None
+    assert ids(first) == ["s05", "s04", "s03"] and ids(rest) == ["s02", "s01"]
+
+
+def test_list_since_returns_only_newer_sessions():
+    store = paged_store(6)
+    assert ids(store.list_since("2024-01-01T00:00:01")) == ["s05", "s04"]
+    assert store.list_since("2024-01-01T00:00:02") == []
+    store.touch("s00", "2024-01-01T00:00:03")
+    assert ids(store.list_since("2024-01-01T00:00:02")) == ["s00"]
+
+
+def test_get_messages_page_walks_history_backwards():
+    store = SessionStore()
+    store.add(make_session("s1", messages=[make_message(i) for i in range(7)]))
+    page, has_more = store.get_messages_page("s1", 3)
+    assert ids(page) == ["msg_4", "msg_5", "msg_6"] and has_more
+    page, has_more = store.get_messages_page("s1", 3, before=page[0]["id"])
+    assert ids(page) == ["msg_1", "msg_2", "msg_3"] and has_more
+    page, has_more = store.get_messages_page("s1", 3, before=page[0]["id"])
+    assert ids(page) == ["msg_0"] and not has_more
+    assert store.get_messages_page("missing", 3) is None
+    with pytest.raises(KeyError):
+        store.get_messages_page("s1", 3, before="msg_x")
+
+
+def test_get_messages_page_sees_new_and_replaced_messages():
+    store = SessionStore()
+    store.add(make_session("s1", messages=[make_message(i) for i in range(3)]))
+    store.get_messages_page("s1", 2, before="msg_2")
+    store.append_message("s1", make_message(3))
+    assert ids(store.get_messages_page("s1", 2, before="msg_3")[0]) == ["msg_1", "msg_2"]
+    store.replace_messages("s1", [make_message(9)])
+    assert ids(store.get_messages_page("s1", 5)[0]) == ["msg_9"]
+    with pytest.raises(KeyError):
+        store.get_messages_page("s1", 2, before="msg_3")
@@ -0,0 +1,98 @@
+import asyncio
+import threading
+from types import SimpleNamespace
+
+from sessions.store import SessionStore
+from sessions.summarizer import ConversationSummarizer
+
+
+class ThreadCheckingStore(SessionStore):
+    """SessionStore ghi lại thread của mọi lần đọc/ghi (có thể chặn khi backend flush)"""
+
+    def __init__(self):
+        super().__init__()
+        self.threads = []
+
+    def get(self, session_id):
+        self.threads.append(threading.get_ident())
+        return super().get(session_id)
+
+    def get_messages(self, session_id):
+        self.threads.append(threading.get_ident())
+        return super().get_messages(session_id)
+
+    def set_summary(self, *args):
+        self.threads.append(threading.get_ident())
+        return super().set_summary(*args)
+
+
+class FakeLLM:
+    def __init__(self):
+        self.prompts = []
+
+    async def ainvoke(self, prompt):
+        self.prompts.append(prompt)
+        return SimpleNamespace(content=" Người dùng hỏi về đơn hàng. ")
+
+
+def make_store(count):
+    store = ThreadCheckingStore()
+    store.add({
+        "id": "s1",
+        "title": "Chat",
+        "created_at": "2024-01-01T00:00:00",
+        "updated_at": "2024-01-01T00:00:00",
+        "messages": [
+            {"id": f"m{i}", "type": "user" if i % 2 == 0 else "ai", "text": f"tin nhắn {i}", "timestamp": "2024-01-01T00:00:00"}
+            for i in range(count)
+        ],
+    })
+    store.threads.clear()
+    return store
+
+
+def run_scheduled(summarizer, session_id, window_start):
+    async def scenario():
+        loop_thread = threading.get_ident()
+        summarizer.schedule(session_id, window_start)
+        summarizer.schedule(session_id, window_start)
+        assert len(summarizer._tasks) <= 1
+        await asyncio.gather(*summarizer._tasks.values())
+        return loop_thread
+
+    return asyncio.run(scenario())
+
+
+def test_summary_runs_store_calls_off_the_event_loop():
+    store, llm = make_store(20), FakeLLM()
+    summarizer = ConversationSummarizer(store, lambda: llm, min_new_messages=6)
+    loop_thread = run_scheduled(summarizer, "s1", 10)
+    threads = list(store.threads)
+
+    session = store.get("s1")
+    assert session["summary"] == "Người dùng hỏi về đơn hàng."
+    assert session["summary_upto"] == 10
+    assert len(llm.prompts) == 1 and "tin nhắn 9" in llm.prompts[0] and "tin nhắn 10" not in llm.prompts[0]
+    assert threads and loop_thread not in threads
+
+
+def test_too_few_evicted_messages_are_left_for_later():
+    store, llm = make_store(20), FakeLLM()
+    summarizer = ConversationSummarizer(store, lambda: llm, min_new_messages=6)
+    loop_thread = run_scheduled(summarizer, "s1", 5)
+    threads = list(store.threads)
+    assert llm.prompts == [] and store.get("s1").get("summary") is None
+    assert threads and loop_thread not in threads
+
+
+def test_summary_is_dropped_when_history_changed_meanwhile():
+    store = make_store(20)
+
+    class ClearingLLM(FakeLLM):
+        async def ainvoke(self, prompt):
+            store.replace_messages("s1", [])
+            return await super().ainvoke(prompt)
+
+    summarizer = ConversationSummarizer(store, ClearingLLM, min_new_messages=6)
+    assert asyncio.run(summarizer.update("s1", 10)) is False
+    assert store.get("s1")["summary"] is None
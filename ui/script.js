@@ -3,6 +3,13 @@
 let currentSessionId = null;
 let chatSessions = [];
 let isLoading = false;
+// ETag của lần tải danh sách phiên gần nhất (dùng cho If-None-Match khi polling)
+let sessionsEtag = null;
+// Phân trang lịch sử tin nhắn của phiên đang mở
+const MESSAGE_PAGE_SIZE = 50;
+let oldestMessageId = null;
+let hasMoreMessages = false;
+let isLoadingOlderMessages = false;
 
 // Khởi tạo markdown-it
 const md = window.markdownit({
@@ -24,6 +31,16 @@ document.addEventListener('DOMContentLoaded', function () {
 
 // Thiết lập event listeners
 function setupEventListeners() {
+    // Tải các tin nhắn cũ hơn khi cuộn lên đầu khung chat
+    const chatMessages = document.getElementById('chatMessages');
+    if (chatMessages) {
+        chatMessages.addEventListener('scroll', function () {
+            if (chatMessages.scrollTop < 50) {
+                loadOlderMessages();
+            }
+        });
+    }
+
     // Close modal khi click bên ngoài
     window.onclick = function (event) {
         const modal = document.getElementById('newChatModal');
@@ -44,6 +61,7 @@ async function loadChatSessions() {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
 
+        sessionsEtag = null;
         chatSessions = await response.json();
         // Sắp xếp theo thời gian mới nhất lên đầu
         chatSessions.sort((a, b) => new Date(b.updated_at) - new Date(a.updated_at));
@@ -63,15 +81,59 @@ async function loadChatSessions() {
     }
 }
 
-async function loadChatSessionDetail(sessionId) {
+// Polling nhẹ: chỉ lấy các phiên thay đổi từ lần cập nhật gần nhất, 304 nếu không đổi
+async function refreshChatSessions() {
     try {
-        const response = await fetch(`${API_BASE_URL}/api/sessions/${sessionId}`);
+        const latest = chatSessions.reduce((max, s) => (s.updated_at > max ? s.updated_at : max), '');
+        const url = latest
+            ? `${API_BASE_URL}/api/sessions?since=${encodeURIComponent(latest)}`
+            : `${API_BASE_URL}/api/sessions`;
+        const headers = sessionsEtag ? { 'If-None-Match': sessionsEtag } : {};
+
+        const response = await fetch(url, { headers });
+        if (response.status === 304) {
+            // Không có phiên nào thay đổi: chỉ cập nhật lại thời gian hoạt động hiển thị
+            renderChatSessions();
+            return;
+        }
         if (!response.ok) {
             throw new Error(`HTTP error! status: ${response.status}`);
         }
 
-        const session = await response.json();
-        renderChatMessages(session.messages);
+        sessionsEtag = response.headers.get('ETag');
+        const changed = await response.json();
+        if (changed.length === 0) {
+            renderChatSessions();
+            return;
+        }
+
+        // Gộp các phiên thay đổi vào danh sách hiện có
+        const byId = new Map(chatSessions.map(s => [s.id, s]));
+        changed.forEach(s => byId.set(s.id, s));
+        chatSessions = Array.from(byId.values());
+        chatSessions.sort((a, b) => new Date(b.updated_at) - new Date(a.updated_at));
+        renderChatSessions();
+    } catch (error) {
+        console.error('Error refreshing chat sessions:', error);
+    }
+}
+
+async function loadChatSessionDetail(sessionId) {
+    try {
+        // Chỉ tải header và trang tin nhắn mới nhất, các trang cũ hơn tải khi cuộn lên
+        const [headerResponse, pageResponse] = await Promise.all([
+            fetch(`${API_BASE_URL}/api/sessions/${sessionId}/header`),
+            fetch(`${API_BASE_URL}/api/sessions/${sessionId}/messages?limit=${MESSAGE_PAGE_SIZE}`)
+        ]);
+        if (!headerResponse.ok || !pageResponse.ok) {
+            throw new Error(`HTTP error! status: ${headerResponse.ok ? pageResponse.status : headerResponse.status}`);
+        }
+
+        const session = await headerResponse.json();
+        const page = await pageResponse.json();
+        hasMoreMessages = page.has_more;
+        oldestMessageId = page.next_before;
+        renderChatMessages(page.messages);
         updateChatHeader(session.title);
         enableChatInput();
 
@@ -84,6 +146,42 @@ async function loadChatSessionDetail(sessionId) {
     }
 }
 
+async function loadOlderMessages() {
+    if (!currentSessionId || !hasMoreMessages || !oldestMessageId || isLoadingOlderMessages) {
+        return;
+    }
+
+    isLoadingOlderMessages = true;
+    const sessionId = currentSessionId;
+    try {
+        const params = new URLSearchParams({ limit: MESSAGE_PAGE_SIZE, before: oldestMessageId });
+        const response = await fetch(`${API_BASE_URL}/api/sessions/${sessionId}/messages?${params}`);
+        if (!response.ok) {
+            throw new Error(`HTTP error! status: ${response.status}`);
+        }
+
+        const page = await response.json();
+        if (sessionId !== currentSessionId) {
+            return;
+        }
+
+        // Giữ nguyên vị trí cuộn sau khi chèn tin nhắn cũ lên đầu
+        const chatMessages = document.getElementById('chatMessages');
+        const previousHeight = chatMessages.scrollHeight;
+        page.messages.slice().reverse().forEach(message => {
+            addMessageToChat(message.type, message.text, formatTime(new Date(message.timestamp)), null, true);
+        });
+        chatMessages.scrollTop += chatMessages.scrollHeight - previousHeight;
+
+        hasMoreMessages = page.has_more;
+        oldestMessageId = page.next_before;
+    } catch (error) {
+        console.error('Error loading older messages:', error);
+    } finally {
+        isLoadingOlderMessages = false;
+    }
+}
+
 async function createNewChatSession(title) {
     try {
         const response = await fetch(`${API_BASE_URL}/api/sessions/new`, {
@@ -154,14 +252,17 @@ async function sendMessageToAPI(message) {
         const reader = response.body.getReader();
         const decoder = new TextDecoder();
         let aiResponseText = '';
+        // Giữ lại phần dòng chưa trọn giữa các lần đọc (token nhỏ có thể bị cắt ngang)
+        let buffer = '';
 
         try {
             while (true) {
                 const { done, value } = await reader.read();
                 if (done) break;
 
-                const chunk = decoder.decode(value);
-                const lines = chunk.split('\n');
+                buffer += decoder.decode(value, { stream: true });
+                const lines = buffer.split('\n');
+                buffer = lines.pop();
 
                 for (const line of lines) {
                     if (line.startsWith('data: ')) {
@@ -175,7 +276,10 @@ async function sendMessageToAPI(message) {
                                 scrollToBottom();
                             } else if (data.type === 'complete') {
                                 // Hoàn thành
-                                console.log('Streaming completed');
+                                if (data.ai_message && data.ai_message.text !== aiResponseText) {
+                                    updateAIMessage(aiMessageId, data.ai_message.text);
+                                }
+                                console.log('Streaming completed', data.metrics || {});
                             } else if (data.type === 'error') {
                                 // Xử lý lỗi
                                 updateAIMessage(aiMessageId, data.content);
@@ -279,7 +383,7 @@ function renderChatSessions() {
 
         sessionElement.innerHTML = `
             <span>${session.title}</span>
-            <small>${session.last_activity}</small>
+            <small>${formatTimeAgo(session.updated_at) || session.last_activity}</small>
         `;
 
         sessionsContainer.appendChild(sessionElement);
@@ -308,7 +412,7 @@ function renderChatMessages(messages) {
     });
 }
 
-function addMessageToChat(type, text, time, messageId = null) {
+function addMessageToChat(type, text, time, messageId = null, prepend = false) {
     const chatMessages = document.getElementById('chatMessages');
 
     // Xóa welcome message nếu có
@@ -336,7 +440,11 @@ function addMessageToChat(type, text, time, messageId = null) {
         </div>
     `;
 
-    chatMessages.appendChild(messageDiv);
+    if (prepend) {
+        chatMessages.insertBefore(messageDiv, chatMessages.firstChild);
+    } else {
+        chatMessages.appendChild(messageDiv);
+    }
 
     // Add click listeners to images if this is an AI message with images
     if (type === 'ai') {
@@ -488,6 +596,29 @@ function formatTime(date) {
     }
 }
 
+// Thời gian hoạt động của phiên ("X min ago"), tính lại ở client mỗi lần vẽ danh sách vì polling
+// bằng since chỉ trả về các phiên thay đổi; cùng định dạng với format_time_ago ở server
+function formatTimeAgo(timestamp) {
+    const date = new Date(timestamp);
+    if (isNaN(date)) {
+        return '';
+    }
+    const seconds = Math.floor((new Date() - date) / 1000);
+    const days = Math.floor(seconds / 86400);
+    const hours = Math.floor(seconds / 3600);
+    const minutes = Math.floor(seconds / 60);
+
+    if (days > 0) {
+        return `${days} day${days > 1 ? 's' : ''} ago`;
+    } else if (hours > 0) {
+        return `${hours} hour${hours > 1 ? 's' : ''} ago`;
+    } else if (minutes > 0) {
+        return `${minutes} min ago`;
+    } else {
+        return 'Just now';
+    }
+}
+
 function autoResizeTextarea() {
     const textarea = document.getElementById('messageInput');
     textarea.addEventListener('input', function () {
@@ -638,7 +769,7 @@ function showSuccessMessage(message) {
 // Auto-refresh sessions every 30 seconds
 setInterval(() => {
     if (chatSessions.length > 0) {
-        loadChatSessions();
+        refreshChatSessions();
     }
 }, 30000);
 